@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
+import base64
+import datetime
+import json
+import mimetypes
 import os
+import sys
+import tarfile
+import time
+import zipfile
 
 from flask import (
-    Flask, request, jsonify, send_from_directory
+    Flask, Response, request, jsonify, send_from_directory,
+    stream_with_context
 )
 from flask_sqlalchemy import SQLAlchemy
+from psycopg2.extras import execute_values
+import sqlalchemy
 from sqlalchemy import create_engine
 from sqlalchemy_utils import database_exists, create_database
 
@@ -32,6 +43,11 @@ class Data(db.Model):
     timestamp and fileclass.
     """
     __tablename__ = "data"
+    __table_args__ = (
+        db.Index("data_task_fileclass_timestamp",
+                 "task_id", "fileclass", "timestamp", "id"),
+        db.Index("data_task_timestamp", "task_id", "timestamp", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(
         db.DateTime,
@@ -41,7 +57,9 @@ class Data(db.Model):
     task_id = db.Column(db.String, nullable=False)
     name = db.Column(db.String, nullable=False)
     fileclass = db.Column(db.String, nullable=False)
-    data = db.Column(db.String, nullable=False)
+    # raw file bytes (bytea). this is big, so it's only loaded when
+    # it's actually accessed, not when listing files
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
     url = db.Column(db.String, nullable=False)
 
     db.UniqueConstraint('task_id', 'name', name='unique_name_per_task_1')
@@ -66,6 +84,175 @@ class Data(db.Model):
             "url": self.url,
         }
 
+    @property
+    def b64data(self):
+        """
+        File data, base64 encoded for sending in JSON responses.
+        """
+        if self.data is None:
+            return None
+        return base64.b64encode(self.data).decode()
+
+    @property
+    def cursor(self):
+        """
+        Position of this row in a timestamp-descending listing, for
+        keyset pagination. See list_files.
+        """
+        return "%s,%s" % (self.timestamp.isoformat(), self.id)
+
+
+class LatestScreenshot(db.Model):
+    """
+    Points at the most recent screenshot for each task, so polling a
+    task's status doesn't have to search through all of its files.
+    """
+    __tablename__ = "latest_screenshot"
+    task_id = db.Column(db.String, primary_key=True)
+    data_id = db.Column(db.Integer, nullable=False)
+
+
+# upsert a task's latest screenshot. concurrent uploads for the same
+# task would race a select-then-insert (e.g., session.merge)
+UPSERT_LATEST_SCREENSHOT = (
+    "INSERT INTO latest_screenshot (task_id, data_id) VALUES %s"
+    " ON CONFLICT (task_id) DO UPDATE SET data_id = EXCLUDED.data_id"
+)
+
+
+def create_indexes():
+    """
+    create_all doesn't add new indexes to existing tables.
+    """
+    for index in Data.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+# decodes base64, or returns NULL if it isn't valid base64, instead
+# of failing the whole statement. only lasts for the connection
+TRY_DECODE_BASE64 = """
+    CREATE OR REPLACE FUNCTION pg_temp.try_decode_base64(value text) RETURNS bytea
+    AS $$
+    BEGIN
+        RETURN decode(value, 'base64');
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE
+"""
+
+
+def data_column_is_text():
+    """
+    Check whether the data column is still the old base64 text one,
+    and needs migrate_data_column run on it.
+    """
+    with engine.connect() as conn:
+        # Inspector.has_table is SQLAlchemy 1.4+
+        if not engine.dialect.has_table(conn, Data.__tablename__):
+            return False
+    inspector = sqlalchemy.inspect(engine)
+    for column in inspector.get_columns(Data.__tablename__):
+        if column["name"] == "data":
+            return not isinstance(column["type"], sqlalchemy.LargeBinary)
+    return False
+
+
+def migrate_data_column():
+    """
+    One-time migration for databases from before file data was stored
+    as bytea: convert the base64 text column, decoding what's already
+    there. Run it with:
+
+        python autoscrape-server.py migrate
+
+    Rows that aren't valid base64 are logged and kept as the raw text
+    bytes, instead of failing the whole migration.
+    """
+    if not data_column_is_text():
+        app.logger.info("Data column already migrated")
+        return
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(TRY_DECODE_BASE64))
+        bad_rows = conn.execute(sqlalchemy.text(
+            "SELECT id, task_id, name FROM data"
+            " WHERE pg_temp.try_decode_base64(data) IS NULL"
+        )).fetchall()
+        for data_id, task_id, name in bad_rows:
+            app.logger.warning(
+                "Data %s (task %s, %s) isn't valid base64, storing it"
+                " undecoded" % (data_id, task_id, name)
+            )
+        app.logger.info("Converting data column to bytea...")
+        conn.execute(sqlalchemy.text(
+            "ALTER TABLE data ALTER COLUMN data TYPE bytea USING"
+            " COALESCE(pg_temp.try_decode_base64(data),"
+            " convert_to(data, 'UTF8'))"
+        ))
+    app.logger.info("Converted data column, %s rows stored undecoded" % (
+        len(bad_rows)
+    ))
+    set_data_storage()
+
+
+def set_data_storage():
+    """
+    Store file data uncompressed. We read it in chunks with substring
+    (see iter_data_chunks), and postgres has to decompress a compressed
+    value from the start to get at each chunk. This only changes the
+    catalog, so it's cheap to repeat, and applies to rows written from
+    then on.
+    """
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text(
+            "ALTER TABLE data ALTER COLUMN data SET STORAGE EXTERNAL"
+        ))
+
+
+def update_latest_screenshot(task_id, data_id):
+    """
+    Point the task's latest screenshot at the given data row. Needs to
+    be committed by the caller.
+    """
+    db.session.execute(
+        sqlalchemy.text(
+            UPSERT_LATEST_SCREENSHOT % "(:task_id, :data_id)"
+        ),
+        {"task_id": task_id, "data_id": data_id},
+    )
+
+
+def insert_data_rows(rows):
+    """
+    Insert many (task_id, name, fileclass, data, url) rows in a single
+    statement and transaction.
+    """
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        inserted = execute_values(
+            cursor,
+            "INSERT INTO data (timestamp, task_id, name, fileclass, data, url)"
+            " VALUES %s RETURNING id, task_id, fileclass",
+            rows,
+            template="(current_timestamp, %s, %s, %s, %s, %s)",
+            fetch=True,
+        )
+        # rows come back in insert order, so the last screenshot for
+        # each task wins
+        screenshots = {
+            task_id: data_id
+            for data_id, task_id, fileclass in inserted
+            if fileclass == "screenshot"
+        }
+        if screenshots:
+            execute_values(
+                cursor, UPSERT_LATEST_SCREENSHOT, list(screenshots.items()),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
 
 @app.route("/", methods=["GET"])
 @app.route("/scrape", methods=["GET"])
@@ -79,10 +266,10 @@ def get_root(id=None):
 
 @app.route("/<path:path>", methods=["GET"])
 def get_path(path):
-    mimetypes = {
+    extra_mimetypes = {
         '.wasm': 'application/wasm',
     }
-    mimetype = mimetypes.get(path[-4:], None)
+    mimetype = extra_mimetypes.get(path[-4:], None)
     return send_from_directory("www/build", path, mimetype=mimetype)
 
 
@@ -120,6 +307,8 @@ def post_start():
         "AUTOSCRAPE_API_URL",
         "http://flask:5000/receive"
     )
+    # send files back to us in batches, see receive_bulk_data
+    args["bulk_upload"] = True
     app.logger.debug("Baseurl: %s" % baseurl)
     result = tasks.start.apply_async((baseurl, args))
     app.logger.debug("Result: %s" % result)
@@ -139,12 +328,18 @@ def get_status(id):
         {"status": "OK", "message": "STARTED", "traceback": None}
     """
     result = tasks.app.AsyncResult(id)
-    data = Data.query.filter_by(
-        task_id=id,
-        fileclass="screenshot"
-    ).order_by(
-        Data.timestamp.desc()
-    ).first()
+    data = None
+    latest = LatestScreenshot.query.get(id)
+    if latest:
+        data = Data.query.get(latest.data_id)
+    else:
+        # tasks from before we kept track of the latest screenshot
+        data = Data.query.filter_by(
+            task_id=id,
+            fileclass="screenshot"
+        ).order_by(
+            Data.timestamp.desc(), Data.id.desc()
+        ).first()
     app.logger.debug("Task state: %s" % result.state)
     response = {
         "status": "OK",
@@ -154,7 +349,7 @@ def get_status(id):
         response["traceback"] = result.traceback
     if data:
         app.logger.debug("Data: %s" % data)
-        response["data"] = data.data
+        response["data"] = data.b64data
         response["url"] = data.url
     return jsonify(response)
 
@@ -201,7 +396,7 @@ def receive_data(id):
     app.logger.debug("URL: %s" % (url))
 
     try:
-        data = args["data"]
+        data = base64.b64decode(args["data"])
         app.logger.debug("Data: %s" % len(data))
         # app.logger.debug("Decoded: %s" % decoded)
     except Exception as e:
@@ -209,9 +404,11 @@ def receive_data(id):
         data = None
         fileclass = None
 
-    # TODO: write b64 data to postgres under task ID key
     scraped_data = Data(id, name, fileclass, data, url)
     db.session.add(scraped_data)
+    if fileclass == "screenshot":
+        db.session.flush()
+        update_latest_screenshot(id, scraped_data.id)
     db.session.commit()
     app.logger.debug("Updated task state")
 
@@ -219,6 +416,37 @@ def receive_data(id):
     return jsonify({"status": "OK"})
 
 
+@app.route("/receive/<id>/bulk", methods=["POST"])
+def receive_bulk_data(id):
+    """
+    Callback endpoint for receiving batches of scrape data from an
+    AutoScrape instance running with the bulk_upload option. Files
+    are sent as raw bytes in a multipart request and written with a
+    single multi-row insert:
+
+    HTTP POST /receive/SCRAPE-ID/bulk
+        manifest: [{"name": ..., "fileclass": ..., "url": ...}, ...]
+        file: (one part per file, in manifest order)
+    """
+    manifest = json.loads(request.form["manifest"])
+    files = request.files.getlist("file")
+    app.logger.debug("Task ID : %s, Files: %s" % (id, len(files)))
+    if len(manifest) != len(files):
+        return jsonify({
+            "status": "error",
+            "message": "Manifest doesn't match files",
+        }), 400
+
+    rows = []
+    for meta, f in zip(manifest, files):
+        rows.append((
+            id, meta["name"], meta["fileclass"], f.read(), meta["url"]
+        ))
+    insert_data_rows(rows)
+    app.logger.debug("Updated task state")
+    return jsonify({"status": "OK", "data": len(files)})
+
+
 @app.route("/files/list/<id>", methods=["GET"])
 def list_files(id):
     """
@@ -226,6 +454,10 @@ def list_files(id):
     an optional fileclass query param (only look at downloads,
     crawl_data, data_files, etc). Defaults to *all* data
     scraped, ordered by date.
+
+    Pages are fetched by passing the previous response's next_cursor
+    as the cursor query param. The older page query param still works,
+    but gets slower the further into a listing it goes.
     """
     filter_params = {
         "task_id": id,
@@ -235,19 +467,47 @@ def list_files(id):
     if fileclass:
         filter_params["fileclass"] = fileclass
 
-    page = int(request.args.get("page", 1))
-    pagination = Data.query.filter_by(
+    per_page = min(int(request.args.get("per_page", 20)), 100)
+    query = Data.query.filter_by(
         **filter_params
     ).order_by(
-        Data.timestamp.desc()
-    ).paginate(page=page, error_out=False)
+        Data.timestamp.desc(), Data.id.desc()
+    )
 
+    cursor = request.args.get("cursor")
+    if "page" in request.args and not cursor:
+        page = int(request.args.get("page", 1))
+        pagination = query.paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        items = pagination.items
+        return jsonify({
+            "status": "OK",
+            "has_next": pagination.has_next,
+            "has_prev": pagination.has_prev,
+            "page": pagination.page,
+            "next_cursor": items[-1].cursor if pagination.has_next else None,
+            "data": [d.serialize for d in items]
+        })
+
+    if cursor:
+        timestamp, last_id = cursor.rsplit(",", 1)
+        timestamp = datetime.datetime.fromisoformat(timestamp)
+        query = query.filter(
+            sqlalchemy.tuple_(Data.timestamp, Data.id) <
+            sqlalchemy.tuple_(timestamp, int(last_id))
+        )
+
+    # grab one extra to see if there's another page
+    items = query.limit(per_page + 1).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
     return jsonify({
         "status": "OK",
-        "has_next": pagination.has_next,
-        "has_prev": pagination.has_prev,
-        "page": pagination.page,
-        "data": [d.serialize for d in pagination.items]
+        "has_next": has_next,
+        "has_prev": bool(cursor),
+        "next_cursor": items[-1].cursor if has_next else None,
+        "data": [d.serialize for d in items]
     })
 
 
@@ -275,13 +535,219 @@ def get_file_data(task_id, file_id):
             "id": file_id,
             "name": data.name,
             "timestamp": data.timestamp,
-            "data": data.data,
+            "data": data.b64data,
             "fileclass": data.fileclass,
             "url": data.url,
         }
     })
 
 
+# how much file data to pull out of postgres at a time when streaming
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def iter_data_chunks(data_id, start=0, length=None):
+    """
+    Read a stored file's bytes in chunks, so that streaming a file never
+    requires holding all of it in memory. Yields bytes.
+    """
+    query = sqlalchemy.text(
+        "SELECT substring(data FROM :start FOR :count) FROM data"
+        " WHERE id = :id"
+    )
+    with engine.connect() as conn:
+        # read the size and every chunk from the same snapshot, in case
+        # the row gets rewritten while we're streaming it
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        with conn.begin():
+            if length is None:
+                length = conn.execute(sqlalchemy.text(
+                    "SELECT octet_length(data) FROM data WHERE id = :id"
+                ), {"id": data_id}).scalar() - start
+            end = start + length
+            while start < end:
+                count = min(STREAM_CHUNK_SIZE, end - start)
+                # postgres substring is 1-indexed
+                chunk = conn.execute(query, {
+                    "start": start + 1, "count": count, "id": data_id,
+                }).scalar()
+                if not chunk:
+                    break
+                yield bytes(chunk)
+                start += len(chunk)
+
+
+def data_file_listing(task_id, fileclass=None):
+    """
+    Get (id, name, timestamp, size) for each of a task's files without
+    loading any file data.
+    """
+    query = db.session.query(
+        Data.id, Data.name, Data.timestamp,
+        sqlalchemy.func.octet_length(Data.data)
+    ).filter(Data.task_id == task_id)
+    if fileclass:
+        query = query.filter(Data.fileclass == fileclass)
+    return query.order_by(Data.timestamp, Data.id).all()
+
+
+class StreamBuffer:
+    """
+    Write-only file object that collects whatever's written to it until
+    it's drained. Lets the zipfile module write an archive to a
+    streaming response.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_tar_export(files):
+    for data_id, name, timestamp, size in files:
+        info = tarfile.TarInfo(name=name)
+        info.size = size
+        info.mtime = time.mktime(timestamp.timetuple())
+        yield info.tobuf(format=tarfile.PAX_FORMAT)
+        sent = 0
+        for chunk in iter_data_chunks(data_id, length=size):
+            sent += len(chunk)
+            yield chunk
+        # the header has already gone out, so if the file shrank since
+        # we listed it, fill in the rest to keep the archive readable
+        if sent < size:
+            app.logger.error("File %s changed during export, %s of %s"
+                             " bytes sent" % (name, sent, size))
+            yield tarfile.NUL * (size - sent)
+        remainder = size % tarfile.BLOCKSIZE
+        if remainder:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+    # end of archive marker
+    yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+
+def iter_zip_export(files):
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, mode="w",
+                         compression=zipfile.ZIP_DEFLATED) as archive:
+        for data_id, name, timestamp, size in files:
+            info = zipfile.ZipInfo(name, date_time=timestamp.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, mode="w", force_zip64=True) as f:
+                for chunk in iter_data_chunks(data_id, length=size):
+                    f.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+@app.route("/files/raw/<task_id>/<file_id>", methods=["GET"])
+def get_file_raw(task_id, file_id):
+    """
+    Download an individual file's raw bytes. The file is streamed from
+    the database and byte range requests are supported.
+    """
+    app.logger.debug("Streaming task_id: %s, file_id: %s" % (
+        task_id, file_id))
+
+    row = db.session.query(
+        Data.id, Data.name, sqlalchemy.func.octet_length(Data.data)
+    ).filter_by(
+        task_id=task_id,
+        id=file_id
+    ).first()
+    if not row:
+        return jsonify({"status": "error", "message": "Not found"}), 404
+    data_id, name, size = row
+
+    status = 200
+    start, end = 0, size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": "attachment; filename=\"%s\"" % (
+            os.path.basename(name)
+        ),
+    }
+    if request.range:
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return Response(status=416, headers={
+                "Content-Range": "bytes */%s" % size,
+            })
+        start, end = byte_range
+        status = 206
+        headers["Content-Range"] = "bytes %s-%s/%s" % (start, end - 1, size)
+    headers["Content-Length"] = str(end - start)
+
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return Response(
+        stream_with_context(
+            iter_data_chunks(data_id, start=start, length=end - start)
+        ),
+        status=status, headers=headers, mimetype=mimetype,
+    )
+
+
+@app.route("/files/export/<task_id>", methods=["GET"])
+def export_files(task_id):
+    """
+    Download all of a task's files as a single archive, streamed as
+    it's built. Takes an optional fileclass query param, like
+    list_files, and a format query param (tar, the default, or zip).
+    """
+    fmt = request.args.get("format", "tar")
+    if fmt not in ("tar", "zip"):
+        return jsonify({
+            "status": "error",
+            "message": "Unsupported format: %s" % fmt,
+        }), 400
+
+    files = data_file_listing(task_id, request.args.get("fileclass"))
+    app.logger.debug("Exporting task_id: %s, files: %s" % (
+        task_id, len(files)))
+
+    if fmt == "zip":
+        stream = iter_zip_export(files)
+        mimetype = "application/zip"
+    else:
+        stream = iter_tar_export(files)
+        mimetype = "application/x-tar"
+    return Response(
+        stream_with_context(stream), mimetype=mimetype, headers={
+            "Content-Disposition": "attachment; filename=\"%s.%s\"" % (
+                task_id, fmt
+            ),
+        }
+    )
+
+
 if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        migrate_data_column()
+        sys.exit(0)
+    if data_column_is_text():
+        app.logger.error(
+            "The data table needs migrating, run: python"
+            " autoscrape-server.py migrate"
+        )
+        sys.exit(1)
     db.create_all()
+    create_indexes()
+    set_data_storage()
     app.run(host='0.0.0.0', port=5000)
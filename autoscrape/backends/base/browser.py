@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
+from urllib.parse import urljoin
+
+from autoscrape.backends.base.state import PageStateCache
 from autoscrape.backends.base.tags import TaggerBase
+from autoscrape.search.visited import URLCanonicalizer, visited_store
 
 
 class BrowserBase(TaggerBase):
@@ -17,6 +21,19 @@ class BrowserBase(TaggerBase):
             clean.append((name, args, kwargs))
         return clean
 
+    def setup_visited(self, strip_query_params=None, visited_bloom_size=None):
+        """
+        Set up the URL canonicalizer and the store of visited links. See
+        autoscrape.search.visited.
+        """
+        if strip_query_params is None:
+            self.canonicalize_url = URLCanonicalizer()
+        else:
+            self.canonicalize_url = URLCanonicalizer(
+                strip_params=strip_query_params
+            )
+        self.visited = visited_store(bloom_size=visited_bloom_size)
+
     def click(self, tag, **kwargs):
         self.path.append((
             "click", [tag], {"url": url}
@@ -57,6 +74,52 @@ class BrowserBase(TaggerBase):
         self.graph.add_node(node, **node_meta)
         self.graph.move_to_node(node)
 
+    def get_page_state(self):
+        """
+        Get the PageState for the currently loaded page. This is where
+        the controller and vectorizers should get a page's clickable
+        links, buttons and forms from, so they only get worked out
+        once per page.
+        """
+        if getattr(self, "page_states", None) is None:
+            self.page_states = PageStateCache()
+        return self.page_states.get(self)
+
+    def get_link_urls(self, tags):
+        """
+        Get the URL each of the given clickable tags points to, or None
+        for tags we can't find a URL for.
+        """
+        urls = []
+        for tag in tags:
+            elem = self.element_by_tag(tag)
+            url = None
+            if elem is not None:
+                attr = "href"
+                if self.element_tag_name(elem) == "iframe":
+                    attr = "src"
+                url = self.element_attr(elem, attr)
+            if url:
+                url = urljoin(self.page_url, url)
+            urls.append(url)
+        return urls
+
+    def get_tag_infos(self, tags):
+        """
+        Get the tag name ("node"), text and value of the elements for
+        the given tags, as a list of dicts (None for tags that can't be
+        found), all at once. Returns None if the backend can't do this
+        any faster than looking at each element in turn.
+        """
+        return None
+
     @property
     def infinite_loop_detected(self):
         return False
+
+    def quit(self):
+        """
+        Release any resources held by the browser (e.g., a running
+        WebDriver session).
+        """
+        pass
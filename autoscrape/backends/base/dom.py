@@ -48,6 +48,18 @@ class DomBase:
         """
         raise NotImplementedError("DomBase.get_stylesheet not implemented")
 
+    def get_stylesheets(self):
+        """
+        Return a list of the text of each loaded CSS stylesheet.
+        """
+        return [self.get_stylesheet()]
+
+    def get_page_text(self):
+        """
+        Return the visible text of the whole current page.
+        """
+        return self.element_text(None, block=True)
+
     def element_tag_name(self):
         """
         Return the tag name of the given element.
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from collections import OrderedDict
+
+
+class PageState:
+    """
+    Everything worked out about a single loaded page: its clickable
+    links, buttons, forms and inputs, plus anything else (like the
+    vectorizer's link and button text) that only depends on the page.
+    Each value is computed the first time it's asked for and then
+    re-used by everything that needs it.
+    """
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.values = {}
+
+    def get(self, name, compute):
+        """
+        Get a value for this page, calling compute() to get it if it
+        hasn't been computed yet.
+        """
+        if name not in self.values:
+            self.values[name] = compute()
+        return self.values[name]
+
+    @property
+    def clickable(self):
+        return self.get("clickable", self.browser.get_clickable)
+
+    @property
+    def link_urls(self):
+        """
+        URLs of the clickable links, in the same order as clickable.
+        """
+        return self.get(
+            "link_urls", lambda: self.browser.get_link_urls(self.clickable)
+        )
+
+    @property
+    def buttons(self):
+        return self.get("buttons", self.browser.get_buttons)
+
+    @property
+    def forms(self):
+        """
+        Dict of form tag => input tags, see Tagger.get_forms.
+        """
+        return self.get("forms", self.browser.get_forms)
+
+    @property
+    def text(self):
+        """
+        The page's visible text.
+        """
+        return self.get("text", self.browser.get_page_text)
+
+
+class PageStateCache:
+    """
+    Page states for the most recently seen pages, keyed by URL and a
+    hash of the page's HTML, so going back to (or staying on) a page
+    that hasn't changed doesn't re-tag it.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.states = OrderedDict()
+
+    def get(self, browser):
+        html = browser.page_html or ""
+        if not isinstance(html, bytes):
+            html = html.encode("utf-8", errors="replace")
+        key = (browser.page_url, hashlib.sha1(html).digest())
+        state = self.states.get(key)
+        if state is None:
+            state = PageState(browser)
+            self.states[key] = state
+            if len(self.states) > self.max_size:
+                self.states.popitem(last=False)
+        else:
+            self.states.move_to_end(key)
+        return state
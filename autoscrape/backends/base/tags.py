@@ -9,6 +9,45 @@ from autoscrape.backends.base.dom import DomBase
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+# the input groups get_forms returns for each form, in order
+INPUT_GROUPS = ["text", "select", "checkbox", "date", "radio"]
+
+
+def input_groups(tag_name, itype=None, structure=None):
+    """
+    Given an input/select element's tag name and its type and structure
+    attributes, return the get_inputs itypes it belongs to.
+    """
+    if tag_name == "select":
+        return ["select"]
+    groups = []
+    if itype in ("text", "checkbox", "radio"):
+        groups.append(itype)
+    if itype == "date" or structure == "date":
+        groups.append("date")
+    return groups
+
+
+def group_inputs(inputs):
+    """
+    Takes a list of (itypes, tag, name) for a form's inputs, in document
+    order, and returns a list of tags for each of INPUT_GROUPS. Radio
+    checkbox tags are grouped, by name, into lists.
+    """
+    groups = {itype: [] for itype in INPUT_GROUPS}
+    radio_names = []
+    for itypes, tag, name in inputs:
+        for itype in itypes:
+            if itype != "radio":
+                groups[itype].append(tag)
+                continue
+            if name not in radio_names:
+                radio_names.append(name)
+                groups["radio"].append([])
+            groups["radio"][radio_names.index(name)].append(tag)
+    return [groups[itype] for itype in INPUT_GROUPS]
+
+
 class TaggerBase(DomBase):
     """
     Generates tags from a given page that can be used, in a stateless manner,
@@ -155,16 +194,36 @@ class TaggerBase(DomBase):
                 logger.warn("No tag for element %s" % elem)
                 continue
 
-            tags[tag] = [
-                self.get_inputs(form=elem, itype="text"),
-                self.get_inputs(form=elem, itype="select"),
-                self.get_inputs(form=elem, itype="checkbox"),
-                self.get_inputs(form=elem, itype="date"),
-                self.get_inputs(form=elem, itype="radio"),
-            ]
+            tags[tag] = self.get_form_inputs(elem)
 
         return tags
 
+    def get_form_inputs(self, form):
+        """
+        Get all of a form's inputs, grouped the same way get_inputs
+        would return them for each of INPUT_GROUPS, but in a single pass
+        over the form's input and select elements.
+        """
+        inputs = []
+        elems = self.elements_by_path(".//input|.//select", from_element=form)
+        for elem in elems:
+            itypes = input_groups(
+                self.element_tag_name(elem).lower(),
+                itype=self.element_attr(elem, "type"),
+                structure=self.element_attr(elem, "structure"),
+            )
+            if not itypes:
+                continue
+            # radio checkboxes aren't checked for visibility
+            if itypes != ["radio"] and not self.element_displayed(elem):
+                continue
+            input_tag = self.tag_from_element(elem)
+            if not input_tag:
+                logger.warn("No tag for input %s" % elem)
+                continue
+            inputs.append((itypes, input_tag, self.element_attr(elem, "name")))
+        return group_inputs(inputs)
+
     def get_buttons(self, in_form=False, path=None):
         """
         Return all tags leading to a form link, button, or submit input button,
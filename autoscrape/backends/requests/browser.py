@@ -1,10 +1,13 @@
 # -*- coding: UTF-8 -*-
 import logging
-import re
 import time
+from collections import deque
 
 import requests
+from requests.adapters import HTTPAdapter
+
 from autoscrape.backends.base.browser import BrowserBase
+from autoscrape.backends.requests.cache import ResponseCache
 from autoscrape.backends.requests.tags import Tagger
 from autoscrape.search.graph import Graph
 
@@ -29,7 +32,10 @@ class RequestsBrowser(BrowserBase, Tagger):
         sys     0m10.976s
     """
 
-    def __init__(self, leave_host=False, **kwargs):
+    def __init__(self, leave_host=False, pool_size=None,
+                 snapshot_stack_size=10, cache_dir=None, cache_size=None,
+                 strip_query_params=None, visited_bloom_size=None,
+                 **kwargs):
         # requests Session
         self.s = requests.Session()
         self.s.headers.update({
@@ -38,9 +44,25 @@ class RequestsBrowser(BrowserBase, Tagger):
                 "Gecko/20100101 Firefox/35.0"
             )
         })
-
-        # set of clicked elements
-        self.visited = set()
+        # when fetching from multiple threads (concurrent crawls), the
+        # default pool of 10 connections per host isn't enough
+        if pool_size:
+            adapter = HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            self.s.mount("http://", adapter)
+            self.s.mount("https://", adapter)
+
+        # on-disk HTTP response cache, only used if we have a cache_dir
+        self.cache = None
+        if cache_dir:
+            self.cache = ResponseCache(cache_dir, max_size=cache_size)
+
+        # canonical URLs of clicked links
+        self.setup_visited(
+            strip_query_params=strip_query_params,
+            visited_bloom_size=visited_bloom_size,
+        )
 
         # queue of the path that led us to the current page
         # this is in the form of (command, *args, **kwargs)
@@ -52,29 +74,86 @@ class RequestsBrowser(BrowserBase, Tagger):
         # setting to False, ensures crawl will stay on same host
         self.leave_host = leave_host
 
+        # bounded stack of the pages we clicked away from, so that going
+        # back doesn't need to re-fetch and re-parse them. pages that fall
+        # off the bottom of the stack get re-fetched.
+        self.snapshots = deque(maxlen=int(snapshot_stack_size or 0))
+
         self.current_url = None
         self.current_html = None
+        self.tag_elements = {}
+        self._clickable = None
+        self.dom_modified = False
+        # css URL => stylesheet text, see Dom.get_stylesheets
+        self.stylesheets = {}
+
+    def _set_page(self, url, html):
+        """
+        Set the currently loaded page, parsing its DOM and dropping
+        anything we've computed for the previous page.
+        """
+        self.current_url = url
+        self.current_html = html
+        self.dom = self._get_dom()
+        self.tag_elements = {}
+        self._clickable = None
+        # whether we've changed the DOM (e.g., typed into an input)
+        self.dom_modified = False
+
+    def _snapshot(self):
+        """
+        Capture the currently loaded page. The path length is used to
+        line the snapshot back up with the path when going back. If
+        the DOM has been changed by filling in inputs, only the HTML
+        is kept and the page gets re-parsed on restore, so going back
+        gets the page as it was loaded.
+        """
+        modified = self.dom_modified
+        return {
+            "depth": len(self.path),
+            "url": self.current_url,
+            "html": self.current_html,
+            "dom": None if modified else self.dom,
+            "tag_elements": {} if modified else self.tag_elements,
+            "clickable": self._clickable,
+        }
+
+    def _restore_snapshot(self):
+        """
+        Restore the page we came from, if we still have it. Returns
+        False if it has fallen off the snapshot stack.
+        """
+        # drop anything left over from deeper in the path
+        while self.snapshots and self.snapshots[-1]["depth"] > len(self.path):
+            self.snapshots.pop()
+        if not self.snapshots or self.snapshots[-1]["depth"] != len(self.path):
+            return False
 
-    def _no_endslash_url(self, url):
-        # remove trailing slash
-        url_noslash = re.sub(r"/$", "", url)
-        # and trailing slash before query params
-        return re.sub(r"/&", "&", url_noslash)
+        snapshot = self.snapshots.pop()
+
+        logger.debug(" - Restoring page from snapshot: %s" % (
+            snapshot["url"]
+        ))
+        self.current_url = snapshot["url"]
+        self.current_html = snapshot["html"]
+        self.dom = snapshot["dom"]
+        if self.dom is None:
+            self.dom = self._get_dom()
+        self.tag_elements = snapshot["tag_elements"]
+        self._clickable = snapshot["clickable"]
+        self.dom_modified = False
+        return True
 
     def _check_and_set_visited(self, url):
         """
-        Take a URL and see if we've visited it (or a slash-ending
-        variation) if we haven't this sets the URL to the
-        visited set. Returns True if we've visited False if not.
+        Take a URL and see if we've visited it (or an equivalent URL,
+        see URLCanonicalizer) if we haven't this adds the URL to the
+        visited store. Returns True if we've visited False if not.
         """
-        url_no_endslash = self._no_endslash_url(url)
-        if url_no_endslash in self.visited or url in self.visited:
-            return True
-        self.visited.add(url)
-        self.visited.add(url_no_endslash)
-        return False
+        return self.visited.check_and_add(self.canonicalize_url(url))
 
     def click(self, tag, **kwargs):
+        snapshot = self._snapshot()
         element = self.element_by_tag(tag)
         text = self.element_text(element)
         url = None
@@ -122,6 +201,7 @@ class RequestsBrowser(BrowserBase, Tagger):
                 "click not implemented for element: %s" % (tag_name)
             )
 
+        self.snapshots.append(snapshot)
         self.path.append((
             "click", [tag], {"url": url}
         ))
@@ -138,30 +218,33 @@ class RequestsBrowser(BrowserBase, Tagger):
         self.graph.move_to_node(node)
         return True
 
-    def fetch(self, url, initial=False):
+    def _get(self, url):
         """
-        Fetch a page from a given URL (entry point, typically). Most of
-        the time we just want to click a link or submit a form using
-        webdriver.
+        GET a URL, retrying on connection errors. Returns the response
+        or None if we gave up. This doesn't touch any of the browser
+        state, so it's safe to call from multiple threads.
         """
-        logger.info("%s Fetching url=%s initial=%s" % (
-            ("[+]" if initial else " -"), url, initial,
-        ))
         retries = 3
-        success = True
         while True:
             try:
-                response = self.s.get(url)
-                break
+                if self.cache is None:
+                    return self.s.get(url)
+                prepped = self.s.prepare_request(requests.Request("GET", url))
+                return self.cache.send(self.s, prepped)
             except requests.exceptions.ConnectionError as e:
                 logger.error(" ! Connection error retrying...")
                 logger.error(e)
                 if not retries:
                     logger.error(" ! Connection error, skipping URL...")
-                    return False
+                    return None
                 time.sleep(30)
             retries -= 1
 
+    def _load_response(self, response):
+        """
+        Make a response the currently loaded page. Returns False if
+        the response was blank.
+        """
         if not response.text:
             logger.error(" ! Blank response. Skipping URL...")
             return False
@@ -170,15 +253,29 @@ class RequestsBrowser(BrowserBase, Tagger):
         # block will fix most issues
         if response.encoding and "utf" not in response.encoding.lower():
             response.encoding = response.apparent_encoding
-        self.current_html = response.text
+        html = response.text
         # this check fixes improper decoding of UTF byte order mark
-        if self.current_html[:3] == "ï»¿":
-            self.current_html = self.current_html.encode(
-                response.encoding
-            ).decode("utf-8-sig")
+        if html[:3] == "ï»¿":
+            html = html.encode(response.encoding).decode("utf-8-sig")
 
-        self.current_url = response.url
-        self.dom = self._get_dom()
+        self._set_page(response.url, html)
+        return True
+
+    def fetch(self, url, initial=False):
+        """
+        Fetch a page from a given URL (entry point, typically). Most of
+        the time we just want to click a link or submit a form using
+        webdriver.
+        """
+        logger.info("%s Fetching url=%s initial=%s" % (
+            ("[+]" if initial else " -"), url, initial,
+        ))
+        response = self._get(url)
+        if response is None:
+            return False
+
+        if not self._load_response(response):
+            return False
 
         if initial:
             self.path.append(("fetch", [url], {"initial": initial}))
@@ -199,13 +296,23 @@ class RequestsBrowser(BrowserBase, Tagger):
             return
 
         prev = self.path[-1]
-        if prev[0] == "fetch":
+        if prev[0] in ("fetch", "click"):
             self.graph.move_to_parent()
-            self.fetch(prev[1][0])
+        if self._restore_snapshot():
+            return
 
-        elif prev[0] == "click":
-            self.graph.move_to_parent()
-            self.fetch(prev[2]["url"])
+        # re-fetch the page we came from. inputs don't change the
+        # page URL, so look back past them
+        for name, args, kwargs in reversed(self.path):
+            if name == "fetch":
+                self.fetch(args[0])
+                return
+            elif name == "click":
+                self.fetch(kwargs["url"])
+                return
+            elif name == "submit":
+                logger.error(" ! Form result page no longer available")
+                return
 
     @property
     def page_html(self):
@@ -216,15 +323,29 @@ class RequestsBrowser(BrowserBase, Tagger):
         return self.current_url
 
     def get_clickable(self, **kwargs):
+        if self._clickable is not None:
+            return self._clickable
         logger.debug(" - Getting clickable...")
-        self.dom = self._get_dom()
         tagger = Tagger(
             current_html=self.current_html,
             current_url=self.current_url,
             leave_host=self.leave_host,
+            dom=self.dom, tag_elements=self.tag_elements,
+            canonicalize_url=self.canonicalize_url,
+        )
+        self._clickable = tagger.get_clickable()
+        return self._clickable
+
+    def get_links(self):
+        logger.debug(" - Getting links...")
+        tagger = Tagger(
+            current_html=self.current_html,
+            current_url=self.current_url,
+            leave_host=self.leave_host,
+            dom=self.dom,
+            canonicalize_url=self.canonicalize_url,
         )
-        clickable = tagger.get_clickable()
-        return clickable
+        return tagger.get_links()
 
     # def download_file(self, url):
     #     response = self.s.get(url)
@@ -247,6 +368,7 @@ class RequestsBrowser(BrowserBase, Tagger):
         logger.debug("Input name=%s value=%s" % (input_name, value))
 
         elem.attrib["value"] = input
+        self.dom_modified = True
 
         self.path.append(("input", ("", input,), {}))
         action = {
@@ -262,6 +384,7 @@ class RequestsBrowser(BrowserBase, Tagger):
         constructing the params and sending the request, along
         with the form data.
         """
+        snapshot = self._snapshot()
         form = self.element_by_tag(tag)
         inputs = self.elements_by_path("//input", from_element=form)
 
@@ -293,13 +416,15 @@ class RequestsBrowser(BrowserBase, Tagger):
             **request_kwargs
         )
         prepped = request.prepare()
-        response = self.s.send(prepped)
-        self.current_url = response.url
-        self.current_html = response.text
-        self.dom = self._get_dom()
+        if self.cache is None:
+            response = self.s.send(prepped)
+        else:
+            response = self.cache.send(self.s, prepped)
+        self._set_page(response.url, response.text)
 
         # TODO: all higher level stuff
         if add_node:
+            self.snapshots.append(snapshot)
             self.path.append(("submit", (tag,), {}))
             node = "Submit\n tag: %s" % (tag)
             node_meta = {
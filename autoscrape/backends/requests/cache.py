@@ -0,0 +1,246 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+logger = logging.getLogger('AUTOSCRAPE')
+
+
+class ResponseCache:
+    """
+    A persistent, on-disk cache of HTTP responses, used by the requests
+    backend so that re-running a scrape against the same site doesn't
+    have to download everything again.
+
+    Only GET responses are cached, and not those marked with
+    Cache-Control: no-store. Responses are keyed by method, URL and
+    request body and the bodies are stored content-addressed, by
+    SHA-256, so identical pages are only stored once:
+
+        CACHE_DIR/index.sqlite3            request key => response metadata
+        CACHE_DIR/blobs/ab/abcdef0123...   response bodies
+
+    Cached responses with an ETag or Last-Modified header get
+    revalidated with a conditional GET. Everything else is served
+    straight from the cache. When the total size of the stored bodies
+    exceeds max_size (bytes), the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        if not os.path.exists(self.blob_dir):
+            os.makedirs(self.blob_dir)
+        self.max_size = max_size
+
+        # the concurrent crawler hits the cache from multiple threads
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite3"),
+            check_same_thread=False,
+        )
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                blob TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.db.execute("""
+            CREATE INDEX IF NOT EXISTS entries_accessed
+            ON entries (accessed)
+        """)
+        self.db.commit()
+        self.total_size = self._stored_size()
+
+    def _stored_size(self):
+        row = self.db.execute("""
+            SELECT SUM(size) FROM (
+                SELECT MAX(size) AS size FROM entries GROUP BY blob
+            )
+        """).fetchone()
+        return row[0] or 0
+
+    def _blob_path(self, blob):
+        return os.path.join(self.blob_dir, blob[:2], blob)
+
+    def request_key(self, prepped):
+        """
+        Build the cache key for a prepared request from its method,
+        URL (including query params) and body.
+        """
+        body = prepped.body or b""
+        if not isinstance(body, bytes):
+            body = body.encode("utf-8")
+        h = hashlib.sha256()
+        h.update(prepped.method.upper().encode("utf-8"))
+        h.update(b"\n")
+        h.update(prepped.url.encode("utf-8"))
+        h.update(b"\n")
+        h.update(body)
+        return h.hexdigest()
+
+    def get(self, key):
+        """
+        Return the cached entry for a key, as a dict, or None if
+        we don't have it. Marks the entry as recently used.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, status, headers, blob FROM entries WHERE key=?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE entries SET accessed=? WHERE key=?",
+                (time.time(), key)
+            )
+            self.db.commit()
+
+        url, status, headers, blob = row
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            logger.debug("[!] Cached response body missing: %s" % (url))
+            return None
+
+        return {
+            "url": url,
+            "status": status,
+            "headers": CaseInsensitiveDict(json.loads(headers)),
+            "content": content,
+        }
+
+    def put(self, key, response):
+        """
+        Store a response under a key and evict old entries if we've
+        gone over our size budget.
+        """
+        content = response.content
+        blob = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(blob)
+        headers = json.dumps(dict(response.headers))
+
+        with self.lock:
+            old = self.db.execute(
+                "SELECT blob, size FROM entries WHERE key=?", (key,)
+            ).fetchone()
+            if not os.path.exists(blob_path):
+                blob_dir = os.path.dirname(blob_path)
+                if not os.path.exists(blob_dir):
+                    os.makedirs(blob_dir)
+                with open(blob_path, "wb") as f:
+                    f.write(content)
+                self.total_size += len(content)
+
+            self.db.execute("""
+                INSERT OR REPLACE INTO entries
+                (key, url, status, headers, blob, size, accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                key, response.url, response.status_code, headers, blob,
+                len(content), time.time(),
+            ))
+            # the page changed, so its old body may not be needed
+            if old is not None and old[0] != blob:
+                self._remove_unused_blob(*old)
+            self.db.commit()
+            self._evict()
+
+    def _remove_unused_blob(self, blob, size):
+        """
+        Delete a body from disk if no entry refers to it anymore.
+        """
+        still_used = self.db.execute(
+            "SELECT 1 FROM entries WHERE blob=? LIMIT 1", (blob,)
+        ).fetchone()
+        if still_used:
+            return
+        try:
+            os.remove(self._blob_path(blob))
+        except FileNotFoundError:
+            pass
+        self.total_size -= size
+
+    def _evict(self):
+        """
+        Drop least recently used entries, and the bodies no longer
+        referenced by any entry, until we're under max_size.
+        """
+        if not self.max_size or self.total_size <= self.max_size:
+            return
+
+        rows = self.db.execute(
+            "SELECT key, blob, size FROM entries ORDER BY accessed ASC"
+        )
+        for key, blob, size in rows.fetchall():
+            if self.total_size <= self.max_size:
+                break
+            logger.debug(" - Evicting cached response: %s" % (key))
+            self.db.execute("DELETE FROM entries WHERE key=?", (key,))
+            self._remove_unused_blob(blob, size)
+        self.db.commit()
+
+    def _build_response(self, entry, prepped):
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = entry["headers"]
+        response._content = entry["content"]
+        response.url = entry["url"]
+        response.encoding = get_encoding_from_headers(entry["headers"])
+        response.request = prepped
+        response.reason = "OK (cached)"
+        return response
+
+    def send(self, session, prepped, **kwargs):
+        """
+        Send a prepared request through a requests session, serving it
+        from the cache where we can. Successful GET responses get
+        stored, unless the server asks us not to.
+        """
+        # form posts and the like always go to the server
+        if prepped.method.upper() != "GET":
+            return session.send(prepped, **kwargs)
+
+        key = self.request_key(prepped)
+        entry = self.get(key)
+        if entry is not None:
+            etag = entry["headers"].get("ETag")
+            last_modified = entry["headers"].get("Last-Modified")
+            if not (etag or last_modified):
+                logger.debug(" - Serving from cache: %s" % (prepped.url))
+                return self._build_response(entry, prepped)
+
+            if etag:
+                prepped.headers["If-None-Match"] = etag
+            if last_modified:
+                prepped.headers["If-Modified-Since"] = last_modified
+            response = session.send(prepped, **kwargs)
+            if response.status_code == 304:
+                logger.debug(" - Cached response still valid: %s" % (
+                    prepped.url
+                ))
+                return self._build_response(entry, prepped)
+        else:
+            response = session.send(prepped, **kwargs)
+
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if response.status_code == 200 and "no-store" not in cache_control:
+            self.put(key, response)
+        return response
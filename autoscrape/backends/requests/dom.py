@@ -1,4 +1,6 @@
 # -*- coding: UTF-8 -*-
+from functools import partial
+
 import lxml.html
 # use threads so we can run autoscrape inside celery
 from multiprocessing.pool import ThreadPool
@@ -9,8 +11,15 @@ from urllib.parse import urlparse, ParseResult
 from autoscrape.backends.base.dom import DomBase
 
 
-def download_stylesheet(css_url):
-    response = requests.get(css_url)
+def download_stylesheet(css_url, session=None, cache=None):
+    if cache is None and session is not None:
+        response = session.get(css_url)
+    elif cache is None:
+        response = requests.get(css_url)
+    else:
+        session = session or requests.Session()
+        prepped = session.prepare_request(requests.Request("GET", css_url))
+        response = cache.send(session, prepped)
     data = response.text
     if type(data) == bytes:
         return data.decode("utf-8")
@@ -18,9 +27,13 @@ def download_stylesheet(css_url):
 
 
 class Dom(DomBase):
-    def __init__(self, **kwargs):
+    def __init__(self, dom=None, tag_elements=None, **kwargs):
         super().__init__(**kwargs)
-        self.dom = self._get_dom()
+        # an already parsed DOM can be shared, to avoid re-parsing
+        self.dom = dom if dom is not None else self._get_dom()
+        # tag => element, for tags generated against self.dom. this
+        # needs to be reset whenever self.dom gets replaced
+        self.tag_elements = tag_elements if tag_elements is not None else {}
 
     def _get_dom(self):
         dom = None
@@ -51,9 +64,13 @@ class Dom(DomBase):
         return element.attrib.get(name, default)
 
     def element_by_tag(self, tag):
+        element = self.tag_elements.get(tag)
+        if element is not None:
+            return element
         elements = self.dom.cssselect(tag)
         if not elements:
             return None
+        self.tag_elements[tag] = elements[0]
         return elements[0]
 
     def elements_by_path(self, xpath, from_element=None):
@@ -62,6 +79,9 @@ class Dom(DomBase):
         return from_element.xpath(xpath)
 
     def get_stylesheet(self, fetch_css=False):
+        return "\n".join(self.get_stylesheets())
+
+    def get_stylesheets(self):
         stylesheet_urls = []
         for link in self.dom.xpath("//link"):
             if not link.attrib:
@@ -74,25 +94,44 @@ class Dom(DomBase):
             css_url = self._normalize_url(l_href)
             stylesheet_urls.append(css_url)
 
+        # css URL => text, kept by the browser for the whole crawl so
+        # site-wide stylesheets only get downloaded once
+        stylesheets = getattr(self, "stylesheets", None)
+        if stylesheets is None:
+            stylesheets = {}
+        missing = [
+            css_url for css_url in dict.fromkeys(stylesheet_urls)
+            if css_url not in stylesheets
+        ]
+
+        # the browser's session and response cache, if it has them
+        download = partial(
+            download_stylesheet,
+            session=getattr(self, "s", None),
+            cache=getattr(self, "cache", None),
+        )
+
         pool = None
-        try:
-            pool = ThreadPool(8)
-        except OSError:
-            # operating system/container doesn't support threading
-            pass
+        if len(missing) > 1:
+            try:
+                pool = ThreadPool(min(8, len(missing)))
+            except OSError:
+                # operating system/container doesn't support threading
+                pass
 
         if pool is not None:
-            results = pool.map(download_stylesheet, stylesheet_urls)
+            results = pool.map(download, missing)
             pool.close()
         # fallback to single threaded in case of threading not permitted
         else:
             results = []
-            for css_url in stylesheet_urls:
-                results.append(download_stylesheet(css_url))
+            for css_url in missing:
+                results.append(download(css_url))
+        stylesheets.update(zip(missing, results))
 
-        css = "\n".join(results)
+        css = [stylesheets[css_url] for css_url in stylesheet_urls]
         for style in self.dom.xpath("style"):
-            css += style.text_content()
+            css.append(style.text_content())
         return css
 
     def _normalize_url(self, url):
@@ -112,6 +151,13 @@ class Dom(DomBase):
         normalized = pr.geturl()
         return normalized
 
+    def get_page_text(self):
+        if self.dom is None:
+            return ""
+        return " ".join(self.dom.xpath(
+            "//body//text()[not(ancestor::script) and not(ancestor::style)]"
+        ))
+
     def element_text(self, element, block=False):
         if block and element is not None:
             return element.text_content()
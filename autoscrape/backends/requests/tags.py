@@ -3,13 +3,71 @@ import logging
 
 from autoscrape.backends.base.tags import TaggerBase
 from autoscrape.backends.requests.dom import Dom
+from autoscrape.search.visited import (
+    canonicalize_url as default_canonicalize_url
+)
 
 
 logger = logging.getLogger('AUTOSCRAPE')
 
 
 class Tagger(TaggerBase, Dom):
+    # used to tell whether a link points back to the current page. the
+    # browser passes in its own, configured canonicalizer (see
+    # BrowserBase.setup_visited) so this agrees with the visited store
+    canonicalize_url = default_canonicalize_url
+
+    def __init__(self, canonicalize_url=None, **kwargs):
+        super().__init__(**kwargs)
+        if canonicalize_url is not None:
+            self.canonicalize_url = canonicalize_url
+
+    def _annotate(self):
+        """
+        Compute the tag of every element in the DOM in a single pass,
+        building each one from its (already computed) parent's tag.
+        Returns an element => tag dict, which is kept until the DOM
+        gets replaced.
+        """
+        if getattr(self, "_annotated_dom", None) is self.dom:
+            return self._element_tags
+
+        root = self.dom
+        element_tags = {root: "%s:nth-of-type(1)" % (root.tag)}
+        # iter is in document order, so parents come before children
+        for parent in root.iter():
+            prefix = element_tags.get(parent)
+            if prefix is None:
+                continue
+            counts = {}
+            for child in parent:
+                # skip comments, processing instructions, etc
+                if not isinstance(child.tag, str):
+                    continue
+                nth = counts.get(child.tag, 0) + 1
+                counts[child.tag] = nth
+                element_tags[child] = "%s > %s:nth-of-type(%s)" % (
+                    prefix, child.tag, nth
+                )
+
+        self._annotated_dom = self.dom
+        self._element_tags = element_tags
+        return element_tags
+
     def tag_from_element(self, el):
+        element = el
+        tag = self._annotate().get(element)
+        if tag is None:
+            tag = self._tag_from_ancestors(element)
+        # so element_by_tag doesn't have to run the selector
+        self.tag_elements[tag] = element
+        return tag
+
+    def _tag_from_ancestors(self, el):
+        """
+        Build a tag by walking up from an element to the root. Only
+        used for elements that aren't part of the annotated DOM.
+        """
         path = []
         while el is not None:
             nth = 1
@@ -27,8 +85,7 @@ class Tagger(TaggerBase, Dom):
             )
             path.insert(0, selector)
             el = parent
-        tag = " > ".join(path)
-        return tag
+        return " > ".join(path)
 
     def get_inputs(self, form=None, itype=None, root_node=None):
         return super().get_inputs(form=form, itype=itype, root_node=self.dom)
@@ -43,6 +100,25 @@ class Tagger(TaggerBase, Dom):
         clickable = super().get_clickable(path="//a|//iframe")
         return clickable
 
+    def get_links(self):
+        """
+        Get the URL and text of every clickable link on the current page,
+        as a list of (url, text) tuples. This is the same set of elements
+        get_clickable finds, but skips the tag generation since the
+        concurrent crawler fetches URLs directly instead of clicking.
+        """
+        links = []
+        for element in self.elements_by_path("//a|//iframe"):
+            if not self.clickable_sanity_check(element):
+                continue
+            attr = "href"
+            if self.element_tag_name(element) == "iframe":
+                attr = "src"
+            url = self._normalize_url(self.element_attr(element, attr))
+            text = self.element_text(element).replace("\n", " ")
+            links.append((url, text))
+        return links
+
     def clickable_sanity_check(self, element):
         raw_href = self.element_attr(element, "href")
 
@@ -54,7 +130,8 @@ class Tagger(TaggerBase, Dom):
             return False
 
         href = self._normalize_url(raw_href).split("#")[0]
-        if href.split("#")[0] == self.current_url:
+        if self.canonicalize_url(href) == \
+           self.canonicalize_url(self.current_url):
             return False
 
         # skip any weird protos ... we whitelist notrmal HTTP,
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import hashlib
+import json
 import time
 import logging
 import os
 import re
 import sys
+from urllib.parse import urlsplit
 
 try:
     from selenium import webdriver
@@ -23,13 +25,107 @@ except ModuleNotFoundError:
     pass
 
 from autoscrape.backends.base.browser import BrowserBase
-from autoscrape.backends.selenium.tags import Tagger
+from autoscrape.backends.selenium.ready import (
+    READY_OBSERVER_JS, WAIT_FOR_QUIET_JS
+)
+from autoscrape.backends.selenium.tags import TAG_INFO_JS, Tagger
 from autoscrape.search.graph import Graph
 
 
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+def start_webdriver(driver="Firefox", browser_binary=None, load_images=False,
+                    show_browser=False, page_timeout=None,
+                    remote_hub="http://localhost:4444/wd/hub"):
+    """
+    Launch a new WebDriver session, returning the driver instance.
+    """
+    if page_timeout is None:
+        page_timeout = SeleniumBrowser.DEFAULT_TIMEOUT
+
+    # Needs geckodriver:
+    # https://github.com/mozilla/geckodriver/releases
+    # Version 0.20.1 is recommended as of 14/07/2018
+    if driver == "Firefox":
+        logger.debug(" - Starting Firefox")
+        firefox_options = webdriver.firefox.options.Options()
+        if not show_browser:
+            logger.debug(" - Headless mode enabled")
+            # override beause sometimes FF/Selenium/Geckodriver
+            # will ignore the headless options
+            os.environ["MOZ_HEADLESS"] = "1"
+            firefox_options.add_argument("--headless")
+            firefox_options.add_argument("-headless")
+            firefox_options.headless = True
+        firefox_profile = webdriver.FirefoxProfile()
+        if not load_images:
+            # disable images
+            firefox_profile.set_preference(
+                'permissions.default.image', 2
+            )
+        #  disable flash
+        firefox_profile.set_preference(
+            'dom.ipc.plugins.enabled.libflashplayer.so', 'false'
+        )
+        firefox_profile.set_preference(
+            'security.fileuri.strict_origin_policy', 'false'
+        )
+        binary = None
+        if browser_binary is not None:
+            logger.debug(" - Using binary: %s" % (browser_binary))
+            binary = FirefoxBinary(browser_binary)
+        driver_instance = webdriver.Firefox(
+            options=firefox_options,
+            firefox_profile=firefox_profile,
+            firefox_binary=binary,
+        )
+        driver_instance.set_page_load_timeout(page_timeout)
+
+    # this requires chromedriver to be on the PATH
+    # if using chromium and ubuntu, apt install chromium-chromedriver
+    elif driver == "Chrome":
+        logger.debug(" - Starting Chrome")
+        chrome_options = webdriver.ChromeOptions()
+        if not show_browser:
+            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--disable-web-security")
+            chrome_options.add_argument("--window-size=1920x1080")
+        prefs = {
+            "profile.managed_default_content_settings.images": 2
+        }
+        chrome_options.add_experimental_option("prefs", prefs)
+        if browser_binary is not None:
+            logger.debug(" - Using binary: %s" % (browser_binary))
+            chrome_options.binary_location = browser_binary
+        driver_instance = webdriver.Chrome(chrome_options=chrome_options)
+
+    elif driver == "remote":
+        logger.debug(" - Starting remote browser")
+        driver_instance = webdriver.Remote(
+            command_executor=remote_hub,
+            desired_capabilities={
+                "browserName": "chrome",
+                "goog:chromeOptions": {
+                    "args": [
+                        "--disable-logging",
+                        "--headless",
+                        "--window-size=1920x1080",
+                    ],
+                    "prefs": {
+                        "profile.managed_default_content_settings.images": 2
+                    },
+                    "extensions": [],
+                }
+            })
+    else:
+        raise NotImplementedError("No driver found: %s, exiting." % (
+            driver
+        ))
+
+    return driver_instance
+
+
 class SeleniumBrowser(BrowserBase, Tagger):
     # override a None passed to page_timeout because we need
     # to set an integer value
@@ -40,6 +136,8 @@ class SeleniumBrowser(BrowserBase, Tagger):
                  form_submit_wait=5, output=None, show_browser=False,
                  form_submit_button_selector=None,
                  browser_binary=None, page_timeout=None,
+                 page_quiet_period=0.5, page_quiet_max=3,
+                 webdriver_session=None, strip_query_params=None, visited_bloom_size=None,
                  remote_hub="http://localhost:4444/wd/hub", **kwargs):
         try:
             webdriver
@@ -56,87 +154,23 @@ class SeleniumBrowser(BrowserBase, Tagger):
         if self.timeout is None:
             self.timeout = self.DEFAULT_TIMEOUT
 
-        # Needs geckodriver:
-        # https://github.com/mozilla/geckodriver/releases
-        # Version 0.20.1 is recommended as of 14/07/2018
-        if driver == "Firefox":
-            logger.debug(" - Starting Firefox")
-            firefox_options = webdriver.firefox.options.Options()
-            if not show_browser:
-                logger.debug(" - Headless mode enabled")
-                # override beause sometimes FF/Selenium/Geckodriver
-                # will ignore the headless options
-                os.environ["MOZ_HEADLESS"] = "1"
-                firefox_options.add_argument("--headless")
-                firefox_options.add_argument("-headless")
-                firefox_options.headless = True
-            firefox_profile = webdriver.FirefoxProfile()
-            if not load_images:
-                # disable images
-                firefox_profile.set_preference(
-                    'permissions.default.image', 2
-                )
-            #  disable flash
-            firefox_profile.set_preference(
-                'dom.ipc.plugins.enabled.libflashplayer.so', 'false'
-            )
-            firefox_profile.set_preference(
-                'security.fileuri.strict_origin_policy', 'false'
-            )
-            binary = None
-            if browser_binary is not None:
-                logger.debug(" - Using binary: %s" % (browser_binary))
-                binary = FirefoxBinary(browser_binary)
-            self.driver = webdriver.Firefox(
-                options=firefox_options,
-                firefox_profile=firefox_profile,
-                firefox_binary=binary,
-            )
-            self.driver.set_page_load_timeout(self.timeout)
-
-        # this requires chromedriver to be on the PATH
-        # if using chromium and ubuntu, apt install chromium-chromedriver
-        elif driver == "Chrome":
-            logger.debug(" - Starting Chrome")
-            chrome_options = webdriver.ChromeOptions()
-            if not show_browser:
-                chrome_options.add_argument("--headless")
-                chrome_options.add_argument("--disable-web-security")
-                chrome_options.add_argument("--window-size=1920x1080")
-            prefs = {
-                "profile.managed_default_content_settings.images": 2
-            }
-            chrome_options.add_experimental_option("prefs", prefs)
-            if browser_binary is not None:
-                logger.debug(" - Using binary: %s" % (browser_binary))
-                options.binary_location = browser_binary
-            self.driver = webdriver.Chrome(chrome_options=chrome_options)
-
-        elif driver == "remote":
-            logger.debug(" - Starting remote browser")
-            self.driver = webdriver.Remote(
-                command_executor=remote_hub,
-                desired_capabilities={
-                    "browserName": "chrome",
-                    "goog:chromeOptions": {
-                        "args": [
-                            "--disable-logging",
-                            "--headless",
-                            "--window-size=1920x1080",
-                        ],
-                        "prefs": {
-                            "profile.managed_default_content_settings.images": 2
-                        },
-                        "extensions": [],
-                    }
-                })
+        # use an already running browser, if we've been handed one
+        # (e.g., from a WebDriverPool). it's up to the caller to quit it
+        self.owns_driver = webdriver_session is None
+        if webdriver_session is not None:
+            self.driver = webdriver_session
         else:
-            raise NotImplementedError("No driver found: %s, exiting." % (
-                driver
-            ))
+            self.driver = start_webdriver(
+                driver=driver, browser_binary=browser_binary,
+                load_images=load_images, show_browser=show_browser,
+                page_timeout=self.timeout, remote_hub=remote_hub,
+            )
 
         # set of clicked elements
-        self.visited = set()
+        self.setup_visited(
+            strip_query_params=strip_query_params,
+            visited_bloom_size=visited_bloom_size,
+        )
         # queue of the path that led us to the current page
         # this is in the form of (command, *args, **kwargs)
         self.path = []
@@ -144,9 +178,16 @@ class SeleniumBrowser(BrowserBase, Tagger):
         # whether or not we actually navigated somewhere. stored in window, hist
         # pairs: [[win_1, 1], ..., [win_N, N]]
         self.history_stack = []
+        # scheme://host of every page we've been on. a pooled session
+        # needs cookies cleared on each of these, see WebDriverPool
+        self.visited_origins = set()
         # used for detecting infinite loop inside a form (if the 'next' button
         # never does disabled once at the end of results)
         self.page_hashes = []
+        # the most recent lists of clickable/button tags we generated,
+        # along with the element infos found while tagging them. see
+        # get_tag_infos
+        self.tagged_infos = []
         # tree building
         self.graph = Graph()
         # sometimes the firefox driver loses its pipe to the browser. in
@@ -161,6 +202,17 @@ class SeleniumBrowser(BrowserBase, Tagger):
         # selector to locate submit button, overrides all other
         # selection strategies
         self.form_submit_button_selector = form_submit_button_selector
+        # seconds without DOM changes or network requests before we
+        # consider a page ready. zero falls back to fixed sleeps
+        self.page_quiet_period = float(page_quiet_period or 0)
+        # longest we'll wait for a page to go quiet after an action.
+        # some pages never do (tickers, long-polling), so this is kept
+        # well under the page timeout
+        self.page_quiet_max = float(page_quiet_max or 0) or 3
+        if self.page_quiet_period:
+            # our quiet check is an async script, which can run up
+            # to the page timeout
+            self.driver.set_script_timeout(self.timeout + 5)
 
     def _driver_exec(self, fn, *args, **kwargs):
         """
@@ -192,13 +244,21 @@ class SeleniumBrowser(BrowserBase, Tagger):
 
             pipe_retries += 1
 
-    def __del__(self):
+    def quit(self):
+        """
+        Shut down the browser, unless it was handed to us.
+        """
+        if not getattr(self, "owns_driver", False):
+            return
         if hasattr(self, "driver") and self.driver:
             try:
                 self.driver.quit()
             except Exception:
                 pass
 
+    def __del__(self):
+        self.quit()
+
     def _get_history_depth(self):
         """
         Retrieve the browser history depth for use in detecting
@@ -243,6 +303,62 @@ class SeleniumBrowser(BrowserBase, Tagger):
         logger.debug(" - Page loaded in %s seconds" % (time.time() - s))
         return result == "complete"
 
+    def _install_ready_observer(self):
+        """
+        Start watching the current page for DOM changes and network
+        requests, so that anything kicked off by our next action gets
+        waited on.
+        """
+        try:
+            self.driver.execute_script(READY_OBSERVER_JS)
+        except WebDriverException as e:
+            logger.debug("[!] Couldn't install ready observer: %s" % (e))
+
+    def _wait_for_quiet(self, max_wait=None):
+        """
+        Wait, up to max_wait seconds (defaults to page_quiet_max), for
+        the page to be loaded and quiet: no DOM changes and no network
+        requests for page_quiet_period seconds. Requests that have been
+        open for longer than page_quiet_max are ignored. Returns True if
+        the page went quiet, False if we ran out of time.
+        """
+        if max_wait is None:
+            max_wait = self.page_quiet_max
+        deadline = time.time() + max_wait
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                return self.driver.execute_async_script(
+                    WAIT_FOR_QUIET_JS,
+                    int(self.page_quiet_period * 1000),
+                    int(remaining * 1000),
+                    int(self.page_quiet_max * 1000),
+                )
+            except TimeoutException:
+                return False
+            except WebDriverException as e:
+                # the page navigated away while we were checking it,
+                # so try again on the new one
+                logger.debug(" - Page changed during ready check: %s" % (e))
+                time.sleep(0.05)
+
+    def wait_for_page(self, seconds):
+        """
+        Wait for a page to settle after an action. With quiet detection
+        enabled this returns as soon as the page goes quiet, waiting
+        at most the given number of seconds. Otherwise it just sleeps.
+        """
+        if not self.page_quiet_period:
+            time.sleep(seconds)
+            return
+        s = time.time()
+        quiet = self._wait_for_quiet(max_wait=seconds)
+        logger.debug(" - Page %s after %.2f seconds" % (
+            "quiet" if quiet else "still busy", time.time() - s
+        ))
+
     def _loadwait(self, fn, *args, **kwargs):
         """
         Run a driver interaction function, wait for the page to
@@ -257,8 +373,12 @@ class SeleniumBrowser(BrowserBase, Tagger):
         # get any element as a reference for staleness check
         elem = self.driver.find_element_by_xpath("//*")
 
+        if self.page_quiet_period:
+            self._install_ready_observer()
+
         self._driver_exec(fn, *args, **kwargs)
-        time.sleep(1)
+        if not self.page_quiet_period:
+            time.sleep(1)
 
         if check_alerts:
             logger.debug("[.] Checking for popup alerts...")
@@ -278,9 +398,26 @@ class SeleniumBrowser(BrowserBase, Tagger):
         wait = WebDriverWait(self.driver, self.timeout)
         wait.until(self._wait_check)
 
+        if self.page_quiet_period:
+            logger.debug(" - Waiting for page to go quiet...")
+            self._wait_for_quiet()
+
+        self._note_origin()
+
         t = time.time() - start
         logger.debug(" - Wait for load succeeded in %s" % t)
 
+    def _note_origin(self):
+        """
+        Record the origin of the page we ended up on (after any
+        redirects) in visited_origins.
+        """
+        parts = urlsplit(self.page_url)
+        if parts.scheme in ("http", "https") and parts.netloc:
+            self.visited_origins.add(
+                "%s://%s" % (parts.scheme, parts.netloc)
+            )
+
     def scrolltoview(self, elem):
         """
         Scroll to an element before we interact with it.
@@ -369,6 +506,8 @@ class SeleniumBrowser(BrowserBase, Tagger):
         hash_parts = []
         hash_parts.append(self._driver_exec(elem.tag_name))
         href = self._driver_exec(elem.get_attribute, "href")
+        if href:
+            href = self.canonicalize_url(href)
         hash_parts.append(href)
         hash_parts.append(self._driver_exec(elem.get_attribute, "onclick"))
         text = self._driver_exec(elem.text)
@@ -410,10 +549,10 @@ class SeleniumBrowser(BrowserBase, Tagger):
         # apply form submit waits to 'next' button clicks
         if iterating_form and self.form_submit_wait:
             logger.debug(
-                " - Forcing post-submit wait period of %ss" %
+                " - Post-submit wait period of up to %ss" %
                 self.form_submit_wait
             )
-            time.sleep(self.form_submit_wait)
+            self.wait_for_page(self.form_submit_wait)
 
         depth = self._get_history_depth()
         window = self._get_open_windows()[-1]
@@ -654,10 +793,10 @@ class SeleniumBrowser(BrowserBase, Tagger):
         # TODO: better way to wait for this, post-alert clicked
         if self.form_submit_wait:
             logger.debug(
-                " - Forcing post-submit wait period of %ss" %
+                " - Post-submit wait period of up to %ss" %
                 self.form_submit_wait
             )
-            time.sleep(self.form_submit_wait)
+            self.wait_for_page(self.form_submit_wait)
 
         # move to the node if we're successful (got here, so we assume)
         self.graph.move_to_node(node)
@@ -716,7 +855,40 @@ class SeleniumBrowser(BrowserBase, Tagger):
             driver=self.driver, current_url=current_url,
             leave_host=self.leave_host,
         )
-        return tagger.get_clickable()
+        tags = tagger.get_clickable()
+        self._keep_tag_infos(tags, tagger.tag_infos)
+        return tags
+
+    def _keep_tag_infos(self, tags, tag_infos):
+        self.tagged_infos = self.tagged_infos[-3:] + [(tags, tag_infos)]
+
+    def get_tag_infos(self, tags):
+        # the tagger already got these, when it generated the tags
+        for tagged, tag_infos in self.tagged_infos:
+            if tagged is tags and all(tag in tag_infos for tag in tags):
+                return [tag_infos[tag] for tag in tags]
+        try:
+            return json.loads(
+                self.driver.execute_script(TAG_INFO_JS, list(tags))
+            )
+        except Exception as e:
+            logger.debug("[!] Batched tag info lookup failed: %s" % (e))
+            return None
+
+    def get_link_urls(self, tags):
+        # resolved href/src properties for all the tags in one call
+        script = """
+            return arguments[0].map(function(tag) {
+                var el = document.querySelector(tag);
+                if (!el) return null;
+                return el.href || el.src || null;
+            });
+        """
+        try:
+            return self.driver.execute_script(script, list(tags))
+        except Exception as e:
+            logger.debug("[!] Batched link URL lookup failed: %s" % (e))
+            return super().get_link_urls(tags)
 
     def get_forms(self):
         current_url = self._driver_exec(self.page_url)
@@ -733,7 +905,9 @@ class SeleniumBrowser(BrowserBase, Tagger):
             driver=self.driver, current_url=current_url,
             leave_host=self.leave_host,
         )
-        return tagger.get_buttons()
+        tags = tagger.get_buttons()
+        self._keep_tag_infos(tags, tagger.tag_infos)
+        return tags
 
     def get_screenshot(self):
         """
@@ -121,23 +121,25 @@ class Dom(DomBase):
         return FrameTransparentList(elements, driver=self.driver)
 
     def get_stylesheet(self):
+        return "".join(self.get_stylesheets())
+
+    def get_stylesheets(self):
         script = """
         return [].slice.call(document.styleSheets)
-          .reduce((prev, styleSheet) => {
+          .map((styleSheet) => {
             try {
               if (styleSheet.cssRules) {
-                return prev +
-                  [].slice.call(styleSheet.cssRules)
-                    .reduce(function (prev, cssRule) {
-                      return prev + cssRule.cssText;
-                    }, '');
+                return [].slice.call(styleSheet.cssRules)
+                  .reduce(function (prev, cssRule) {
+                    return prev + cssRule.cssText;
+                  }, '');
               } else {
-                  return prev;
+                  return '';
               }
             } catch (e) {
-              return prev + `@import url("${styleSheet.href}");`
+              return `@import url("${styleSheet.href}");`
             }
-          }, '');"""
+          });"""
         return self.driver.execute_script(script)
 
     def _text_via_many_means(self, el):
@@ -176,6 +178,11 @@ class Dom(DomBase):
 
         return " ".join(text).replace("\n", "").strip()
 
+    def get_page_text(self):
+        return self.driver.execute_script(
+            "return document.body ? document.body.innerText : '';"
+        ) or ""
+
     def element_text(self, element, block=False):
         """
         Get the text for all elements either under a given element
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+
+try:
+    from selenium.common.exceptions import WebDriverException
+except ModuleNotFoundError:
+    # we haven't installed selenium backend deps
+    pass
+
+from autoscrape.backends.selenium.browser import start_webdriver
+
+
+logger = logging.getLogger('AUTOSCRAPE')
+
+
+class WebDriverPool:
+    """
+    Keeps WebDriver sessions alive between scrapes, so that each scrape
+    doesn't have to pay for launching a new browser. Sessions are keyed
+    by the options they were launched with and get reset (cookies and
+    storage cleared, extra windows closed, a fresh blank window opened)
+    before being handed out again.
+
+    Sessions that fail a health check, have been used max_uses times,
+    or (where the browser reports it) are using more than max_memory
+    megabytes of JS heap are quit instead of being reused. So are
+    sessions that visited more than max_reset_origins sites, or that
+    we don't know the visited sites of, since we can only clear
+    cookies one site at a time.
+    """
+    # options that affect how a browser gets launched. anything else is
+    # per-scrape and handled by SeleniumBrowser
+    LAUNCH_OPTIONS = [
+        "driver", "browser_binary", "load_images", "show_browser",
+        "page_timeout", "remote_hub",
+    ]
+
+    def __init__(self, max_uses=50, max_memory=None, max_reset_origins=20):
+        self.max_uses = max_uses
+        self.max_memory = max_memory
+        self.max_reset_origins = max_reset_origins
+        # launch key => [idle driver, ...]
+        self.idle = {}
+        # driver => launch key
+        self.keys = {}
+        # driver => number of times it's been handed out
+        self.uses = {}
+        self.lock = threading.Lock()
+
+    def launch_options(self, options):
+        """
+        Pick out the launch options from a dict of scraper options.
+        """
+        launch = {}
+        for name in self.LAUNCH_OPTIONS:
+            if options.get(name) is not None:
+                launch[name] = options[name]
+        if "page_timeout" in launch:
+            launch["page_timeout"] = int(launch["page_timeout"])
+        return launch
+
+    def acquire(self, **options):
+        """
+        Get a healthy, reset WebDriver session launched with the given
+        options, starting a new one if none are idle.
+        """
+        launch = self.launch_options(options)
+        key = tuple(sorted(launch.items()))
+        while True:
+            with self.lock:
+                idle = self.idle.get(key)
+                driver = idle.pop() if idle else None
+            if driver is None:
+                break
+            if self._healthy(driver):
+                logger.debug("[.] Reusing browser session")
+                with self.lock:
+                    self.uses[driver] += 1
+                return driver
+            self._discard(driver)
+
+        logger.debug("[.] Starting new browser session")
+        driver = start_webdriver(**launch)
+        with self.lock:
+            self.keys[driver] = key
+            self.uses[driver] = 1
+        return driver
+
+    def release(self, driver, origins=None):
+        """
+        Return a session to the pool, resetting it for the next scrape.
+        Origins are the scheme://host of every page the scrape visited
+        (see SeleniumBrowser.visited_origins). Sessions that are worn
+        out or broken, or that we can't fully reset, get quit instead.
+        """
+        if self.uses.get(driver, 0) >= self.max_uses:
+            logger.debug("[.] Browser session reached max uses, recycling")
+            self._discard(driver)
+            return
+        if origins is None or len(origins) > self.max_reset_origins:
+            logger.debug("[.] Browser session visited %s sites, recycling" % (
+                "unknown" if origins is None else len(origins)
+            ))
+            self._discard(driver)
+            return
+        if not self._healthy(driver, check_memory=True) or \
+           not self._reset(driver, origins):
+            self._discard(driver)
+            return
+        with self.lock:
+            self.idle.setdefault(self.keys[driver], []).append(driver)
+
+    def close(self):
+        """
+        Quit all idle sessions.
+        """
+        with self.lock:
+            drivers = [d for idle in self.idle.values() for d in idle]
+            self.idle = {}
+        for driver in drivers:
+            self._discard(driver)
+
+    def _healthy(self, driver, check_memory=False):
+        try:
+            if driver.execute_script("return 1;") != 1:
+                return False
+            if not driver.window_handles:
+                return False
+            if check_memory and self.max_memory:
+                # only chrome exposes this
+                heap = driver.execute_script("""
+                    if (window.performance && window.performance.memory)
+                        return window.performance.memory.usedJSHeapSize;
+                    return null;
+                """)
+                if heap and heap > self.max_memory * 1024 * 1024:
+                    logger.debug("[.] Browser session using %s bytes" % heap)
+                    return False
+        except WebDriverException as e:
+            logger.debug("[!] Browser session failed health check: %s" % e)
+            return False
+        return True
+
+    def _reset(self, driver, origins):
+        """
+        Clear out everything a scrape left behind on the given origins.
+        Returns False if the session couldn't be reset.
+        """
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            # WebDriver can only delete cookies (and we can only clear
+            # storage) for the current page's site, so go to each one.
+            # robots.txt is a cheap page that doesn't run any scripts
+            self._clear_page(driver)
+            for origin in sorted(origins):
+                driver.get("%s/robots.txt" % origin)
+                self._clear_page(driver)
+            # chrome lets us clear all of them at once, including any
+            # set by third-party frames
+            if hasattr(driver, "execute_cdp_cmd"):
+                try:
+                    driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                except WebDriverException:
+                    pass
+            # there's no way to clear a window's history, so swap the
+            # window for a new one
+            driver.execute_script("window.open('about:blank', '_blank');")
+            new_handles = [h for h in driver.window_handles if h != handles[0]]
+            if new_handles:
+                driver.close()
+                driver.switch_to.window(new_handles[0])
+            driver.get("about:blank")
+        except WebDriverException as e:
+            logger.debug("[!] Couldn't reset browser session: %s" % e)
+            return False
+        return True
+
+    def _clear_page(self, driver):
+        """
+        Delete the cookies and storage for the current page's site.
+        """
+        driver.execute_script("""
+            try {
+                window.localStorage.clear();
+                window.sessionStorage.clear();
+            } catch (e) {}
+        """)
+        driver.delete_all_cookies()
+
+    def _discard(self, driver):
+        with self.lock:
+            self.keys.pop(driver, None)
+            self.uses.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
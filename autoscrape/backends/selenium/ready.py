@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# JavaScript used by the Selenium backend to tell when a page has
+# finished loading. Instead of sleeping for a fixed amount of time, we
+# inject an observer that records the last time the DOM changed or a
+# XHR/fetch request started or finished, and then wait until the page
+# has been quiet for a given period.
+
+# Installs the observer into the current document, if it isn't already
+# there. State is kept in window.__autoscrapeReady:
+#   lastActivity: time (ms) of the most recent DOM mutation/request
+#   pending: request ID => start time (ms), for XHR/fetch requests
+#       that haven't finished
+#   unloading: the page is navigating away, so it can't be ready
+READY_OBSERVER_JS = """
+    if (!window.__autoscrapeReady) {
+        var state = window.__autoscrapeReady = {
+            lastActivity: Date.now(),
+            pending: {},
+            nextId: 0,
+            unloading: false
+        };
+        var touch = function() {
+            state.lastActivity = Date.now();
+        };
+        new MutationObserver(touch).observe(document, {
+            childList: true, subtree: true, attributes: true,
+            characterData: true
+        });
+        window.addEventListener("beforeunload", function() {
+            state.unloading = true;
+        });
+
+        // returns a function to call once the request finishes
+        var track = function() {
+            var id = state.nextId++;
+            state.pending[id] = Date.now();
+            touch();
+            return function() {
+                delete state.pending[id];
+                touch();
+            };
+        };
+
+        var send = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function() {
+            this.addEventListener("loadend", track());
+            return send.apply(this, arguments);
+        };
+
+        if (window.fetch) {
+            var fetch = window.fetch;
+            window.fetch = function() {
+                var done = track();
+                var promise = fetch.apply(this, arguments);
+                promise.then(done, done);
+                return promise;
+            };
+        }
+    }
+"""
+
+# Async script: arguments[0] is the quiet period, arguments[1] the max
+# time to wait and arguments[2] the longest a request can be in flight
+# and still hold us up, all in milliseconds. Calls back with true once
+# the page is loaded, has no (recent) requests in flight and hasn't
+# changed for the quiet period, or with false if we ran out of time.
+# Ignoring old requests keeps long-polls and other connections that
+# never finish from making every wait on the page run out of time.
+WAIT_FOR_QUIET_JS = READY_OBSERVER_JS + """
+    var quiet = arguments[0];
+    var timeout = arguments[1];
+    var maxRequestAge = arguments[2];
+    var callback = arguments[arguments.length - 1];
+    var state = window.__autoscrapeReady;
+    var start = Date.now();
+    var inFlight = function(now) {
+        for (var id in state.pending) {
+            if (now - state.pending[id] < maxRequestAge) {
+                return true;
+            }
+        }
+        return false;
+    };
+    var check = function() {
+        var now = Date.now();
+        if (!state.unloading &&
+            document.readyState === "complete" &&
+            !inFlight(now) &&
+            now - state.lastActivity >= quiet) {
+            return callback(true);
+        }
+        if (now - start >= timeout) {
+            return callback(false);
+        }
+        setTimeout(check, 50);
+    };
+    check();
+"""
@@ -1,13 +1,145 @@
 # -*- coding: utf-8 -*-
+import json
 import logging
 
-from autoscrape.backends.base.tags import TaggerBase
+from autoscrape.backends.base.tags import (
+    TaggerBase, group_inputs, input_groups
+)
 from autoscrape.backends.selenium.dom import Dom
 
 
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+# Modified from: https://stackoverflow.com/a/12222317
+GET_PATH_TO_JS = """
+    var getPathTo = function(el) {
+        if (!(el instanceof Element))
+            return;
+        var path = [];
+        while (el.nodeType === Node.ELEMENT_NODE) {
+            // if (el.id) {
+            //   path.unshift(`#${el.id}`);
+            //   break;
+            // }
+            var selector = el.nodeName.toLowerCase();
+            // // NOTE: we removed this because web pages often use
+            // // strange characters in ID names which cause the CSS
+            // // selector to fail upon lookup. If we only use traversal
+            // // methods, we don't have that webpage-specific problem
+            // if (el.id) {
+            //     selector += '#' + el.id;
+            //     path.unshift(selector);
+            //     break;
+            // }
+
+            var sib = el, nth = 1;
+            while (sib = sib.previousElementSibling) {
+                if (sib.nodeName.toLowerCase() == selector)
+                   nth++;
+            }
+
+            // // NOTE: always give a nth-of-type tag, even if
+            // // if there's only a single sibling, just to be
+            // // extra-specific
+            // if (nth != 1)
+
+            selector += ":nth-of-type("+nth+")";
+            path.unshift(selector);
+            el = el.parentNode;
+        }
+        return path.join(" > ");
+    }
+"""
+
+# An element's text the same way Dom.element_text gets it, one element
+# at a time: its visible text, title, placeholder, image alt texts and,
+# for inputs, value
+ELEMENT_TEXT_JS = """
+    var getElementText = function(el) {
+        var text = [];
+        var inner = (el.innerText || "").trim();
+        if (inner)
+            text.push(inner);
+        var title = el.getAttribute("title");
+        if (title)
+            text.push(title.trim());
+        var placeholder = el.getAttribute("placeholder");
+        if (placeholder)
+            text.push(placeholder.trim());
+        var imgs = el.getElementsByTagName("img");
+        for (var j = 0; j < imgs.length; j++)
+            text.push(imgs[j].getAttribute("alt") || "");
+        if (el.nodeName.toLowerCase() === "input")
+            text.push(el.value || "");
+        return text.join(" ").replace(/\\n/g, "").trim();
+    }
+    var getElementValue = function(el) {
+        if (typeof el.value === "string")
+            return el.value;
+        return el.getAttribute("value");
+    }
+"""
+
+# Evaluate an XPath and describe every matching element in one round
+# trip: its tag, whether it's visible/enabled, its text and value and
+# the attributes the sanity checks need. Returns a JSON array.
+ELEMENT_INFO_JS = GET_PATH_TO_JS + ELEMENT_TEXT_JS + """
+    var context = arguments[1] || document;
+    var result = document.evaluate(
+        arguments[0], context, null,
+        XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    var infos = [];
+    for (var i = 0; i < result.snapshotLength; i++) {
+        var el = result.snapshotItem(i);
+        if (!(el instanceof Element))
+            continue;
+        var style = window.getComputedStyle(el);
+        var displayed = (
+            el.offsetWidth > 0 || el.offsetHeight > 0 ||
+            el.getClientRects().length > 0
+        ) && style.visibility !== "hidden" && style.display !== "none";
+        // like WebElement.get_attribute, prefer the (resolved) property
+        var href = el.href;
+        if (typeof href !== "string")
+            href = el.getAttribute("href");
+        var type = el.type;
+        if (typeof type !== "string")
+            type = el.getAttribute("type");
+        infos.push({
+            "tag": getPathTo(el),
+            "node": el.nodeName.toLowerCase(),
+            "displayed": displayed,
+            "enabled": !el.disabled,
+            "href": href,
+            "type": type,
+            "type_attr": el.getAttribute("type"),
+            "structure": el.getAttribute("structure"),
+            "name": el.getAttribute("name"),
+            "text": getElementText(el),
+            "value": getElementValue(el),
+        });
+    }
+    return JSON.stringify(infos);
+"""
+
+# Text and value of the elements for a list of tags, see
+# Browser.get_tag_infos
+TAG_INFO_JS = ELEMENT_TEXT_JS + """
+    return JSON.stringify(arguments[0].map(function(tag) {
+        var el = document.querySelector(tag);
+        if (!el)
+            return null;
+        return {
+            "node": el.nodeName.toLowerCase(),
+            "text": getElementText(el),
+            "value": getElementValue(el),
+        };
+    }));
+"""
+
+
 class Tagger(TaggerBase, Dom):
     """
     Generates tags from a given page that can be used, in a stateless manner,
@@ -17,6 +149,9 @@ class Tagger(TaggerBase, Dom):
     def __init__(self, driver=None, current_url=None, leave_host=False):
         super().__init__(current_url=current_url, leave_host=leave_host)
         self.driver = driver
+        # tag => element info, for the clickable and button tags found,
+        # so their text doesn't need looking up again
+        self.tag_infos = {}
 
     def tag_from_element(self, element):
         """
@@ -27,45 +162,7 @@ class Tagger(TaggerBase, Dom):
 
         Modified from: https://stackoverflow.com/a/12222317
         """
-        script = """
-            var getPathTo = function(el) {
-                if (!(el instanceof Element))
-                    return;
-                var path = [];
-                while (el.nodeType === Node.ELEMENT_NODE) {
-                    // if (el.id) {
-                    //   path.unshift(`#${el.id}`);
-                    //   break;
-                    // }
-                    var selector = el.nodeName.toLowerCase();
-                    // // NOTE: we removed this because web pages often use
-                    // // strange characters in ID names which cause the CSS
-                    // // selector to fail upon lookup. If we only use traversal
-                    // // methods, we don't have that webpage-specific problem
-                    // if (el.id) {
-                    //     selector += '#' + el.id;
-                    //     path.unshift(selector);
-                    //     break;
-                    // }
-
-                    var sib = el, nth = 1;
-                    while (sib = sib.previousElementSibling) {
-                        if (sib.nodeName.toLowerCase() == selector)
-                           nth++;
-                    }
-
-                    // // NOTE: always give a nth-of-type tag, even if
-                    // // if there's only a single sibling, just to be
-                    // // extra-specific
-                    // if (nth != 1)
-
-                    selector += ":nth-of-type("+nth+")";
-                    path.unshift(selector);
-                    el = el.parentNode;
-                }
-                return path.join(" > ");
-            }
-
+        script = GET_PATH_TO_JS + """
             // NOTE: this used to have a toLowerCase on it, but it caused
             // problems with some pages. Leaving it as it was found in the
             // original DOM is best here.
@@ -82,8 +179,114 @@ class Tagger(TaggerBase, Dom):
             return False
         return super().clickable_sanity_check(element)
 
+    def element_infos(self, xpath, from_element=None):
+        """
+        Find all elements matching an XPath and get their tags,
+        visibility and attributes in a single script call, instead of a
+        WebDriver round trip (or several) per element. Returns a list of
+        dicts or None if the script failed, in which case callers should
+        fall back to going element by element.
+        """
+        if from_element is self.driver:
+            from_element = None
+        try:
+            infos_json = self.driver.execute_script(
+                ELEMENT_INFO_JS, xpath, from_element
+            )
+            return json.loads(infos_json)
+        except Exception as e:
+            logger.debug("[!] Batched element lookup failed: %s" % (e))
+            return None
+
+    def _info_displayed(self, info):
+        return info["displayed"] and info["enabled"]
+
     def get_inputs(self, form=None, itype=None, root_node=None):
-        return super().get_inputs(form=form, itype=itype, root_node=self.driver)
+        x_path = "//input"
+        if itype == "select":
+            x_path = "//select"
+        elif itype == "date":
+            x_path = "//input[@type='date']|//input[@structure='date']"
+        elif itype:
+            x_path = "//input[@type='%s']" % (itype)
+
+        if form is not None:
+            x_path = ".%s" % x_path
+
+        infos = self.element_infos(x_path, from_element=form)
+        if infos is None:
+            return super().get_inputs(
+                form=form, itype=itype, root_node=self.driver
+            )
+
+        tags = []
+        # radio checkboxes are grouped by name
+        if itype == "radio":
+            radio_names = []
+            for info in infos:
+                if info["name"] not in radio_names:
+                    radio_names.append(info["name"])
+                    tags.append([])
+                tags[radio_names.index(info["name"])].append(info["tag"])
+            return tags
+
+        for info in infos:
+            if not self._info_displayed(info):
+                continue
+            if info["type"] == "hidden":
+                continue
+            tags.append(info["tag"])
+        return tags
+
+    def get_forms(self):
+        infos = self.element_infos("//form")
+        if infos is None:
+            return super().get_forms()
+
+        tags = {}
+        for info in infos:
+            if not self._info_displayed(info):
+                continue
+            form = self.element_by_tag(info["tag"])
+            tags[info["tag"]] = self.get_form_inputs(form)
+        return tags
+
+    def get_form_inputs(self, form):
+        infos = self.element_infos(".//input|.//select", from_element=form)
+        if infos is None:
+            return super().get_form_inputs(form)
+
+        inputs = []
+        for info in infos:
+            itypes = input_groups(
+                info["node"], itype=info["type_attr"],
+                structure=info["structure"],
+            )
+            if not itypes:
+                continue
+            # radio checkboxes aren't checked for visibility
+            if itypes != ["radio"] and (
+                    not self._info_displayed(info) or
+                    info["type"] == "hidden"):
+                continue
+            inputs.append((itypes, info["tag"], info["name"]))
+        return group_inputs(inputs)
+
+    def get_buttons(self, in_form=False, path=None):
+        x_path = path or "|".join([
+            "//form//a", "//button", "//input[@type='button']",
+            "//input[@type='submit']", "//table//a",
+        ])
+        infos = self.element_infos(x_path)
+        if infos is None:
+            return super().get_buttons(in_form=in_form, path=path)
+        tags = []
+        for info in infos:
+            if not self._info_displayed(info):
+                continue
+            self.tag_infos[info["tag"]] = info
+            tags.append(info["tag"])
+        return tags
 
     def get_clickable(self, path=None):
         """
@@ -96,4 +299,17 @@ class Tagger(TaggerBase, Dom):
             "//a", "//button", "//input[@type='submit']",
             "//input[@type='button']"
         ])
-        return super().get_clickable(path=xpath)
+        infos = self.element_infos(xpath)
+        if infos is None:
+            return super().get_clickable(path=xpath)
+
+        tags = []
+        for info in infos:
+            if not self._info_displayed(info) or not info["href"]:
+                continue
+            if not TaggerBase.clickable_sanity_check(
+                    self, None, href=info["href"]):
+                continue
+            self.tag_infos[info["tag"]] = info
+            tags.append(info["tag"])
+        return tags
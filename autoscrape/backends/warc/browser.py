@@ -1,14 +1,15 @@
 # -*- coding: UTF-8 -*-
-import io
 import logging
-import os
-import pickle
 import sys
+from collections import deque
 
 from autoscrape.backends.requests.browser import RequestsBrowser
 from autoscrape.backends.requests.tags import Tagger
 from autoscrape.search.graph import Graph
-from autoscrape.util.warc import build_warc_index, _warc_records
+from autoscrape.util.warc import (
+    WARCRecordCache, build_warc_index, decode_index_value,
+    migrate_warc_index, read_warc_record, warc_file_path,
+)
 
 
 logger = logging.getLogger('AUTOSCRAPE')
@@ -23,7 +24,10 @@ except ModuleNotFoundError:
 
 class WARCBrowser(RequestsBrowser):
     def __init__(self, warc_index_file=None, warc_directory=None,
-                 filter_domain=None, leave_host=False, **kwargs):
+                 filter_domain=None, leave_host=False,
+                 snapshot_stack_size=10, warc_index_workers=4,
+                 warc_cache_size=64 * 1024 * 1024, strip_query_params=None,
+                 visited_bloom_size=None, **kwargs):
         try:
             warcio
         except NameError:
@@ -47,28 +51,24 @@ class WARCBrowser(RequestsBrowser):
         # only build index for a specific domain
         self.filter_domain = filter_domain
 
-        # WARC index: URL => (filename, record_number)
+        # WARC index: URL => (file_id, record_offset, record_length)
         self.warc_index = plyvel.DB(self.warc_index_file, create_if_missing=True)
+        migrate_warc_index(self.warc_index, filter_domain=self.filter_domain)
         build_warc_index(
             db=self.warc_index, warc_directory=self.warc_directory,
-            filter_domain=self.filter_domain
+            filter_domain=self.filter_domain,
+            processes=int(warc_index_workers or 1),
+        )
+        # WARC file ID => filepath
+        self.warc_files = {}
+        # recently read records, bounded by warc_cache_size (bytes)
+        self.record_cache = WARCRecordCache(max_size=warc_cache_size)
+
+        # canonical URLs of clicked links
+        self.setup_visited(
+            strip_query_params=strip_query_params,
+            visited_bloom_size=visited_bloom_size,
         )
-        # WARC cache: filename => [record1, ..., recordN]
-        self.warc_cache = {}
-        self.warc_directory = warc_directory
-
-        # how many WARC files to keep in memory at a given time
-        # since the crawls are sequential, most files for a site
-        # will exist in a segment of a few WARC files.
-        self.warc_cache_size = 2
-        # we're going to store the order the files have have been
-        # accessed most recently here:
-        #     [most_recently_used_filename, ..., least_recently_used_filename]
-        # This will be used to enforce our cache size.
-        self.warc_cache_stack = []
-
-        # set of clicked elements
-        self.visited = set()
 
         # queue of the path that led us to the current page
         # this is in the form of (command, *args, **kwargs)
@@ -80,30 +80,17 @@ class WARCBrowser(RequestsBrowser):
         # setting to False, ensures crawl will stay on same host
         self.leave_host = leave_host
 
+        # pages we clicked away from, see RequestsBrowser
+        self.snapshots = deque(maxlen=int(snapshot_stack_size or 0))
+
+        # everything is already on disk, no need for a response cache
+        self.cache = None
+
         self.current_url = None
         self.current_html = None
-
-    def _load_warc_file(self, filename):
-        """
-        Take a specified WARC file, load it and keep it in memory in a quickly
-        readable format (python dict). This operates directly on the class
-        variable self.warc_cache and also handles maximum cache size pruning.
-        """
-        logger.debug("[-] Loading WARC file: %s" % (filename))
-        if len(self.warc_cache_stack) > self.warc_cache_size:
-            least_used = self.warc_cache_stack.pop()
-            logger.debug(" - Removing WARC from memory: %s" % (filename))
-            del self.warc_cache[least_used]
-
-        self.warc_cache[filename] = []
-        for record in _warc_records(filename):
-            payload = record["payload"]
-            if not payload:
-                payload = "<html></html>"
-            self.warc_cache[filename].append({
-                "header": record["headers"],
-                "payload": payload,
-            })
+        self.tag_elements = {}
+        self._clickable = None
+        self.dom_modified = False
 
     def fetch(self, url, initial=False):
         """
@@ -118,26 +105,24 @@ class WARCBrowser(RequestsBrowser):
         if not data:
             logger.debug("[!] Couldn't find URL in WARC index: %s" % (url))
             return False
-        else:
-            filename, record_number = pickle.loads(data)
-            logger.debug(" -  Loading filename: %s record number: %s" % (
-                filename, record_number
-            ))
-            if filename not in self.warc_cache:
-                self._load_warc_file(filename)
-            warcfile = self.warc_cache[filename]
-            record = warcfile[record_number]
-            self.current_html = record["payload"]
 
-            try:
-                self.warc_cache_stack.remove(filename)
-            except ValueError:
-                pass
-
-            self.warc_cache_stack.insert(0, filename)
-
-        self.current_url = url
-        self.dom = self._get_dom()
+        file_id, offset, length = decode_index_value(data)
+        if file_id not in self.warc_files:
+            self.warc_files[file_id] = warc_file_path(self.warc_index, file_id)
+        record = self.record_cache.get((file_id, offset))
+        if record is None:
+            filename = self.warc_files[file_id]
+            logger.debug(" -  Loading filename: %s offset: %s" % (
+                filename, offset
+            ))
+            record = read_warc_record(filename, offset, length)
+            if record is None:
+                logger.error("[!] Couldn't read WARC record for %s" % (url))
+                return False
+            self.record_cache.put((file_id, offset), record)
+        html = record["payload"] or "<html></html>"
+
+        self._set_page(url, html)
 
         if initial:
             self.path.append(("fetch", [url], {"initial": initial}))
@@ -35,6 +35,18 @@ Crawl-Specific Options:
         Maximum number of unique pages, in total, to fetch.
         AutoScrape will stop crawling once this is hit.
 
+    --crawl-workers NUM
+        Number of pages to fetch at once. Setting this above
+        one switches the requests backend to a concurrent,
+        breadth-first crawl. This is only used for plain
+        crawls on the requests backend, form matching always
+        uses the regular depth-first scraper. [default: 1]
+
+    --host-concurrency NUM
+        Maximum number of simultaneous requests to a single
+        host during a concurrent crawl. By default this is
+        only limited by --crawl-workers.
+
     --leave-host
         By default, autoscrape will not leave the host given
         in the BASEURL. This option lets the scraper leave
@@ -52,6 +64,14 @@ Crawl-Specific Options:
         from consideration for clicking. Accepts the same
         argument format as --only-links.
 
+    --only-urls MATCH_STRING
+        Like --only-links, but matched against the URL a link
+        points to instead of its text.
+
+    --ignore-urls MATCH_STRING
+        Like --ignore-links, but matched against the URL a link
+        points to instead of its text.
+
     --link-priority SORT_STRING
         A string to sort the links by. In this case, any link
         containing "SORT_STRING" will be clicked before any other
@@ -62,6 +82,47 @@ Crawl-Specific Options:
         Don't click on or download URLs pointing to files with
         these extensions.
 
+    --strip-query-params REGEX
+        Query parameters, matching this regex, that don't change
+        the page a URL points to. When checking whether a URL has
+        already been visited, these are ignored (along with query
+        parameter order, fragments, trailing slashes, default ports
+        and host case). Defaults to common tracking parameters
+        (utm_*, fbclid, gclid, ...) and session IDs.
+
+    --visited-bloom-size NUM_URLS
+        Keep track of visited URLs using a fixed-size bloom filter,
+        sized for this many URLs, instead of an exact set. Uses much
+        less memory on very large crawls, at the cost of skipping
+        roughly one in a thousand never-visited URLs.
+
+    --near-duplicate-distance BITS
+        Skip saving and crawling pages whose visible text is nearly
+        the same as a page already saved. Pages are compared using
+        64-bit SimHash fingerprints and ones differing by at most
+        this many bits are considered duplicates. Around 3 catches
+        pages that only differ by dates, counters or ads. By
+        default, no pages are skipped.
+
+    --snapshot-stack-size NUM
+        Number of previously visited pages the requests and
+        WARC backends keep in memory, so that going back up
+        the crawl doesn't need to re-fetch them. Pages further
+        back than this are re-fetched. Setting this to 0
+        disables the snapshots. [default: 10]
+
+    --cache-dir DIRECTORY
+        Keep an on-disk cache of all HTTP responses in this
+        directory. Re-running a scrape with the same cache
+        directory only re-downloads pages that have changed,
+        which makes iterating on scrape options much quicker.
+        Only used by the requests backend.
+
+    --cache-size MEGABYTES
+        Maximum size of the response cache. The least recently
+        used responses get removed once this is exceeded.
+        [default: 1024]
+
     --result-page-links MATCH_STRINGS_LIST
         If specified, AutoScrape will click on any links matching
         this string when it arrives on a search result page.
@@ -128,10 +189,18 @@ Interactive Form Search Options:
         interactions.
 
     --form-submit-wait SECONDS
-        How many seconds to force wait after a submit to a form.
+        How many seconds to wait after a submit to a form.
         This should be used in cases where the builtin
         wait-for-page-load isn't working properly (JS-heavy
-        pages, etc). [default: 5]
+        pages, etc). When --page-quiet-period is set, this is
+        the longest we'll wait for the page to go quiet.
+        [default: 5]
+
+    --form-workers NUM
+        Number of browsers to run the --input phases in. Each
+        browser replays the clicks that led to the matched form
+        and then works through the input phases alongside the
+        others, saving to the same output. [default: 1]
 
 Webdriver-Specific and General Options:
     --page-timeout SECONDS
@@ -146,9 +215,25 @@ Webdriver-Specific and General Options:
        This forces AutoScrape to wait for the specified number
        of seconds after performing a navigation action.
        Increase this for slow sites or oddly loading single page
-       apps, decrease this for fast sites or crawls.
+       apps, decrease this for fast sites or crawls. When the
+       page quiet period option is set, this is the longest
+       we'll wait for the page to go quiet.
        [default: 1]
 
+    --page-quiet-period SECONDS
+        Instead of sleeping for fixed periods, AutoScrape watches
+        the page for DOM changes and network requests and moves
+        on once nothing has happened for this many seconds. Set
+        to zero to disable this and use fixed waits.
+        [default: 0.5]
+
+    --page-quiet-max SECONDS
+        The longest to wait for a page to go quiet after a page
+        load, click or form input. Pages that never go quiet
+        (tickers, long-polling, etc) are treated as ready after
+        this, and requests that have been open for this long
+        are ignored. [default: 3]
+
     --load-images
         By default, images on a page will not be fetched.
         This speeds up scrapes on sites and lowers bandwidth
@@ -180,11 +265,22 @@ WARC Options:
 
     --warc-index-file PATH_TO_LEVELDB
         Path to the level DB database holding the URL-to-file
-        index: URL => (filename, record_number)
+        index: URL => (WARC file, record offset, record length)
         This will be generated from the WARCS in the --warc-directory
         speficied if it's not already. Required when using the "warc"
         backend.
 
+    --warc-index-workers NUM
+        Number of processes used to parse WARC files when building
+        the index. Only WARC files that haven't already been indexed
+        get parsed, so adding files to --warc-directory and re-running
+        only indexes the new ones. [default: 4]
+
+    --warc-cache-size MEGABYTES
+        Amount of memory to use for keeping recently read WARC
+        records around, so re-visited pages don't have to be read
+        from disk again. Zero disables this. [default: 64]
+
 Data Saving Options:
     --output DIRECTORY_OR_URL
         If specified, this indicates where to save pages during a
@@ -197,6 +293,19 @@ Data Saving Options:
         file scraped.
         [default: autoscrape-data]
 
+    --output-format FORMAT
+        How to store files when --output is a directory. Options:
+        "directory" saves each page to its own file. "warc" and
+        "sqlite" append everything to a single autoscrape.warc.gz
+        or autoscrape.sqlite file in the output directory, which
+        is much faster to write and back up for large crawls.
+        [default: directory]
+
+    --bulk-upload
+        When --output is a URL, send files to its /bulk endpoint
+        in batches, as raw bytes, from a background thread. This
+        keeps a slow receiving server from slowing down the scrape.
+
     --keep-filename
         By default, we hash the files in a scrape in order to
         account for dynamic content under a single-page app
@@ -1,5 +1,4 @@
 # -*- coding: UTF-8 -*-
-import time
 import logging
 
 from autoscrape.backends.requests.browser import RequestsBrowser
@@ -38,10 +37,15 @@ class Controller:
                  remote_hub="http://localhost:4444/wd/hub", output=None,
                  form_submit_natural_click=False, form_submit_wait=5,
                  warc_index_file=None, warc_directory=None,
+                 warc_index_workers=None, warc_cache_size=None,
                  force_page_wait=None, form_submit_button_selector=None,
                  load_images=False, show_browser=False, page_timeout=None,
+                 page_quiet_period=None, page_quiet_max=None,
+                 webdriver_session=None,
                  html_embeddings_file=None, word_embeddings_file=None,
-                 backend="selenium", vectorizer="text"):
+                 backend="selenium", vectorizer="text", pool_size=None,
+                 snapshot_stack_size=None, cache_dir=None, cache_size=None,
+                 strip_query_params=None, visited_bloom_size=None):
         """
         Set up our WebDriver and misc utilities.
         """
@@ -65,8 +69,17 @@ class Controller:
             form_submit_wait=form_submit_wait,
             form_submit_button_selector=form_submit_button_selector,
             warc_index_file=warc_index_file, warc_directory=warc_directory,
+            warc_index_workers=warc_index_workers,
+            warc_cache_size=warc_cache_size,
             load_images=load_images, show_browser=show_browser,
-            output=output, page_timeout=page_timeout,
+            output=output, page_timeout=page_timeout, pool_size=pool_size,
+            page_quiet_period=page_quiet_period,
+            page_quiet_max=page_quiet_max,
+            webdriver_session=webdriver_session,
+            snapshot_stack_size=snapshot_stack_size,
+            cache_dir=cache_dir, cache_size=cache_size,
+            strip_query_params=strip_query_params,
+            visited_bloom_size=visited_bloom_size,
         )
 
         Vectorizer = None
@@ -91,20 +104,10 @@ class Controller:
 
         self.clickable = None
 
-        # simply a list of form tags, each forms input contents is
-        # contained in the self.inputs multi-dimensional array, below
-        self.forms = []
-
-        # this expands into the following format:
-        # [ form_tag:
-        #   [
-        #     [text input tags...],
-        #     [select input tags...],
-        #     [checkbox input tags...]
-        #   ],
-        #   other forms ...,
-        # ]
-        self.inputs = []
+        # form tag => input tags for the current page. this is only
+        # worked out when forms or inputs are accessed, so crawls that
+        # never look at forms don't pay for finding them
+        self._forms_dict = None
 
         # TODO: the point of this wait is to ensure the DOM has stopped
         # mutating (loading results, etc). a proper fix for this is to
@@ -117,18 +120,14 @@ class Controller:
     def load_indices(self):
         logger.debug("[.] Loading page vectors...")
         if self.backend == "selenium" and self.force_page_wait:
-            logger.debug(" - Force waiting for %s seconds" % (
+            logger.debug(" - Waiting up to %s seconds" % (
                 self.force_page_wait
             ))
-            time.sleep(self.force_page_wait)
+            self.scraper.wait_for_page(self.force_page_wait)
 
         self.clickable = None
         # self.clickable = self.scraper.get_clickable()
-        logger.debug(" - Getting forms")
-        forms_dict = self.scraper.get_forms()
-        self.forms = list(forms_dict.keys())
-        logger.debug(" - Getting inputs")
-        self.inputs = [tags for tags in forms_dict.values()]
+        self._forms_dict = None
         self.buttons = None # self.scraper.get_buttons()
 
         # logger.debug("Clickable links: %s" % (len(self.clickable)))
@@ -174,6 +173,37 @@ class Controller:
         #         value = elem.get_attribute("value")
         #     logger.debug("  %s - ...%s, %s, %s" % (i, t[-25:], text, value))
 
+    def _get_forms_dict(self):
+        if self._forms_dict is None:
+            logger.debug(" - Getting forms")
+            self._forms_dict = self.scraper.get_page_state().forms
+        return self._forms_dict
+
+    @property
+    def forms(self):
+        """
+        Simply a list of form tags, each forms input contents is
+        contained in the inputs multi-dimensional array, below.
+        """
+        return list(self._get_forms_dict().keys())
+
+    @property
+    def inputs(self):
+        """
+        This expands into the following format:
+        [ form_tag:
+          [
+            [text input tags...],
+            [select input tags...],
+            [checkbox input tags...],
+            [date input tags...],
+            [[radio input tags...], other radio groups...]
+          ],
+          other forms ...,
+        ]
+        """
+        return list(self._get_forms_dict().values())
+
     def initialize(self, url):
         """
         Instantiate a web scraper, given a starting point URL. Also
@@ -185,7 +215,7 @@ class Controller:
     def select_link(self, index, iterating_form=False):
         if self.clickable is None:
             logger.debug(" - Getting links")
-            self.clickable = self.scraper.get_clickable()
+            self.clickable = self.scraper.get_page_state().clickable
         if index >= len(self.clickable):
             logger.error(
                 "[!] Critical error: link index exceeds clickable length."
@@ -200,7 +230,7 @@ class Controller:
     def select_button(self, index, iterating_form=False):
         if self.buttons is None:
             logger.debug(" - Getting buttons")
-            self.buttons = self.scraper.get_buttons()
+            self.buttons = self.scraper.get_page_state().buttons
         tag = self.buttons[index]
         clicked = self.scraper.click(tag, iterating_form=iterating_form)
         if clicked:
@@ -3,6 +3,7 @@ import datetime
 import hashlib
 import logging
 import os
+import queue
 import re
 import sys
 import time
@@ -16,6 +17,14 @@ from autoscrape.util import (
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+class ScrapeStopped(Exception):
+    """
+    Raised inside a running scrape when whoever is consuming its data
+    (see ManualControlScraper.iter_run) has stopped listening.
+    """
+    pass
+
+
 class BaseScraper(object):
     """
     A base class for common scraper functionality like loglevel
@@ -198,20 +207,75 @@ class BaseScraper(object):
         # only save stylesheets for web content types
         if link_to_text and not self.disable_style_saving:
             logger.debug(" -  Saving stylesheet")
-            style_filepath = "%s.css" % filepath
-            # this will save stylesheet as filepath.html.css
-            stylesheet = self.control.scraper.get_stylesheet()
+            stylesheets = self.control.scraper.get_stylesheets()
             if self.output:
-                write_file(
-                    style_filepath, stylesheet,
-                    fileclass=classname, output=self.output,
-                    url=self.control.scraper.page_url,
-                )
+                self.save_stylesheets(filepath, classname, stylesheets)
             if self.return_data:
-                crawl_data["css"] = stylesheet
+                crawl_data["css"] = "\n".join(stylesheets)
 
         if self.return_data:
+            self.add_crawl_data(crawl_data)
+
+    def add_crawl_data(self, crawl_data):
+        """
+        Hand a saved page's data back to the caller. Normally this gets
+        collected in crawl_data and returned at the end of the scrape,
+        but if crawl_data_queue is set (see iter_run) it's put there,
+        blocking until the consumer makes room or goes away.
+        """
+        crawl_data_queue = getattr(self, "crawl_data_queue", None)
+        if crawl_data_queue is None:
             self.crawl_data.append(crawl_data)
+            return
+        while True:
+            if self.scrape_stopped.is_set():
+                raise ScrapeStopped()
+            try:
+                crawl_data_queue.put(crawl_data, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def save_stylesheets(self, filepath, classname, stylesheets):
+        """
+        Saves each of a page's stylesheets to the stylesheets folder,
+        named by the hash of its contents, unless it's already been
+        saved during this scrape. The page gets a stylesheet at
+        filepath.css (e.g., filepath.html.css) that imports these, so
+        a site-wide stylesheet is only stored once.
+        """
+        if re.match("^https?://", self.output):
+            style_dir = "stylesheets"
+        else:
+            style_dir = os.path.join(self.output, "stylesheets")
+
+        saved = getattr(self, "saved_stylesheets", None)
+        if saved is None:
+            saved = self.saved_stylesheets = set()
+
+        style_filepath = "%s.css" % filepath
+        imports = []
+        for css in stylesheets:
+            if not css:
+                continue
+            h = hashlib.sha256(css.encode("utf-8")).digest().hex()
+            css_filepath = os.path.join(style_dir, "%s.css" % h)
+            if h not in saved:
+                saved.add(h)
+                write_file(
+                    css_filepath, css, fileclass="stylesheet",
+                    output=self.output, url=self.control.scraper.page_url,
+                )
+            css_relpath = os.path.relpath(
+                css_filepath, os.path.dirname(style_filepath)
+            )
+            imports.append('@import url("%s");' % css_relpath)
+
+        write_file(
+            style_filepath, "\n".join(imports),
+            fileclass=classname, output=self.output,
+            url=self.control.scraper.page_url,
+        )
 
     def save_scraper_graph(self):
         """
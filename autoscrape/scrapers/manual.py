@@ -1,15 +1,52 @@
 # -*- coding: UTF-8 -*-
+import copy
 import logging
+import queue
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-from autoscrape.scrapers import BaseScraper
+from autoscrape.scrapers import BaseScraper, ScrapeStopped
 from autoscrape.control import Controller
 from autoscrape.input_parser import InputParser
+from autoscrape.search.filters import LinkFilter
+from autoscrape.search.frontier import Frontier
+from autoscrape.search.simhash import SimHashIndex, simhash
+from autoscrape.util.sinks import start_sink, stop_sink
+from autoscrape.util.upload import start_uploader, stop_uploader
 
 
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+class PageCounter(object):
+    """
+    Count of pages fetched during a scrape. This is shared by the
+    scraper copies running form input phases in parallel, so that
+    max_pages applies to all of them together.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self):
+        with self.lock:
+            self.count += 1
+            return self.count
+
+    def take(self, max_pages):
+        """
+        Count a page if there's still room for it under max_pages
+        (None meaning no limit). Returns False if there isn't.
+        """
+        with self.lock:
+            if max_pages is not None and self.count >= max_pages:
+                return False
+            self.count += 1
+            return True
+
+
 class ManualControlScraper(BaseScraper):
     """
     A Depth-First Search scraper that looks for forms, inputs, and next
@@ -41,10 +78,19 @@ class ManualControlScraper(BaseScraper):
                  remote_hub="http://localhost:4444/wd/hub",
                  link_priority=None, ignore_links=None, only_links=None,
                  ignore_extensions=None, result_page_links=None,
+                 only_urls=None, ignore_urls=None, strip_query_params=None,
+                 visited_bloom_size=None, near_duplicate_distance=None,
                  form_submit_natural_click=False, form_submit_wait=5,
                  force_page_wait=None, form_submit_button_selector=None,
                  load_images=False, show_browser=False, warc_index_file=None,
-                 warc_directory=None, return_data=False, page_timeout=None,
+                 warc_directory=None, warc_index_workers=4,
+                 warc_cache_size=64,
+                 return_data=False, page_timeout=None, page_quiet_period=0.5,
+                 page_quiet_max=3,
+                 crawl_workers=None, host_concurrency=None, form_workers=None,
+                 webdriver_session=None, bulk_upload=False,
+                 output_format="directory",
+                 snapshot_stack_size=10, cache_dir=None, cache_size=None,
                  backend="selenium"):
         # setup logging, etc
         super().setup_logging(
@@ -52,8 +98,21 @@ class ManualControlScraper(BaseScraper):
         )
         if page_timeout is not None:
             page_timeout = int(page_timeout or 0)
-        # set up web scraper controller
-        self.control = Controller(
+        # number of pages to fetch at once. anything above one switches
+        # crawls on the requests backend to the concurrent crawler
+        self.crawl_workers = int(crawl_workers or 1)
+        # max number of simultaneous requests to a single host
+        self.host_concurrency = int(host_concurrency or 0) or None
+        # number of browsers to run form input phases in
+        self.form_workers = int(form_workers or 1)
+        # how to store files when output is a directory: one file per
+        # page (directory), or all of them in a single WARC or SQLite file
+        self.output_format = output_format or "directory"
+        if output and not re.match("^https?://", output):
+            start_sink(output, self.output_format)
+        # set up web scraper controller. we keep the options around
+        # for starting up more browsers for parallel form iteration
+        self.control_kwargs = dict(
             leave_host=leave_host, driver=driver, remote_hub=remote_hub,
             form_submit_natural_click=form_submit_natural_click,
             form_submit_wait=int(form_submit_wait or 0),
@@ -61,10 +120,26 @@ class ManualControlScraper(BaseScraper):
             force_page_wait=int(force_page_wait or 0),
             load_images=load_images, show_browser=show_browser,
             warc_index_file=warc_index_file, warc_directory=warc_directory,
+            warc_index_workers=int(warc_index_workers or 1),
+            # megabytes to bytes
+            warc_cache_size=int(warc_cache_size or 0) * 1024 * 1024,
             output=output, backend=backend, browser_binary=browser_binary,
             page_timeout=page_timeout,
+            page_quiet_period=float(page_quiet_period or 0),
+            page_quiet_max=float(page_quiet_max or 0) or None,
+            # an already running WebDriver, e.g. from a WebDriverPool
+            webdriver_session=webdriver_session,
+            pool_size=self.crawl_workers if self.crawl_workers > 1 else None,
+            snapshot_stack_size=int(snapshot_stack_size or 0),
+            cache_dir=cache_dir,
+            # megabytes to bytes
+            cache_size=int(cache_size or 0) * 1024 * 1024 or None,
+            strip_query_params=strip_query_params,
+            visited_bloom_size=int(visited_bloom_size or 0) or None,
         )
+        self.control = Controller(**self.control_kwargs)
         self.control.initialize(baseurl)
+        self.backend = backend
         # depth of DFS in search of form
         self.maxdepth = int(maxdepth or 0)
         # current depth of iterating through 'next' form buttons
@@ -72,22 +147,36 @@ class ManualControlScraper(BaseScraper):
         # max total pages to fetch
         self.max_pages = int(max_pages) if max_pages else None
         # keep number of fetched pages here.
-        self.total_pages = 0
+        self.page_counter = PageCounter()
         # match for link to identify a "next" button
         self.next_match = next_match
         # string to match a form (by element text) we want to scrape
         self.form_match = form_match
         # Where to write training data from crawl
         self.output = output
+        # send files to an output URL in batches, in the background
+        self.bulk_upload = bool(
+            bulk_upload and output and re.match("^https?://", output)
+        )
+        if self.bulk_upload:
+            start_uploader(output)
+        # number of files the bulk uploader gave up on, set once the
+        # scrape finishes
+        self.failed_uploads = 0
         # Whether or not to return crawled data upon completion. This can be
         # used along with output, or on its own. This will store all
         # data in memory (in self.crawl_data) during the crawl, so beware!
         self.return_data = return_data
         self.crawl_data = []
+        # when set, crawl data goes here instead, see iter_run
+        self.crawl_data_queue = None
+        self.scrape_stopped = threading.Event()
         # If this is true, do not use a file hash for the filename
         self.keep_filename = keep_filename
         # Disable saving of stylesheets for web content types
         self.disable_style_saving = disable_style_saving
+        # hashes of the stylesheets saved so far, see save_stylesheets
+        self.saved_stylesheets = set()
         # To save screenshots or not (they're large and expensive)
         self.save_screenshots = save_screenshots
         # To save the whole, scrolled down page screenshot, this can
@@ -105,6 +194,24 @@ class ManualControlScraper(BaseScraper):
         self.only_links = only_links
         # Apply any link clicking rules to the results pages
         self.result_page_links = result_page_links
+        # the above link rules (plus URL-based ones), compiled once
+        self.link_filter = LinkFilter(
+            ignore_links=ignore_links, only_links=only_links,
+            link_priority=link_priority, ignore_urls=ignore_urls,
+            only_urls=only_urls, ignore_extensions=ignore_extensions,
+        )
+        self.result_link_filter = LinkFilter(only_links=result_page_links)
+        self.ignore_extensions_re = None
+        if ignore_extensions:
+            self.ignore_extensions_re = re.compile(ignore_extensions)
+        # SimHash fingerprints of the pages saved so far. pages within
+        # this many bits of one of them are skipped as near-duplicates
+        self.near_duplicates = None
+        if near_duplicate_distance not in (None, ""):
+            self.near_duplicates = SimHashIndex(
+                distance=int(near_duplicate_distance)
+            )
+        self.near_duplicates_skipped = 0
         # attempt a position-based "natural click" over the element
         self.form_submit_natural_click = form_submit_natural_click
         # a period of seconds to force a wait after a submit
@@ -118,6 +225,47 @@ class ManualControlScraper(BaseScraper):
         # whether or not we've successfully scraped what we want
         self.scraped = False
 
+    @property
+    def total_pages(self):
+        return self.page_counter.count
+
+    def filter_links(self, link_vectors, link_urls=None):
+        """
+        Apply the link rules (see LinkFilter) to a list of link texts
+        and, if there are URL rules, their URLs. Returns a list of
+        (index, text) tuples for the links that should be clicked, in
+        the order they should be clicked in.
+        """
+        if not self.link_filter:
+            return list(enumerate(link_vectors))
+        return self.link_filter.filter(link_vectors, urls=link_urls)
+
+    def ignored_extension(self, url):
+        return bool(
+            self.ignore_extensions_re and self.ignore_extensions_re.search(url)
+        )
+
+    def is_near_duplicate(self):
+        """
+        Check whether the current page's text is a near-duplicate of a
+        page we've already seen, recording its fingerprint if not.
+        Always False unless near_duplicate_distance is set.
+        """
+        if self.near_duplicates is None:
+            return False
+        text = self.control.scraper.get_page_state().text
+        fingerprint = simhash(text)
+        # no text to go on (e.g., image or binary pages)
+        if fingerprint is None:
+            return False
+        if not self.near_duplicates.check_and_add(fingerprint):
+            return False
+        self.near_duplicates_skipped += 1
+        logger.info(" - Skipping near-duplicate page: %s" % (
+            self.control.scraper.page_url
+        ))
+        return True
+
     def click_until_no_links(self, links):
         logger.info("[.] Clicking result page links...")
         if self.max_pages is not None and self.total_pages >= self.max_pages:
@@ -125,18 +273,16 @@ class ManualControlScraper(BaseScraper):
             return
 
         link_vectors = self.control.vectorizer.link_vectors()
-        link_zip = list(zip(range(len(link_vectors)), link_vectors))
-        link_zip = filter(
-            lambda x: re.findall(self.result_page_links, x[1]),
-            link_zip
-        )
+        link_zip = self.result_link_filter.filter(link_vectors)
         logger.debug(" - Candidate links: %s" % (link_zip))
         # Click until we get no more matches
         for ix, text in link_zip:
             logger.info("[.] Clicking result page link: %s" % (text))
             logger.debug(" - Current URL: %s" % (self.control.scraper.page_url))
+            if not self.page_counter.take(self.max_pages):
+                logger.info(" - Maximum pages %s reached, returning..." % self.max_pages)
+                return
             if self.control.select_link(ix, iterating_form=True):
-                self.total_pages += 1
                 self.click_until_no_links(links)
                 self.save_training_page(classname="data_pages")
                 self.save_screenshot(classname="data_pages")
@@ -215,6 +361,176 @@ class ManualControlScraper(BaseScraper):
             logger.debug("[.] Going back from result page...")
             self.control.back()
 
+    def run_input_phase(self, ix, input_phase):
+        """
+        Fill out the form at index ix with a single input phase,
+        submit it, save the results (following "next" buttons, if
+        configured) and go back to the form page.
+        """
+        logger.debug(" - Input plan: %s" % input_phase)
+        for single_input in input_phase:
+            input_index = single_input["index"]
+            if single_input["type"] == "input":
+                input_string = single_input["string"]
+                logger.info("[.] Inputting %s to input %s" % (
+                    input_string, ix
+                ))
+                self.control.input(ix, input_index, input_string)
+            elif single_input["type"] == "select":
+                input_string = single_input["string"]
+                logger.info("[.] Selecting option %s in input %s" % (
+                    input_string, input_index
+                ))
+                self.control.input_select_option(
+                    ix, input_index, input_string
+                )
+            elif single_input["type"] == "checkbox":
+                to_check = single_input["action"]
+                logger.info("[.] %s checkbox input %s" % (
+                    "Checking" if to_check else "Unchecking",
+                    input_index
+                ))
+                self.control.input_checkbox(
+                    ix, input_index, to_check
+                )
+            elif single_input["type"] == "date":
+                input_string = single_input["string"]
+                logger.info("[.] Setting date to %s in date input %s" % (
+                    input_string, ix))
+                self.control.input_date(ix, input_index, input_string)
+            elif single_input["type"] == "radio":
+                radio_index = single_input["string"]
+                logger.info("[.] Selecting radio checkbox %s in group %s" % (
+                    radio_index, input_index
+                ))
+                self.control.input_radio_option(
+                    ix, input_index, radio_index
+                )
+
+        # capture post-input screenshot
+        self.save_screenshot(classname="interaction_pages")
+
+        # actually submit the page
+        if not self.page_counter.take(self.max_pages):
+            logger.info(" - Maximum pages %s reached, not submitting." % (
+                self.max_pages
+            ))
+            return False
+        self.control.submit(ix)
+
+        # save the initial landing result page
+        self.save_screenshot(classname="data_pages")
+        self.save_training_page(classname="data_pages")
+
+        # if we're looking for next buttons, click them
+        if self.next_match:
+            self.keep_clicking_next_btns()
+
+        self.control.back()
+        return True
+
+    def _form_worker(self, path, url):
+        """
+        Make a copy of this scraper with its own browser, replaying
+        the given browser path to get it to the same page we're on
+        (url). Everything else (output options, crawl_data, the page
+        count) is shared. Returns None, with the worker's browser shut
+        down, if the replay fails or ends up on a different page.
+        """
+        worker = copy.copy(self)
+        # each worker needs its own browser
+        worker.control = Controller(**dict(
+            self.control_kwargs, webdriver_session=None
+        ))
+        scraper = worker.control.scraper
+        for name, args, kwargs in path:
+            try:
+                result = getattr(scraper, name)(*args, **kwargs)
+            except Exception as e:
+                logger.error("[!] Form worker failed replaying %s: %s" % (
+                    name, e
+                ))
+                result = False
+            # steps that don't report success return None
+            if result is False:
+                logger.error("[!] Form worker couldn't replay %s, stopping" % (
+                    name
+                ))
+                scraper.quit()
+                return None
+
+        canonicalize = getattr(scraper, "canonicalize_url", None) or str
+        if canonicalize(scraper.page_url) != canonicalize(url):
+            logger.error(
+                "[!] Form worker ended up on %s instead of %s, stopping" % (
+                    scraper.page_url, url
+                ))
+            scraper.quit()
+            return None
+
+        worker.control.load_indices()
+        return worker
+
+    def run_input_phases_parallel(self, ix):
+        """
+        Run the input phases for the form at index ix across a pool of
+        form_workers browsers. Each browser replays our path to the form
+        page and then takes phases off a shared queue until there are
+        none left. If none of the workers make it to the form page, the
+        phases are run here instead. Returns the number of phases run.
+        """
+        phases = list(self.input_gen)
+        n_workers = min(self.form_workers, len(phases))
+        if not n_workers:
+            return 0
+
+        logger.info("[.] Running %s input phases in %s browsers" % (
+            len(phases), n_workers
+        ))
+        path = list(self.control.scraper.path)
+        url = self.control.scraper.page_url
+        lock = threading.Lock()
+        completed = []
+        # set when a worker runs into max_pages
+        stopped = []
+
+        def run_worker():
+            worker = self._form_worker(path, url)
+            if worker is None:
+                return
+            try:
+                while True:
+                    with lock:
+                        if not phases:
+                            return
+                        input_phase = phases.pop(0)
+                    if not worker.run_input_phase(ix, input_phase):
+                        stopped.append(True)
+                        return
+                    with lock:
+                        completed.append(input_phase)
+            finally:
+                worker.control.scraper.quit()
+
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(run_worker) for _ in range(n_workers)]
+            for future in futures:
+                future.result()
+
+        # phases are only left over if every worker failed to replay
+        # its way to the form
+        if phases and not stopped:
+            logger.error(
+                "[!] No form workers reached the form, running %s input"
+                " phases in the main browser" % (len(phases))
+            )
+            for input_phase in phases:
+                if not self.run_input_phase(ix, input_phase):
+                    break
+                completed.append(input_phase)
+
+        return len(completed)
+
     def scrape(self, depth=0):
         logger.info("[.] Crawl depth %s" % depth)
         logger.info(" - Total pages: %s of max: %s" % (
@@ -231,25 +547,27 @@ class ManualControlScraper(BaseScraper):
             logger.debug(" - Scrape complete, not clicking anything else.")
             return
 
-        if self.ignore_extensions and re.findall(self.ignore_extensions,
-                                                 self.control.scraper.page_url):
+        if self.ignored_extension(self.control.scraper.page_url):
             logger.debug(" - Ignoring URL matching ignored extension: %s" % (
                 self.control.scraper.page_url
             ))
             return
 
+        if self.is_near_duplicate():
+            self.control.back()
+            return
+
         self.save_training_page(classname="crawl_pages")
         self.save_screenshot(classname="crawl_pages")
-        form_vectors = self.control.vectorizer.form_vectors()
+        # don't bother with looking for forms if we didn't specify
+        # the form_match option
+        form_vectors = []
+        if self.form_match:
+            form_vectors = self.control.vectorizer.form_vectors()
 
         # NOTE: we never get into this loop if self.input_gen is empty
         # this arises when input was not handed to the initializer
         for ix in range(len(form_vectors)):
-            # don't bother with looking for forms if we didn't specify
-            # th form_match option
-            if not self.form_match:
-                continue
-
             form_data = form_vectors[ix]
 
             # inputs are keyed by form index, purely here for debug purposes
@@ -264,64 +582,14 @@ class ManualControlScraper(BaseScraper):
             self.save_training_page(classname="search_pages")
             self.save_screenshot(classname="search_pages")
 
-            for input_phase in self.input_gen:
-                logger.debug(" - Input plan: %s" % input_phase)
-                for single_input in input_phase:
-                    input_index = single_input["index"]
-                    if single_input["type"] == "input":
-                        input_string = single_input["string"]
-                        logger.info("[.] Inputting %s to input %s" % (
-                            input_string, ix
-                        ))
-                        self.control.input(ix, input_index, input_string)
-                    elif single_input["type"] == "select":
-                        input_string = single_input["string"]
-                        logger.info("[.] Selecting option %s in input %s" % (
-                            input_string, input_index
-                        ))
-                        self.control.input_select_option(
-                            ix, input_index, input_string
-                        )
-                    elif single_input["type"] == "checkbox":
-                        to_check = single_input["action"]
-                        logger.info("[.] %s checkbox input %s" % (
-                            "Checking" if to_check else "Unchecking",
-                            input_index
-                        ))
-                        self.control.input_checkbox(
-                            ix, input_index, to_check
-                        )
-                    elif single_input["type"] == "date":
-                        input_string = single_input["string"]
-                        logger.info("[.] Setting date to %s in date input %s" % (
-                            input_string, ix))
-                        self.control.input_date(ix, input_index, input_string)
-                    elif single_input["type"] == "radio":
-                        radio_index = single_input["string"]
-                        logger.info("[.] Selecting radio checkbox %s in group %s" % (
-                            radio_index, input_index
-                        ))
-                        self.control.input_radio_option(
-                            ix, input_index, radio_index
-                        )
-
-                # capture post-input screenshot
-                self.save_screenshot(classname="interaction_pages")
-
-                # actually submit the page
-                self.control.submit(ix)
-                self.total_pages += 1
-
-                # save the initial landing result page
-                self.save_screenshot(classname="data_pages")
-                self.save_training_page(classname="data_pages")
-
-                # if we're looking for next buttons, click them
-                if self.next_match:
-                    self.keep_clicking_next_btns()
-
-                self.scraped = True
-                self.control.back()
+            if self.form_workers > 1 and self.backend != "warc":
+                if self.run_input_phases_parallel(ix):
+                    self.scraped = True
+            else:
+                for input_phase in self.input_gen:
+                    self.scraped = True
+                    if not self.run_input_phase(ix, input_phase):
+                        break
 
             logger.debug("[*] Completed iteration!")
             # Only scrape a single form, due to explicit, single
@@ -332,24 +600,10 @@ class ManualControlScraper(BaseScraper):
 
         link_vectors = self.control.vectorizer.link_vectors()
         logger.debug("[.] Links on page: %s" % (link_vectors))
-        link_zip = list(zip(range(len(link_vectors)), link_vectors))
-        if self.ignore_links:
-            logger.debug(" - Ignoring links matching: %s" % self.ignore_links)
-            link_zip = filter(
-                lambda x: not re.findall(self.ignore_links, x[1]),
-                link_zip
-            )
-        if self.only_links:
-            logger.debug(" - Keeping only links matching: %s" % self.ignore_links)
-            link_zip = filter(
-                lambda x: re.findall(self.only_links, x[1]),
-                link_zip
-            )
-        if self.link_priority:
-            logger.debug(" - Sorting by link priority: %s" % self.link_priority)
-            link_zip.sort(
-                key=lambda x: not re.findall(self.link_priority, x[1])
-            )
+        link_urls = None
+        if self.link_filter.uses_urls:
+            link_urls = self.control.scraper.get_page_state().link_urls
+        link_zip = self.filter_links(link_vectors, link_urls=link_urls)
 
         for ix, text in link_zip:
             logger.debug(" - Link index: %s text: %s" % (ix, text))
@@ -368,7 +622,7 @@ class ManualControlScraper(BaseScraper):
             if self.control.select_link(ix):
                 logger.info("[.] Link clicked: %s" % (text))
                 logger.debug(" - Current URL: %s" % (self.control.scraper.page_url))
-                self.total_pages += 1
+                self.page_counter.add()
                 self.scrape(depth=depth + 1)
             else:
                 logger.debug(" - Click failed, skipping: %s" % text)
@@ -376,27 +630,181 @@ class ManualControlScraper(BaseScraper):
         logger.debug("[*] Searching forms and links on page complete")
         self.control.back()
 
+    def crawl_page(self, frontier, depth):
+        """
+        Save the currently loaded page and queue up its links in the
+        frontier. This is the concurrent crawler's equivalent of a
+        single scrape step, minus the form handling.
+        """
+        page_url = self.control.scraper.page_url
+        if self.ignored_extension(page_url):
+            logger.debug(" - Ignoring URL matching ignored extension: %s" % (
+                page_url
+            ))
+            return
+
+        if self.is_near_duplicate():
+            return
+
+        self.save_training_page(classname="crawl_pages")
+        self.save_screenshot(classname="crawl_pages")
+
+        if self.maxdepth != -1 and depth >= self.maxdepth:
+            logger.debug(" - At maximum depth: %s, skipping links." % depth)
+            return
+
+        links = self.control.scraper.get_links()
+        link_texts = [text for url, text in links]
+        link_urls = [url for url, text in links]
+        logger.debug("[.] Links on page: %s" % (link_texts))
+        for ix, text in self.filter_links(link_texts, link_urls=link_urls):
+            url = links[ix][0]
+            if self.control.scraper._check_and_set_visited(url):
+                logger.debug("[!] Already visited URL %s" % (url))
+                continue
+            frontier.add(url, depth + 1)
+
+    def crawl(self):
+        """
+        Breadth-first crawl of a site, keeping a frontier of URLs and
+        fetching up to crawl_workers of them at once. Only the fetches
+        happen on the worker threads; parsing, link extraction and
+        saving all happen here, one page at a time, using the same
+        browser state as the depth-first scrape.
+
+        This only works with the requests backend and doesn't do any
+        form interaction.
+        """
+        logger.info("[.] Starting concurrent crawl with %s workers" % (
+            self.crawl_workers
+        ))
+        scraper = self.control.scraper
+        frontier = Frontier(host_concurrency=self.host_concurrency)
+        # don't queue up links back to the page we started on
+        scraper._check_and_set_visited(scraper.page_url)
+        self.crawl_page(frontier, 0)
+
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.crawl_workers) as pool:
+            while True:
+                while len(pending) < self.crawl_workers:
+                    if self.max_pages is not None and \
+                       self.total_pages + len(pending) >= self.max_pages:
+                        break
+                    queued = frontier.next()
+                    if queued is None:
+                        break
+                    url, depth = queued
+                    logger.info("[+] Fetching url=%s depth=%s" % (url, depth))
+                    future = pool.submit(scraper._get, url)
+                    pending[future] = (url, depth)
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = pending.pop(future)
+                    frontier.done(url)
+                    response = future.result()
+                    if response is None:
+                        logger.debug("[!] Fetch failed on %s" % (url))
+                        continue
+                    if not scraper._load_response(response):
+                        continue
+                    self.page_counter.add()
+                    logger.info(" - Total pages: %s of max: %s" % (
+                        self.total_pages, self.max_pages
+                    ))
+                    self.crawl_page(frontier, depth)
+
+        logger.info("[*] Concurrent crawl complete")
+
     def run(self, *args, **kwargs):
         # we have to catch this so, in the case of failure, we
         # don't have random browser windows hanging around
         try:
-            self.scrape(*args, **kwargs)
+            if self.crawl_workers > 1 and self.backend == "requests" \
+               and not self.form_match:
+                self.crawl()
+            else:
+                self.scrape(*args, **kwargs)
+        except ScrapeStopped:
+            logger.info("[+] Scrape stopped early.")
         except Exception as e:
             msg = "[!] Fatal error scraping: %s. Cleaning up, quitting."
             logger.error(msg % (e))
-            if hasattr(self.control.scraper, "driver"):
-                self.control.scraper.driver.quit()
+            self.control.scraper.quit()
             if self.output and self.save_graph:
                 self.save_scraper_graph()
+            if self.bulk_upload:
+                stop_uploader(self.output)
+            if self.output and not re.match("^https?://", self.output):
+                stop_sink(self.output)
             raise e
         # else:
         #     logger.info("[+] AutoScrape run complete.")
         #     if self.output and self.save_graph:
         #         self.save_scraper_graph()
-        try:
-            self.control.scraper.driver.quit()
-        except Exception:
-            pass
+        self.control.scraper.quit()
+        if self.bulk_upload:
+            self.failed_uploads = stop_uploader(self.output)
+        if self.output and not re.match("^https?://", self.output):
+            stop_sink(self.output)
+        if self.link_filter.counts:
+            logger.info("[.] Links matched by link rules: %s" % (
+                dict(self.link_filter.counts)
+            ))
+        if self.near_duplicates_skipped:
+            logger.info("[.] Near-duplicate pages skipped: %s" % (
+                self.near_duplicates_skipped
+            ))
 
         if self.return_data:
             return self.crawl_data
+
+    def iter_run(self, *args, queue_size=16, **kwargs):
+        """
+        Run the scrape in a background thread, yielding each page's data
+        (the same dicts that return_data collects) as soon as it's saved,
+        instead of keeping all of it in memory until the end.
+
+        At most queue_size pages are buffered: if the caller falls behind,
+        the scrape waits for it to catch up. Closing the generator early
+        (e.g., breaking out of a for loop over it) stops the scrape.
+        Errors from the scrape are re-raised here once the pages saved
+        before them have been yielded.
+        """
+        self.return_data = True
+        self.crawl_data_queue = queue.Queue(maxsize=queue_size)
+        self.scrape_stopped.clear()
+        done = object()
+        errors = []
+
+        def run_scrape():
+            try:
+                self.run(*args, **kwargs)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                while not self.scrape_stopped.is_set():
+                    try:
+                        self.crawl_data_queue.put(done, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+
+        thread = threading.Thread(target=run_scrape, daemon=True)
+        thread.start()
+        try:
+            while True:
+                crawl_data = self.crawl_data_queue.get()
+                if crawl_data is done:
+                    break
+                yield crawl_data
+        finally:
+            self.scrape_stopped.set()
+            thread.join()
+            self.crawl_data_queue = None
+        if errors:
+            raise errors[0]
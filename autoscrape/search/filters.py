@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+import logging
+import re
+from collections import Counter
+
+
+logger = logging.getLogger('AUTOSCRAPE')
+
+
+class LinkFilter(object):
+    """
+    Decides which of a page's links get clicked, and in what order,
+    based on the link rules given to the scraper. Patterns are compiled
+    once, when the filter is built, and then every page's links are run
+    through all of the rules in a single pass.
+
+    Text rules match against the link text and URL rules against the
+    link's URL:
+
+        ignore_links / ignore_urls: drop matching links
+        ignore_extensions: drop links whose URL matches, so that we
+            don't fetch pages we'd just skip
+        only_links / only_urls: drop links that don't match
+        link_priority: move matching links to the front, otherwise
+            keeping page order
+
+    A count of how many links each rule has matched is kept in
+    self.counts.
+    """
+
+    def __init__(self, ignore_links=None, only_links=None,
+                 link_priority=None, ignore_urls=None, only_urls=None,
+                 ignore_extensions=None):
+        self.ignore_links = self._compile(ignore_links)
+        self.only_links = self._compile(only_links)
+        self.link_priority = self._compile(link_priority)
+        self.ignore_urls = self._compile(ignore_urls)
+        self.only_urls = self._compile(only_urls)
+        self.ignore_extensions = self._compile(ignore_extensions)
+        self.counts = Counter()
+
+    def _compile(self, pattern):
+        if not pattern:
+            return None
+        return re.compile(pattern)
+
+    def __bool__(self):
+        return self.uses_text or self.uses_urls
+
+    @property
+    def uses_text(self):
+        return any((self.ignore_links, self.only_links, self.link_priority))
+
+    @property
+    def uses_urls(self):
+        """
+        Whether any of the rules need link URLs. Getting URLs can be
+        expensive on some backends, so callers only need to pass them
+        to filter when this is true.
+        """
+        return any((self.ignore_urls, self.only_urls, self.ignore_extensions))
+
+    def filter(self, texts, urls=None):
+        """
+        Apply the rules to a page's links, given as a list of link texts
+        and, for URL rules, a list of URLs in the same order. Returns a
+        list of (index, text) tuples for the links that should be
+        clicked, in the order they should be clicked in.
+        """
+        if urls is None:
+            urls = [None] * len(texts)
+        priority = []
+        rest = []
+        for ix, (text, url) in enumerate(zip(texts, urls)):
+            if self.ignore_links and self.ignore_links.search(text):
+                self.counts["ignore_links"] += 1
+                continue
+            if self.ignore_urls and url and self.ignore_urls.search(url):
+                self.counts["ignore_urls"] += 1
+                continue
+            if self.ignore_extensions and url and \
+               self.ignore_extensions.search(url):
+                self.counts["ignore_extensions"] += 1
+                continue
+            if self.only_links:
+                if not self.only_links.search(text):
+                    continue
+                self.counts["only_links"] += 1
+            if self.only_urls:
+                if not url or not self.only_urls.search(url):
+                    continue
+                self.counts["only_urls"] += 1
+            if self.link_priority and self.link_priority.search(text):
+                self.counts["link_priority"] += 1
+                priority.append((ix, text))
+            else:
+                rest.append((ix, text))
+        return priority + rest
@@ -0,0 +1,70 @@
+# -*- coding: UTF-8 -*-
+import heapq
+import itertools
+from urllib.parse import urlparse
+
+
+class Frontier(object):
+    """
+    Queue of URLs waiting to be fetched by the concurrent crawler. URLs
+    come out breadth-first across all hosts: shallowest first, and in
+    the order they were added within a depth. We keep a count of the
+    requests currently in flight to each host so that we never have
+    more than host_concurrency of them going at once, and a host at
+    its limit gets skipped over instead of holding up the others.
+    """
+
+    def __init__(self, host_concurrency=None):
+        # host => heap of (depth, order added, url)
+        self.queues = {}
+        # host => number of requests currently in flight
+        self.in_flight = {}
+        # None means no per-host limit
+        self.host_concurrency = host_concurrency
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def _host(self, url):
+        return urlparse(url).netloc
+
+    def add(self, url, depth):
+        """
+        Queue a URL, found at the given crawl depth.
+        """
+        host = self._host(url)
+        if host not in self.queues:
+            self.queues[host] = []
+        heapq.heappush(self.queues[host], (depth, next(self.counter), url))
+
+    def next(self):
+        """
+        Pop the next (url, depth) pair whose host has a free slot and
+        mark it as in flight. Returns None if nothing is queued or
+        every host with queued URLs is at its concurrency limit.
+        """
+        best = None
+        for host, queue in self.queues.items():
+            active = self.in_flight.get(host, 0)
+            if self.host_concurrency and active >= self.host_concurrency:
+                continue
+            if best is None or queue[0] < self.queues[best][0]:
+                best = host
+        if best is None:
+            return None
+
+        queue = self.queues[best]
+        depth, _, url = heapq.heappop(queue)
+        # drop empty queues, so we only look through hosts with work
+        if not queue:
+            del self.queues[best]
+        self.in_flight[best] = self.in_flight.get(best, 0) + 1
+        return url, depth
+
+    def done(self, url):
+        """
+        Mark a request, previously returned from next, as finished.
+        """
+        host = self._host(url)
+        self.in_flight[host] = max(self.in_flight.get(host, 1) - 1, 0)
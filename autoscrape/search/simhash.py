@@ -0,0 +1,123 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+import re
+import threading
+from collections import Counter
+
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+FINGERPRINT_BITS = 64
+
+
+def _hash64(text):
+    return int.from_bytes(
+        hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def simhash(text, shingle_size=3):
+    """
+    Compute a 64-bit SimHash fingerprint of some text (e.g., a page's
+    visible text), built from overlapping word shingles. Pages that only
+    differ by a few words (timestamps, tokens, ads) get fingerprints that
+    differ in only a few bits. Returns None if there's no text.
+    """
+    tokens = TOKEN_RE.findall(text.lower()) if text else []
+    if not tokens:
+        return None
+    if len(tokens) < shingle_size:
+        shingles = [" ".join(tokens)]
+    else:
+        shingles = [
+            " ".join(tokens[i:i + shingle_size])
+            for i in range(len(tokens) - shingle_size + 1)
+        ]
+
+    weights = [0] * FINGERPRINT_BITS
+    for shingle, count in Counter(shingles).items():
+        h = _hash64(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex(object):
+    """
+    Set of SimHash fingerprints that can be searched for any within a
+    Hamming distance of a given one. Fingerprints are split into
+    distance + 1 blocks; two fingerprints within the distance must match
+    exactly on at least one block, so we only compare against
+    fingerprints sharing a block instead of all of them.
+    """
+
+    def __init__(self, distance=3):
+        self.distance = int(distance)
+        n_blocks = self.distance + 1
+        # (shift, mask) of each block
+        self.blocks = []
+        start = 0
+        for i in range(n_blocks):
+            size = FINGERPRINT_BITS // n_blocks
+            if i < FINGERPRINT_BITS % n_blocks:
+                size += 1
+            self.blocks.append((start, (1 << size) - 1))
+            start += size
+        # one table per block: block value => [fingerprint, ...]
+        self.tables = [{} for _ in self.blocks]
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> shift) & mask for shift, mask in self.blocks]
+
+    def _find(self, fingerprint, keys):
+        for table, key in zip(self.tables, keys):
+            for other in table.get(key, ()):
+                if hamming_distance(fingerprint, other) <= self.distance:
+                    return other
+        return None
+
+    def _add(self, fingerprint, keys):
+        for table, key in zip(self.tables, keys):
+            table.setdefault(key, []).append(fingerprint)
+        self.count += 1
+
+    def find(self, fingerprint):
+        """
+        Return a fingerprint in the index within the distance of the
+        given one, or None if there isn't one.
+        """
+        with self.lock:
+            return self._find(fingerprint, self._keys(fingerprint))
+
+    def add(self, fingerprint):
+        with self.lock:
+            self._add(fingerprint, self._keys(fingerprint))
+
+    def check_and_add(self, fingerprint):
+        """
+        Add a fingerprint, unless it's a near-duplicate of one already
+        in the index. Returns True if it was a near-duplicate.
+        """
+        keys = self._keys(fingerprint)
+        with self.lock:
+            if self._find(fingerprint, keys) is not None:
+                return True
+            self._add(fingerprint, keys)
+            return False
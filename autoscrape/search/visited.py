@@ -0,0 +1,192 @@
+# -*- coding: UTF-8 -*-
+import hashlib
+import math
+import re
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+# query parameters that don't change what a page is: analytics/ad
+# tracking and session IDs
+DEFAULT_STRIP_PARAMS = (
+    r"^(utm_\w+|gclid|dclid|fbclid|msclkid|mc_cid|mc_eid|_ga|_gl|"
+    r"jsessionid|phpsessid|aspsessionid\w*|sessionid|cfid|cftoken)$"
+)
+
+DEFAULT_PORTS = {
+    "http": "80",
+    "https": "443",
+}
+
+
+class URLCanonicalizer(object):
+    """
+    Turns URLs into a canonical form, so that URLs pointing to the same
+    page compare equal. This is only used for comparing URLs, we still
+    fetch the URL as it was found. The canonical form:
+
+        - has a lowercase scheme and host, without a default port
+        - has no fragment and no trailing slash on the path
+        - has its query parameters sorted, without any parameters
+          (or ;param= path parameters) matching strip_params
+    """
+
+    def __init__(self, strip_params=DEFAULT_STRIP_PARAMS):
+        self.strip_params = None
+        if strip_params:
+            self.strip_params = re.compile(strip_params, re.IGNORECASE)
+
+    def _keep_param(self, name):
+        return not self.strip_params or not self.strip_params.match(name)
+
+    def _strip_path_param(self, match):
+        if self._keep_param(match.group(1)):
+            return match.group(0)
+        return ""
+
+    def __call__(self, url):
+        if not url:
+            return url
+        parsed = urlsplit(url.strip())
+        scheme = parsed.scheme.lower()
+        if scheme not in DEFAULT_PORTS:
+            return url
+
+        host = (parsed.hostname or "").rstrip(".")
+        try:
+            port = parsed.port
+        except ValueError:
+            port = None
+        netloc = host
+        if port is not None and str(port) != DEFAULT_PORTS[scheme]:
+            netloc = "%s:%s" % (host, port)
+        if parsed.username:
+            userinfo = parsed.username
+            if parsed.password:
+                userinfo += ":%s" % parsed.password
+            netloc = "%s@%s" % (userinfo, netloc)
+
+        path = re.sub(
+            r";([^/;=]+)=[^/;]*", self._strip_path_param, parsed.path
+        )
+        path = path.rstrip("/")
+
+        params = [
+            (name, value)
+            for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+            if self._keep_param(name)
+        ]
+        query = urlencode(sorted(params))
+
+        canonical = "%s://%s%s" % (scheme, netloc, path)
+        if query:
+            canonical = "%s?%s" % (canonical, query)
+        return canonical
+
+
+canonicalize_url = URLCanonicalizer()
+
+
+class VisitedSet(object):
+    """
+    Exact set of visited keys (e.g., canonical URLs). Only a 64-bit hash
+    of each key is kept, instead of the key itself, which keeps memory
+    use down on big crawls.
+    """
+
+    def __init__(self):
+        self.hashes = set()
+        self.lock = threading.Lock()
+
+    def _hash(self, key):
+        return hashlib.blake2b(
+            key.encode("utf-8"), digest_size=8
+        ).digest()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return self._hash(key) in self.hashes
+
+    def add(self, key):
+        with self.lock:
+            self.hashes.add(self._hash(key))
+
+    def check_and_add(self, key):
+        """
+        Add a key, returning True if it was already there.
+        """
+        h = self._hash(key)
+        with self.lock:
+            if h in self.hashes:
+                return True
+            self.hashes.add(h)
+            return False
+
+
+class BloomFilter(VisitedSet):
+    """
+    Fixed-size, probabilistic set of visited keys, for crawls too big
+    to keep a hash of every URL around. Sized for capacity keys with a
+    false positive rate of error_rate: a never-visited URL will be
+    considered visited (and skipped) that often. Nothing is ever
+    mistakenly considered unvisited.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = int(capacity)
+        self.size = int(math.ceil(
+            -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        ))
+        self.n_hashes = max(1, int(round(
+            self.size / self.capacity * math.log(2)
+        )))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _positions(self, key):
+        # double hashing, see Kirsch & Mitzenmacher
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.n_hashes)]
+
+    def _test(self, positions):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def _set(self, positions):
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return self._test(self._positions(key))
+
+    def add(self, key):
+        positions = self._positions(key)
+        with self.lock:
+            if not self._test(positions):
+                self._set(positions)
+
+    def check_and_add(self, key):
+        positions = self._positions(key)
+        with self.lock:
+            if self._test(positions):
+                return True
+            self._set(positions)
+            return False
+
+
+def visited_store(bloom_size=None):
+    """
+    Get a store for visited URLs: a bloom filter sized for bloom_size
+    URLs, if given, otherwise an exact VisitedSet.
+    """
+    if bloom_size:
+        return BloomFilter(bloom_size)
+    return VisitedSet()
@@ -4,6 +4,7 @@ import re
 
 from celery import Celery
 
+from .backends.selenium.pool import WebDriverPool
 from .scrapers.manual import ManualControlScraper
 
 
@@ -33,6 +34,14 @@ app.conf.update(
     CELERY_BROKER_HEARTBEAT=10
 )
 
+# browsers are kept running between tasks in each worker process, since
+# launching one can take longer than a short scrape
+max_memory = os.environ.get("AUTOSCRAPE_BROWSER_MAX_MEMORY")
+webdriver_pool = WebDriverPool(
+    max_uses=int(os.environ.get("AUTOSCRAPE_BROWSER_MAX_USES", 50)),
+    max_memory=int(max_memory) if max_memory else None,
+)
+
 
 @app.task(bind=True)
 def start(self, baseurl, args):
@@ -44,5 +53,20 @@ def start(self, baseurl, args):
             output += "/"
         output += str(self.request.id)
         args["output"] = output
-    scraper = ManualControlScraper(baseurl, **args)
-    scraper.run()
+    webdriver_session = None
+    if args.get("backend", "selenium") == "selenium":
+        webdriver_session = webdriver_pool.acquire(**args)
+    scraper = None
+    try:
+        scraper = ManualControlScraper(
+            baseurl, webdriver_session=webdriver_session, **args
+        )
+        scraper.run()
+    finally:
+        if webdriver_session is not None:
+            # if the scraper didn't start up, we don't know where the
+            # browser went, so the pool will quit it
+            origins = None
+            if scraper is not None:
+                origins = scraper.control.scraper.visited_origins
+            webdriver_pool.release(webdriver_session, origins=origins)
@@ -8,6 +8,9 @@ from urllib import parse
 
 import requests
 
+from autoscrape.util.sinks import get_sink
+from autoscrape.util.upload import get_uploader
+
 
 logger = logging.getLogger('AUTOSCRAPE')
 
@@ -64,8 +67,14 @@ def write_file(filepath, data, fileclass=None, writetype="w", output=None,
     if not output:
         return
 
+    # Rest API callback mode, batched in the background
+    if get_uploader(output) is not None:
+        get_uploader(output).put(
+            filepath, data, fileclass=fileclass, url=url
+        )
+
     # Rest API callback mode
-    if re.match("^https?://", output):
+    elif re.match("^https?://", output):
         # (b64encode) bytes -> (decode) str
         if type(data) == bytes:
             encoded = base64.b64encode(data).decode()
@@ -88,10 +97,9 @@ def write_file(filepath, data, fileclass=None, writetype="w", output=None,
             )
             r.status_code
 
-    # filesystem mode
+    # filesystem mode, see autoscrape.util.sinks
     else:
-        dirpath = os.path.dirname(filepath)
-        if not os.path.exists(dirpath):
-            os.makedirs(dirpath)
-        with open(filepath, writetype) as f:
-            f.write(data)
+        get_sink(output).write(
+            filepath, data, fileclass=fileclass, writetype=writetype,
+            url=url,
+        )
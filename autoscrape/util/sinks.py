@@ -0,0 +1,242 @@
+# -*- coding: UTF-8 -*-
+import datetime
+import io
+import logging
+import mimetypes
+import os
+import sqlite3
+import sys
+import threading
+
+try:
+    from warcio.warcwriter import WARCWriter
+except ModuleNotFoundError:
+    # we haven't installed WARC deps
+    pass
+
+
+logger = logging.getLogger('AUTOSCRAPE')
+
+
+# output directory => sink
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+class DirectorySink:
+    """
+    Writes each file to its own path under the output directory. This is
+    the default. Directories we've already created are remembered so we
+    don't have to check for them on every write.
+    """
+
+    def __init__(self, output):
+        self.output = output
+        self.created = set()
+        self.lock = threading.Lock()
+
+    def write(self, filepath, data, fileclass=None, writetype="w", url=None):
+        dirpath = os.path.dirname(filepath)
+        if dirpath not in self.created:
+            os.makedirs(dirpath, exist_ok=True)
+            with self.lock:
+                self.created.add(dirpath)
+        with open(filepath, writetype) as f:
+            f.write(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BufferedSink:
+    """
+    Base for sinks that write everything to a single file. Files are
+    buffered in memory and written out in batches of batch_size files
+    or batch_bytes bytes, whichever comes first.
+
+    Filepaths are stored relative to the output directory, so a file
+    that would have been written to OUTPUT/data_pages/HASH.html is
+    stored under the name data_pages/HASH.html.
+    """
+
+    def __init__(self, output, batch_size=64, batch_bytes=8 * 1024 * 1024):
+        self.output = output
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.batch = []
+        self.batch_size_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(output, exist_ok=True)
+
+    def write(self, filepath, data, fileclass=None, writetype="w", url=None):
+        if not isinstance(data, bytes):
+            data = bytes(data, "utf-8")
+        name = os.path.relpath(filepath, self.output)
+        with self.lock:
+            self.batch.append({
+                "name": name,
+                "fileclass": fileclass,
+                "url": url,
+                "data": data,
+                "timestamp": datetime.datetime.utcnow(),
+            })
+            self.batch_size_bytes += len(data)
+            if len(self.batch) >= self.batch_size or \
+               self.batch_size_bytes >= self.batch_bytes:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        logger.debug("[.] Writing %s files to %s" % (
+            len(self.batch), self.path
+        ))
+        self.write_batch(self.batch)
+        self.batch = []
+        self.batch_size_bytes = 0
+
+    def write_batch(self, batch):
+        raise NotImplementedError()
+
+
+class WARCSink(BufferedSink):
+    """
+    Appends files, as WARC resource records, to a single gzipped WARC
+    file in the output directory. Each record's WARC-Target-URI is the
+    URL the file came from and the AutoScrape-Name and
+    AutoScrape-Fileclass headers hold where the file would have been
+    saved to in directory mode.
+    """
+    FILENAME = "autoscrape.warc.gz"
+
+    def __init__(self, output, **kwargs):
+        # check now, instead of losing the first batch of pages to a
+        # NameError when it gets written
+        try:
+            WARCWriter
+        except NameError:
+            logger.error(
+                "Tried to use the warc output format but warcio isn't"
+                " installed. (Hint: pip install autoscrape[warc-backend])"
+                " Exiting."
+            )
+            sys.exit(1)
+        super().__init__(output, **kwargs)
+        self.path = os.path.join(output, self.FILENAME)
+
+    def write_batch(self, batch):
+        # build the batch in memory, so the file is only touched once
+        buffer = io.BytesIO()
+        writer = WARCWriter(buffer, gzip=True)
+        for item in batch:
+            content_type = mimetypes.guess_type(item["name"])[0] or \
+                "application/octet-stream"
+            record = writer.create_warc_record(
+                item["url"] or item["name"], "resource",
+                payload=io.BytesIO(item["data"]),
+                length=len(item["data"]),
+                warc_content_type=content_type,
+                warc_headers_dict={
+                    "WARC-Date": item["timestamp"].isoformat(
+                        timespec="seconds") + "Z",
+                    "AutoScrape-Name": item["name"],
+                    "AutoScrape-Fileclass": item["fileclass"] or "",
+                },
+            )
+            writer.write_record(record)
+        with open(self.path, "ab") as f:
+            f.write(buffer.getvalue())
+
+
+class SQLiteSink(BufferedSink):
+    """
+    Stores files in a single SQLite database in the output directory,
+    in a table named files (name, fileclass, url, timestamp, data).
+    """
+    FILENAME = "autoscrape.sqlite"
+
+    def __init__(self, output, **kwargs):
+        super().__init__(output, **kwargs)
+        self.path = os.path.join(output, self.FILENAME)
+        # batches may get written from any scraper thread, always
+        # while holding the sink's lock
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                fileclass TEXT,
+                url TEXT,
+                timestamp TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def write_batch(self, batch):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO files (name, fileclass, url, timestamp, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(
+                    item["name"], item["fileclass"], item["url"],
+                    item["timestamp"].isoformat(), item["data"],
+                ) for item in batch]
+            )
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+
+SINKS = {
+    "directory": DirectorySink,
+    "warc": WARCSink,
+    "sqlite": SQLiteSink,
+}
+
+
+def start_sink(output, output_format="directory", **kwargs):
+    """
+    Send everything written to the given output directory through
+    a sink of the given format (directory, warc or sqlite).
+    """
+    if output_format not in SINKS:
+        raise ValueError("Unknown output format: %s" % output_format)
+    with _sinks_lock:
+        if output not in _sinks:
+            _sinks[output] = SINKS[output_format](output, **kwargs)
+        return _sinks[output]
+
+
+def get_sink(output):
+    """
+    Get the sink for an output directory, starting a directory sink
+    if none has been set up.
+    """
+    sink = _sinks.get(output)
+    if sink is None:
+        sink = start_sink(output)
+    return sink
+
+
+def stop_sink(output):
+    """
+    Write out anything buffered for an output directory and close
+    its sink.
+    """
+    with _sinks_lock:
+        sink = _sinks.pop(output, None)
+    if sink is not None:
+        sink.close()
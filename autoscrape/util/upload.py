@@ -0,0 +1,174 @@
+# -*- coding: UTF-8 -*-
+import json
+import logging
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger('AUTOSCRAPE')
+
+
+# output URL => BulkUploader
+_uploaders = {}
+_uploaders_lock = threading.Lock()
+
+
+class BulkUploader:
+    """
+    Sends scraped files to an API callback URL in the background, so
+    the scrape doesn't have to wait on the receiving server. Files are
+    queued up (the queue is bounded, so a slow server will eventually
+    slow the scrape down instead of us buffering everything in memory)
+    and a worker thread POSTs them in batches, as raw bytes in a
+    multipart request, to the callback URL's /bulk endpoint:
+
+        manifest: JSON list of {"name", "fileclass", "url"}, in order
+        file: one part per file, in the same order as the manifest
+
+    Batches that can't be uploaded after a few retries are dropped.
+    The number of files lost that way is kept in failed, and returned
+    from close.
+    """
+
+    def __init__(self, output, batch_size=32, batch_bytes=8 * 1024 * 1024,
+                 queue_size=256, flush_interval=1.0, retries=3):
+        self.url = "%s/bulk" % output.rstrip("/")
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.retries = retries
+        # number of files we gave up on uploading
+        self.failed = 0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.queue = queue.Queue(maxsize=queue_size)
+        # marks the end of the queue, see close
+        self._done = object()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def put(self, name, data, fileclass=None, url=None):
+        """
+        Queue a file for upload. Blocks if the queue is full.
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data, "utf-8")
+        self.queue.put({
+            "name": name,
+            "fileclass": fileclass,
+            "url": url,
+            "data": data,
+        })
+
+    def close(self):
+        """
+        Upload anything still queued and stop the worker thread.
+        Returns the number of files that couldn't be uploaded.
+        """
+        self.queue.put(self._done)
+        self.thread.join()
+        self.session.close()
+        if self.failed:
+            logger.error("[!] Failed to upload %s files to %s" % (
+                self.failed, self.url
+            ))
+        return self.failed
+
+    def _run(self):
+        done = False
+        while not done:
+            item = self.queue.get()
+            if item is self._done:
+                break
+            batch = [item]
+            size = len(item["data"])
+            # keep adding to this batch until it's full or no more
+            # files show up for a little while
+            while len(batch) < self.batch_size and size < self.batch_bytes:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if item is self._done:
+                    done = True
+                    break
+                batch.append(item)
+                size += len(item["data"])
+            # anything going wrong here mustn't stop the worker, or
+            # the scrape would block forever on the full queue
+            try:
+                uploaded = self._post(batch)
+            except Exception as e:
+                logger.error("[!] Error uploading %s files: %s" % (
+                    len(batch), e
+                ))
+                uploaded = False
+            if not uploaded:
+                self.failed += len(batch)
+
+    def _post(self, batch):
+        """
+        Upload a batch, retrying with backoff. Returns False if we had
+        to give up on it.
+        """
+        manifest = [{
+            "name": item["name"],
+            "fileclass": item["fileclass"],
+            "url": item["url"],
+        } for item in batch]
+        files = [
+            ("file", (item["name"], item["data"], "application/octet-stream"))
+            for item in batch
+        ]
+        for attempt in range(self.retries + 1):
+            try:
+                r = self.session.post(
+                    self.url, data={"manifest": json.dumps(manifest)},
+                    files=files,
+                )
+                r.raise_for_status()
+                logger.debug("[.] Uploaded %s files" % (len(batch)))
+                return True
+            except requests.RequestException as e:
+                logger.debug("[!] Upload failed (attempt %s): %s" % (
+                    attempt + 1, e
+                ))
+                if attempt < self.retries:
+                    time.sleep(2 ** attempt)
+        logger.error("[!] Giving up uploading %s files to %s" % (
+            len(batch), self.url
+        ))
+        return False
+
+
+def start_uploader(output, **kwargs):
+    """
+    Send everything written to the given output URL through a
+    BulkUploader, instead of one blocking request per file.
+    """
+    with _uploaders_lock:
+        if output not in _uploaders:
+            _uploaders[output] = BulkUploader(output, **kwargs)
+        return _uploaders[output]
+
+
+def get_uploader(output):
+    return _uploaders.get(output)
+
+
+def stop_uploader(output):
+    """
+    Finish uploading everything queued for an output URL. Returns
+    the number of files that couldn't be uploaded.
+    """
+    with _uploaders_lock:
+        uploader = _uploaders.pop(output, None)
+    if uploader is not None:
+        return uploader.close()
+    return 0
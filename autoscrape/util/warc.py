@@ -1,7 +1,10 @@
+import io
 import logging
+from collections import OrderedDict
 from multiprocessing import Pool
 import os
 import pickle
+import struct
 
 try:
     import plyvel
@@ -13,6 +16,23 @@ except ModuleNotFoundError:
 logger = logging.getLogger('AUTOSCRAPE')
 
 
+# Keys in the WARC index that aren't URLs live under these prefixes. No
+# URL starts with a null byte, so these never collide with real entries.
+INDEXED_FILES_PREFIX = b"\x00indexed-file\x00"
+# filepath => file ID and file ID => filepath
+FILE_IDS_PREFIX = b"\x00file-id\x00"
+FILE_PATHS_PREFIX = b"\x00file-path\x00"
+INDEX_VERSION_KEY = b"\x00version"
+
+# Index values used to be pickled (filepath, record_number) or
+# (filepath, offset, length) tuples. Version 2 values are a fixed-width
+# (file ID, offset, length) struct, with the filepaths stored once in
+# the file ID table.
+INDEX_VERSION = b"2"
+INDEX_VALUE = struct.Struct(">IQI")
+FILE_ID = struct.Struct(">I")
+
+
 def _warc_record_sane(record):
     if record.rec_type != "response":
         return False
@@ -21,23 +41,114 @@ def _warc_record_sane(record):
     return True
 
 
-def _warc_records(filename):
-    records = []
+def _parse_record(record):
+    return {
+        "uri": record.rec_headers.get_header('WARC-Target-URI'),
+        "payload": record.content_stream().read().strip(),
+        "headers": record.http_headers.headers,
+    }
+
+
+def _warc_record_offsets(filename):
+    """
+    Yield (uri, offset, length) for each response record in a WARC
+    file, where offset and length are the position of the record's
+    (gzip member) bytes in the file.
+    """
     try:
         with open(filename, "rb") as f:
-            for record in warcio.ArchiveIterator(f):
+            iterator = warcio.ArchiveIterator(f)
+            for record in iterator:
                 if not _warc_record_sane(record):
                     continue
-                parsed_rec = {
-                    "uri": record.rec_headers.get_header('WARC-Target-URI'),
-                    "payload": record.content_stream().read().strip(),
-                    "headers": record.http_headers.headers,
-                }
-                yield parsed_rec
+                uri = record.rec_headers.get_header('WARC-Target-URI')
+                # this reads to the end of the record
+                offset = iterator.get_record_offset()
+                length = iterator.get_record_length()
+                yield uri, offset, length
     except Exception as e:
         logger.error("[!] Error opening WARC file %s" % (filename))
         logger.error(e)
-    return records
+
+
+def read_warc_record(filename, offset, length):
+    """
+    Read a single record from a WARC file, given its offset and
+    length, without reading any of the rest of the file. Returns None
+    if there's no readable record there (e.g., the file has been
+    truncated or rewritten since it was indexed).
+    """
+    with open(filename, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    try:
+        for record in warcio.ArchiveIterator(io.BytesIO(data)):
+            return _parse_record(record)
+    except Exception as e:
+        logger.error("[!] Error reading WARC record from %s at %s: %s" % (
+            filename, offset, e
+        ))
+    return None
+
+
+class WARCRecordCache:
+    """
+    An LRU cache of parsed WARC records, keyed by (file ID, offset) and
+    bounded by the total size of the record payloads, in bytes. Hit,
+    miss and eviction counts are kept so the budget can be sized to
+    the crawl.
+    """
+
+    def __init__(self, max_size=None):
+        # None or zero means don't cache anything
+        self.max_size = max_size or 0
+        self.size = 0
+        # (file_id, offset) => parsed record, least recently used first
+        self.records = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def _record_size(self, record):
+        return len(record["payload"] or b"")
+
+    def get(self, key):
+        record = self.records.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.records.move_to_end(key)
+        return record
+
+    def put(self, key, record):
+        size = self._record_size(record)
+        if size > self.max_size:
+            return
+        if key in self.records:
+            self.size -= self._record_size(self.records.pop(key))
+        self.records[key] = record
+        self.size += size
+        while self.size > self.max_size:
+            evicted_key, evicted = self.records.popitem(last=False)
+            self.size -= self._record_size(evicted)
+            self.evictions += 1
+            logger.debug(" - Evicting WARC record from cache: %s" % (
+                evicted["uri"]
+            ))
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "records": len(self.records),
+            "size": self.size,
+            "max_size": self.max_size,
+        }
 
 
 def _process_warcfile(filepath, filter_domain):
@@ -45,42 +156,202 @@ def _process_warcfile(filepath, filter_domain):
     if not filepath.endswith(".warc.gz"):
         return []
     logger.debug(" - Parsing %s" % (filepath))
-    record_number = -1
     results = []
-    for record in _warc_records(filepath):
-        record_number += 1
-        uri = record["uri"]
+    for uri, offset, length in _warc_record_offsets(filepath):
         if filter_domain and filter_domain not in uri:
             continue
         logger.debug("URI: %s" % (uri))
         found += 1
-        uri_bytes = bytes(uri, "utf-8")
-        value = pickle.dumps((filepath, record_number))
-        results.append((uri_bytes, value))
+        results.append((bytes(uri, "utf-8"), offset, length))
     if found:
         logger.debug(" - Found %s records" % (found))
     return results
 
 
-def build_warc_index(db=None, warc_directory=None, filter_domain=None):
+def encode_index_value(file_id, offset, length):
+    return INDEX_VALUE.pack(file_id, offset, length)
+
+
+def decode_index_value(value):
+    """
+    Turn an index value back into a (file ID, offset, length) tuple.
+    """
+    return INDEX_VALUE.unpack(value)
+
+
+def warc_file_id(db, filepath):
+    """
+    Get the ID for a WARC filepath from the file table, adding it to
+    the table if it isn't there yet.
+    """
+    path_b = bytes(filepath, "utf-8")
+    file_id_b = db.get(FILE_IDS_PREFIX + path_b)
+    if file_id_b is not None:
+        return FILE_ID.unpack(file_id_b)[0]
+
+    last = next(db.iterator(
+        prefix=FILE_PATHS_PREFIX, reverse=True, include_value=False
+    ), None)
+    file_id = 0
+    if last is not None:
+        file_id = FILE_ID.unpack(last[len(FILE_PATHS_PREFIX):])[0] + 1
+    file_id_b = FILE_ID.pack(file_id)
+    with db.write_batch() as batch:
+        batch.put(FILE_IDS_PREFIX + path_b, file_id_b)
+        batch.put(FILE_PATHS_PREFIX + file_id_b, path_b)
+    return file_id
+
+
+def warc_file_path(db, file_id):
+    """
+    Look up a WARC filepath by its ID in the file table.
+    """
+    path_b = db.get(FILE_PATHS_PREFIX + FILE_ID.pack(file_id))
+    if path_b is None:
+        return None
+    return path_b.decode("utf-8")
+
+
+def migrate_warc_index(db, filter_domain=None, batch_size=10000):
+    """
+    Convert an index with pickled values to the packed version 2
+    format. Values that point to records by (filepath, record_number)
+    get converted by re-scanning their WARC files for record offsets.
+    Anything pointing to a WARC file that no longer exists is dropped.
+
+    Old indexes didn't record which files they were built from, so
+    every file referenced by the index gets marked as indexed (with
+    the given filter_domain) unless it already is.
+    """
+    if db.get(INDEX_VERSION_KEY) == INDEX_VERSION:
+        return
+
+    if next(db.iterator(include_value=False), None) is None:
+        db.put(INDEX_VERSION_KEY, INDEX_VERSION)
+        return
+
+    logger.info("[.] Migrating WARC index to version %s..." % (
+        INDEX_VERSION.decode()
+    ))
+
+    # filepath => [(uri_bytes, record_number), ...]
+    by_record_number = {}
+    filepaths = set()
+    batch = db.write_batch()
+    pending = 0
+    for uri_bytes, value in db.iterator():
+        if uri_bytes.startswith(b"\x00"):
+            continue
+        # already converted by a migration that got interrupted
+        if len(value) == INDEX_VALUE.size and not value.startswith(b"\x80"):
+            continue
+        entry = pickle.loads(value)
+        filepaths.add(entry[0])
+        if len(entry) == 2:
+            filepath, record_number = entry
+            if filepath not in by_record_number:
+                by_record_number[filepath] = []
+            by_record_number[filepath].append((uri_bytes, record_number))
+            continue
+
+        filepath, offset, length = entry
+        file_id = warc_file_id(db, filepath)
+        batch.put(uri_bytes, encode_index_value(file_id, offset, length))
+        pending += 1
+        if pending >= batch_size:
+            batch.write()
+            batch = db.write_batch()
+            pending = 0
+    batch.write()
+
+    for filepath, entries in by_record_number.items():
+        batch = db.write_batch()
+        if not os.path.exists(filepath):
+            logger.debug(" - WARC file missing, dropping: %s" % filepath)
+            for uri_bytes, _ in entries:
+                batch.delete(uri_bytes)
+            batch.write()
+            continue
+
+        logger.debug(" - Finding record offsets in %s" % filepath)
+        offsets = [
+            (offset, length)
+            for _, offset, length in _warc_record_offsets(filepath)
+        ]
+        file_id = warc_file_id(db, filepath)
+        for uri_bytes, record_number in entries:
+            if record_number >= len(offsets):
+                batch.delete(uri_bytes)
+                continue
+            offset, length = offsets[record_number]
+            batch.put(uri_bytes, encode_index_value(file_id, offset, length))
+        batch.write()
+
+    domain_b = bytes(filter_domain or "", "utf-8")
+    for filepath in filepaths:
+        key = INDEXED_FILES_PREFIX + bytes(filepath, "utf-8")
+        if os.path.exists(filepath) and db.get(key) is None:
+            db.put(key, domain_b)
+
+    db.put(INDEX_VERSION_KEY, INDEX_VERSION)
+    logger.info("[.] WARC index migration complete.")
+
+
+def _process_warcfile_args(args):
+    """
+    Pool.imap_unordered only passes a single argument, so unpack it
+    here and hand back the filepath along with its results.
+    """
+    filepath, filter_domain = args
+    return filepath, _process_warcfile(filepath, filter_domain)
+
+
+def build_warc_index(db=None, warc_directory=None, filter_domain=None,
+                     processes=4):
     """
     Read through all WARC files in warc_directory and build
-    an index: URL => filename, record_number
+    an index: URL => file ID, record offset, record length
+
+    Files are parsed by a pool of worker processes and each file's
+    results are written to the DB, in a single batch, as soon as that
+    file is done. We also record which files have been indexed (and
+    with which filter_domain) under the INDEXED_FILES_PREFIX, so new
+    WARCs dropped into warc_directory get picked up on the next run
+    without re-indexing everything.
     """
-    blank = True
-    for rec in db.iterator():
-        blank = False
-        break
-    if not blank:
+    indexed_files = db.prefixed_db(INDEXED_FILES_PREFIX)
+    domain_b = bytes(filter_domain or "", "utf-8")
+
+    filepaths = []
+    for filename in sorted(os.listdir(warc_directory)):
+        filepath = os.path.join(warc_directory, filename)
+        if not filepath.endswith(".warc.gz") or not os.path.isfile(filepath):
+            continue
+        if indexed_files.get(bytes(filepath, "utf-8")) == domain_b:
+            continue
+        filepaths.append((filepath, filter_domain))
+
+    if not filepaths:
         logger.debug("[.] Already loaded WARC index.")
         return
-    logger.info("[.] Building WARC index. This might take a while...")
-    _, _, filenames = list(os.walk(warc_directory))[0]
-    filepaths = [(os.path.join(warc_directory, n), filter_domain) for n in filenames]
-    print(filepaths[0])
-
-    with Pool(4) as f:
-        results_groups = f.starmap(_process_warcfile, filepaths)
-    for results in results_groups:
-        for uri_bytes, value in results:
-            db.put(uri_bytes, value)
+
+    logger.info("[.] Indexing %s WARC files. This might take a while..." % (
+        len(filepaths)
+    ))
+    with Pool(processes) as pool:
+        for filepath, results in pool.imap_unordered(_process_warcfile_args,
+                                                     filepaths):
+            file_id = warc_file_id(db, filepath)
+            with db.write_batch() as batch:
+                for uri_bytes, offset, length in results:
+                    batch.put(
+                        uri_bytes,
+                        encode_index_value(file_id, offset, length)
+                    )
+                batch.put(
+                    INDEXED_FILES_PREFIX + bytes(filepath, "utf-8"),
+                    domain_b
+                )
+            logger.debug(" - Indexed %s (%s records)" % (
+                filepath, len(results)
+            ))
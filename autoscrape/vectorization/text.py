@@ -44,9 +44,20 @@ class TextVectorizer:
         return form_data
 
     def button_vectors(self):
+        state = self.scraper.get_page_state()
+        return state.get("button_vectors", lambda: self._button_vectors(state))
+
+    def _button_vectors(self, state):
         logger.debug("[.] Building button vectors")
+        infos = self.scraper.get_tag_infos(state.buttons)
         buttons_data = []
-        for tag in self.controller.scraper.get_buttons():
+        for ix, tag in enumerate(state.buttons):
+            if infos is not None and infos[ix] is not None:
+                text = [infos[ix]["text"]]
+                if infos[ix]["value"]:
+                    text.insert(0, infos[ix]["value"])
+                buttons_data.append(" ".join(text))
+                continue
             elem = self.scraper.element_by_tag(tag)
             value = ""
             if elem is not None:
@@ -66,9 +77,22 @@ class TextVectorizer:
         in a way that a ML algorithm could decide how to prioritize the
         search pattern.
         """
+        state = self.scraper.get_page_state()
+        return state.get("link_vectors", lambda: self._link_vectors(state))
+
+    def _link_vectors(self, state):
         logger.debug("[.] Building link vectors")
+        infos = self.scraper.get_tag_infos(state.clickable)
         buttons_data = []
-        for t in self.controller.scraper.get_clickable():
+        for ix, t in enumerate(state.clickable):
+            if infos is not None and infos[ix] is not None:
+                info = infos[ix]
+                if info["node"] == "input":
+                    text = info["value"] or ""
+                else:
+                    text = info["text"]
+                buttons_data.append(text.replace("\n", " "))
+                continue
             elem = self.scraper.element_by_tag(t)
             tag_name = self.scraper.element_tag_name(elem)
             text = ""
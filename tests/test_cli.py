@@ -0,0 +1,15 @@
+import unittest
+
+from docopt import docopt
+
+from autoscrape.cli import scrape
+
+
+class ScrapeCLITestCase(unittest.TestCase):
+    def test_defaults(self):
+        args = docopt(scrape.__doc__, argv=["https://example.com"])
+        self.assertEqual(args["--force-page-wait"], "1")
+        self.assertEqual(args["--page-quiet-period"], "0.5")
+        self.assertEqual(args["--page-quiet-max"], "3")
+        self.assertEqual(args["--page-timeout"], "30")
+        self.assertEqual(args["--output-format"], "directory")
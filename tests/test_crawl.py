@@ -0,0 +1,128 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from autoscrape import ManualControlScraper
+
+
+class FakeSite:
+    """
+    Serves pages made up of links to the given paths, in place of
+    requests.Session.send, and records the URLs fetched.
+    """
+    def __init__(self, links):
+        # path => [linked path, ...]
+        self.links = links
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def send(self, session, request, **kwargs):
+        path = request.url.replace("http://x.test", "")
+        with self.lock:
+            self.fetched.append(path)
+        body = "<html><body><h1>%s</h1>%s</body></html>" % (path, "".join(
+            '<a href="%s">%s</a>' % (link, link)
+            for link in self.links.get(path, [])
+        ))
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "text/html"
+        response._content = body.encode("utf-8")
+        return response
+
+    def patch(self):
+        site = self
+
+        def send(session, request, **kwargs):
+            return site.send(session, request, **kwargs)
+
+        return mock.patch.object(requests.Session, "send", send)
+
+
+# breadth-first order: /, /a, /b, /c, /d, /e, /f
+TREE = {
+    "/": ["/a", "/b"],
+    "/a": ["/c", "/d"],
+    "/b": ["/e"],
+    "/c": ["/f"],
+}
+
+
+def crawl(site, **kwargs):
+    with site.patch():
+        scraper = ManualControlScraper(
+            "http://x.test/", backend="requests", return_data=True,
+            loglevel="ERROR", **kwargs
+        )
+        crawl_data = scraper.run()
+    return scraper, [
+        data["url"].replace("http://x.test", "") for data in crawl_data
+    ]
+
+
+class ConcurrentCrawlTestCase(unittest.TestCase):
+    def test_breadth_first_order(self):
+        site = FakeSite(TREE)
+        # one request at a time, so pages complete in the order queued
+        scraper, pages = crawl(site, crawl_workers=4, host_concurrency=1)
+        self.assertEqual(pages, ["/", "/a", "/b", "/c", "/d", "/e", "/f"])
+        self.assertEqual(site.fetched, pages)
+
+    def test_depth_limit(self):
+        site = FakeSite(TREE)
+        scraper, pages = crawl(
+            site, crawl_workers=4, host_concurrency=1, maxdepth=2
+        )
+        self.assertEqual(pages, ["/", "/a", "/b", "/c", "/d", "/e"])
+        self.assertNotIn("/f", site.fetched)
+
+    def test_max_pages_with_workers(self):
+        links = {"/": ["/%s" % i for i in range(20)]}
+        site = FakeSite(links)
+        scraper, pages = crawl(site, crawl_workers=4, max_pages=5)
+        self.assertEqual(scraper.total_pages, 5)
+        # the start page, plus max_pages more
+        self.assertEqual(len(site.fetched), 6)
+        self.assertEqual(len(pages), 6)
+
+
+class IterRunTestCase(unittest.TestCase):
+    def setUp(self):
+        # a long chain of pages, /0 => /1 => ... => /49
+        self.site = FakeSite({
+            "/%s" % i: ["/%s" % (i + 1)] for i in range(49)
+        })
+
+    def scraper(self):
+        return ManualControlScraper(
+            "http://x.test/0", backend="requests", maxdepth=-1,
+            loglevel="ERROR",
+        )
+
+    def test_backpressure(self):
+        with self.site.patch():
+            pages = self.scraper().iter_run(queue_size=2)
+            self.assertEqual(next(pages)["url"], "http://x.test/0")
+            time.sleep(0.5)
+            # one taken, two queued and one waiting to be queued
+            self.assertLessEqual(len(self.site.fetched), 4)
+            pages.close()
+
+    def test_stop_early(self):
+        threads = set(threading.enumerate())
+        with self.site.patch():
+            pages = self.scraper().iter_run(queue_size=2)
+            for i, page in enumerate(pages):
+                if i == 2:
+                    break
+            pages.close()
+            fetched = len(self.site.fetched)
+            time.sleep(0.3)
+            self.assertEqual(len(self.site.fetched), fetched)
+        self.assertLess(fetched, 50)
+        self.assertEqual(set(threading.enumerate()), threads)
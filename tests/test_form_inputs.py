@@ -0,0 +1,84 @@
+import unittest
+
+from autoscrape.backends.base.tags import (
+    INPUT_GROUPS, group_inputs, input_groups
+)
+from autoscrape.backends.requests.tags import Tagger
+
+
+FORM_PAGE = """
+<html><body>
+<form action="/search">
+  <input type="hidden" name="token" value="abc">
+  <input type="text" name="q">
+  <select name="country"><option>France</option></select>
+  <input type="checkbox" name="exact">
+  <input type="date" name="from">
+  <input type="text" structure="date" name="to">
+  <input type="radio" name="sort" value="asc">
+  <input type="radio" name="sort" value="desc">
+  <input type="radio" name="view" value="list">
+  <input type="radio" name="sort" value="date">
+  <input type="submit" value="Search">
+</form>
+</body></html>
+"""
+
+
+def input_tag(nth):
+    return (
+        "html:nth-of-type(1) > body:nth-of-type(1) > form:nth-of-type(1)"
+        " > input:nth-of-type(%s)" % nth
+    )
+
+
+class FormInputsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tagger = Tagger(
+            current_html=FORM_PAGE, current_url="http://x.com/"
+        )
+        self.form = self.tagger.elements_by_path("//form")[0]
+
+    def test_matches_per_type_lookups(self):
+        # what get_forms used to do: one get_inputs query per group
+        previous = [
+            self.tagger.get_inputs(form=self.form, itype=itype)
+            for itype in INPUT_GROUPS
+        ]
+        self.assertEqual(self.tagger.get_form_inputs(self.form), previous)
+
+    def test_groups(self):
+        select_tag = (
+            "html:nth-of-type(1) > body:nth-of-type(1) > form:nth-of-type(1)"
+            " > select:nth-of-type(1)"
+        )
+        text, select, checkbox, date, radio = self.tagger.get_form_inputs(
+            self.form
+        )
+        # the hidden input (input 1) and the submit button are skipped
+        self.assertEqual(text, [input_tag(2), input_tag(5)])
+        self.assertEqual(select, [select_tag])
+        self.assertEqual(checkbox, [input_tag(3)])
+        self.assertEqual(date, [input_tag(4), input_tag(5)])
+        # radios are grouped by name, in order of first appearance
+        self.assertEqual(radio, [
+            [input_tag(6), input_tag(7), input_tag(9)],
+            [input_tag(8)],
+        ])
+
+    def test_input_groups(self):
+        self.assertEqual(input_groups("select", itype="text"), ["select"])
+        self.assertEqual(input_groups("input", itype="hidden"), [])
+        self.assertEqual(input_groups("input", itype="submit"), [])
+        self.assertEqual(
+            input_groups("input", itype="text", structure="date"),
+            ["text", "date"]
+        )
+
+    def test_group_inputs(self):
+        self.assertEqual(group_inputs([
+            (["radio"], "r1", "a"),
+            (["text"], "t1", "q"),
+            (["radio"], "r2", "b"),
+            (["radio"], "r3", "a"),
+        ]), [["t1"], [], [], [], [["r1", "r3"], ["r2"]]])
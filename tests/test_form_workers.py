@@ -0,0 +1,63 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from autoscrape import ManualControlScraper
+
+
+PHASES = [
+    [{"type": "input", "index": 0, "string": "a"}],
+    [{"type": "input", "index": 0, "string": "b"}],
+    [{"type": "input", "index": 0, "string": "c"}],
+]
+
+
+def make_scraper():
+    scraper = ManualControlScraper.__new__(ManualControlScraper)
+    scraper.input_gen = iter(PHASES)
+    scraper.form_workers = 2
+    scraper.control_kwargs = {}
+    scraper.control = SimpleNamespace(scraper=SimpleNamespace(
+        path=[("fetch", ("http://x.com/",), {})],
+        page_url="http://x.com/",
+    ))
+    return scraper
+
+
+def failing_controller(**kwargs):
+    """
+    A worker's Controller, whose browser can't load any page.
+    """
+    browser = mock.Mock()
+    browser.fetch.return_value = False
+    return SimpleNamespace(scraper=browser)
+
+
+class FormWorkersTestCase(unittest.TestCase):
+    def run_phases(self, scraper, results):
+        ran = []
+
+        def run_input_phase(ix, input_phase):
+            ran.append(input_phase)
+            return results.pop(0)
+
+        with mock.patch(
+            "autoscrape.scrapers.manual.Controller", failing_controller
+        ), mock.patch.object(
+            scraper, "run_input_phase", side_effect=run_input_phase
+        ):
+            completed = scraper.run_input_phases_parallel(0)
+        return completed, ran
+
+    def test_all_workers_fail_replay(self):
+        scraper = make_scraper()
+        completed, ran = self.run_phases(scraper, [True, True, True])
+        # run in the main browser instead of being dropped
+        self.assertEqual(ran, PHASES)
+        self.assertEqual(completed, 3)
+
+    def test_fallback_stops_at_max_pages(self):
+        scraper = make_scraper()
+        completed, ran = self.run_phases(scraper, [True, False])
+        self.assertEqual(ran, PHASES[:2])
+        self.assertEqual(completed, 1)
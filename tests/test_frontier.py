@@ -0,0 +1,55 @@
+import unittest
+
+from autoscrape.search.frontier import Frontier
+
+
+def drain(frontier):
+    urls = []
+    while True:
+        queued = frontier.next()
+        if queued is None:
+            return urls
+        url, depth = queued
+        frontier.done(url)
+        urls.append((url, depth))
+
+
+class FrontierTestCase(unittest.TestCase):
+    def test_breadth_first_across_hosts(self):
+        frontier = Frontier()
+        frontier.add("http://a.com/1", 1)
+        frontier.add("http://a.com/2", 1)
+        frontier.add("http://a.com/3", 2)
+        frontier.add("http://a.com/4", 2)
+        frontier.add("http://b.com/1", 1)
+        frontier.add("http://b.com/2", 2)
+        self.assertEqual(drain(frontier), [
+            ("http://a.com/1", 1),
+            ("http://a.com/2", 1),
+            ("http://b.com/1", 1),
+            ("http://a.com/3", 2),
+            ("http://a.com/4", 2),
+            ("http://b.com/2", 2),
+        ])
+        self.assertEqual(len(frontier), 0)
+
+    def test_shallower_first_within_host(self):
+        frontier = Frontier()
+        frontier.add("http://a.com/deep", 3)
+        frontier.add("http://a.com/shallow", 2)
+        self.assertEqual(drain(frontier), [
+            ("http://a.com/shallow", 2), ("http://a.com/deep", 3),
+        ])
+
+    def test_busy_host_skipped(self):
+        frontier = Frontier(host_concurrency=1)
+        frontier.add("http://a.com/1", 1)
+        frontier.add("http://a.com/2", 1)
+        frontier.add("http://b.com/1", 2)
+        self.assertEqual(frontier.next(), ("http://a.com/1", 1))
+        # a.com is at its limit, so b.com gets a turn
+        self.assertEqual(frontier.next(), ("http://b.com/1", 2))
+        self.assertIsNone(frontier.next())
+        frontier.done("http://a.com/1")
+        self.assertEqual(frontier.next(), ("http://a.com/2", 1))
+        self.assertIsNone(frontier.next())
@@ -0,0 +1,43 @@
+import unittest
+
+from autoscrape.search.filters import LinkFilter
+
+
+TEXTS = ["Home", "Next page", "Report (PDF)", "About", "Next results"]
+URLS = [
+    "http://x.com/", "http://x.com/?p=2", "http://x.com/report.pdf",
+    "http://x.com/about", "http://other.com/?p=3",
+]
+
+
+class LinkFilterTestCase(unittest.TestCase):
+    def test_no_rules_keeps_page_order(self):
+        link_filter = LinkFilter()
+        self.assertFalse(link_filter)
+        self.assertEqual(
+            [ix for ix, _ in link_filter.filter(TEXTS)], [0, 1, 2, 3, 4]
+        )
+
+    def test_text_rules(self):
+        link_filter = LinkFilter(
+            ignore_links="PDF", only_links="Next|About|Report",
+            link_priority="Next",
+        )
+        self.assertEqual(
+            link_filter.filter(TEXTS),
+            [(1, "Next page"), (4, "Next results"), (3, "About")]
+        )
+        self.assertEqual(link_filter.counts["ignore_links"], 1)
+        self.assertEqual(link_filter.counts["link_priority"], 2)
+
+    def test_url_rules(self):
+        link_filter = LinkFilter(
+            only_urls="^http://x\\.com/", ignore_extensions="\\.pdf$"
+        )
+        self.assertTrue(link_filter.uses_urls)
+        self.assertEqual(
+            [ix for ix, _ in link_filter.filter(TEXTS, urls=URLS)],
+            [0, 1, 3]
+        )
+        self.assertEqual(link_filter.counts["ignore_extensions"], 1)
+        self.assertEqual(link_filter.counts["only_urls"], 3)
@@ -0,0 +1,48 @@
+import unittest
+
+from autoscrape.backends.base.state import PageStateCache
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.page_url = "http://x.com/"
+        self.page_html = "<html><a href='/a'>a</a></html>"
+        self.calls = 0
+
+    def get_clickable(self):
+        self.calls += 1
+        return ["a:nth-of-type(1)"]
+
+
+class PageStateCacheTestCase(unittest.TestCase):
+    def test_same_page_reuses_state(self):
+        browser = FakeBrowser()
+        cache = PageStateCache()
+        self.assertEqual(cache.get(browser).clickable, ["a:nth-of-type(1)"])
+        self.assertEqual(cache.get(browser).clickable, ["a:nth-of-type(1)"])
+        self.assertEqual(browser.calls, 1)
+
+    def test_changed_page_gets_new_state(self):
+        browser = FakeBrowser()
+        cache = PageStateCache()
+        first = cache.get(browser)
+        browser.page_html += "<p>more results</p>"
+        self.assertIsNot(cache.get(browser), first)
+        browser.page_url = "http://x.com/other"
+        self.assertEqual(len(cache.states), 2)
+        cache.get(browser)
+        self.assertEqual(len(cache.states), 3)
+
+    def test_evicts_least_recently_used(self):
+        browser = FakeBrowser()
+        cache = PageStateCache(max_size=2)
+        first = cache.get(browser)
+        browser.page_url = "http://x.com/2"
+        cache.get(browser)
+        browser.page_url = "http://x.com/"
+        cache.get(browser)
+        browser.page_url = "http://x.com/3"
+        cache.get(browser)
+        browser.page_url = "http://x.com/"
+        self.assertIs(cache.get(browser), first)
+        self.assertEqual(len(cache.states), 2)
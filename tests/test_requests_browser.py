@@ -0,0 +1,105 @@
+import unittest
+
+import requests
+
+from autoscrape.backends.requests.browser import RequestsBrowser
+
+
+FORM_PAGE = (
+    b'<html><body><form action="/search">'
+    b'<input type="text" name="q"><input type="submit">'
+    b'</form><a href="/about">about</a></body></html>'
+)
+
+PAGES = {
+    "http://x.com/": FORM_PAGE,
+    "http://x.com/about": b"<html><body>about</body></html>",
+    "http://x.com/search": b"<html><body>results</body></html>",
+    "http://x.com/list": (
+        b'<html><body><a href="/list?sort=asc">sort</a>'
+        b'<a href="/list?page=2">next</a></body></html>'
+    ),
+}
+
+
+def make_response(url):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = PAGES[url.split("?")[0]]
+    return response
+
+
+class FakeSession:
+    """
+    Stands in for a requests.Session, serving PAGES and recording the
+    URLs requested.
+    """
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return make_response(url)
+
+    def send(self, prepped, **kwargs):
+        self.urls.append(prepped.url)
+        return make_response(prepped.url)
+
+
+class RequestsBrowserBackTestCase(unittest.TestCase):
+    def setUp(self):
+        self.browser = RequestsBrowser()
+        self.session = FakeSession()
+        self.browser.s = self.session
+        self.browser.fetch("http://x.com/", initial=True)
+        forms = self.browser.get_forms()
+        self.form_tag = list(forms.keys())[0]
+        self.input_tag = forms[self.form_tag][0][0]
+
+    def input_value(self):
+        elem = self.browser.element_by_tag(self.input_tag)
+        return self.browser.element_value(elem)
+
+    def test_back_after_submit_restores_unmodified_page(self):
+        self.browser.input(self.input_tag, "first")
+        self.browser.submit(self.form_tag)
+        self.assertEqual(self.browser.page_url, "http://x.com/search?q=first")
+
+        self.browser.back()
+        self.assertEqual(self.browser.page_url, "http://x.com/")
+        self.assertIsNone(self.input_value())
+        # restored from the snapshot, not re-fetched
+        self.assertEqual(len(self.session.urls), 2)
+
+        # the restored form is usable for the next search
+        self.browser.input(self.input_tag, "second")
+        self.browser.submit(self.form_tag)
+        self.assertEqual(self.browser.page_url, "http://x.com/search?q=second")
+
+    def test_back_after_click_restores_unmodified_page(self):
+        self.browser.input(self.input_tag, "typed")
+        link_tag = self.browser.get_clickable()[0]
+        self.assertTrue(self.browser.click(link_tag))
+        self.assertEqual(self.browser.page_url, "http://x.com/about")
+
+        self.browser.back()
+        self.assertEqual(self.browser.page_url, "http://x.com/")
+        self.assertIsNone(self.input_value())
+
+
+class RequestsBrowserCanonicalizeTestCase(unittest.TestCase):
+    def get_link_texts(self, **kwargs):
+        browser = RequestsBrowser(**kwargs)
+        browser.s = FakeSession()
+        browser.fetch("http://x.com/list", initial=True)
+        return [text for url, text in browser.get_links()]
+
+    def test_links_to_same_page_use_configured_params(self):
+        self.assertEqual(
+            self.get_link_texts(), ["sort", "next"]
+        )
+        self.assertEqual(
+            self.get_link_texts(strip_query_params="^sort$"), ["next"]
+        )
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from autoscrape.backends.requests.cache import ResponseCache
+
+
+class FakeSession:
+    """
+    Stands in for a requests.Session, returning canned responses and
+    recording the requests sent to it.
+    """
+    def __init__(self):
+        self.sent = []
+        self.responses = []
+
+    def send(self, prepped, **kwargs):
+        self.sent.append(prepped)
+        return self.responses.pop(0)
+
+
+def make_response(url, content, status=200, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+
+def prepare(url, method="GET", data=None):
+    return requests.Request(method, url, data=data).prepare()
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.session = FakeSession()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_serves_unvalidated_response_from_cache(self):
+        cache = ResponseCache(self.cache_dir)
+        url = "http://example.com/a"
+        self.session.responses.append(make_response(url, b"page a"))
+        cache.send(self.session, prepare(url))
+        response = cache.send(self.session, prepare(url))
+        self.assertEqual(len(self.session.sent), 1)
+        self.assertEqual(response.content, b"page a")
+        self.assertEqual(response.url, url)
+
+    def test_revalidates_with_etag(self):
+        cache = ResponseCache(self.cache_dir)
+        url = "http://example.com/a"
+        self.session.responses.append(
+            make_response(url, b"page a", headers={"ETag": '"v1"'})
+        )
+        self.session.responses.append(make_response(url, b"", status=304))
+        cache.send(self.session, prepare(url))
+        response = cache.send(self.session, prepare(url))
+        self.assertEqual(len(self.session.sent), 2)
+        self.assertEqual(self.session.sent[1].headers["If-None-Match"], '"v1"')
+        self.assertEqual(response.content, b"page a")
+
+    def test_form_body_is_part_of_key(self):
+        cache = ResponseCache(self.cache_dir)
+        url = "http://example.com/search"
+        a = prepare(url, method="POST", data={"q": "a"})
+        b = prepare(url, method="POST", data={"q": "b"})
+        self.assertNotEqual(cache.request_key(a), cache.request_key(b))
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(self.cache_dir, max_size=10)
+        for name in ["a", "b", "c"]:
+            url = "http://example.com/%s" % name
+            self.session.responses.append(make_response(url, bytes(name * 4, "utf-8")))
+            cache.send(self.session, prepare(url))
+        self.assertIsNone(cache.get(cache.request_key(prepare("http://example.com/a"))))
+        self.assertIsNotNone(cache.get(cache.request_key(prepare("http://example.com/c"))))
+        self.assertTrue(cache.total_size <= 10)
+
+    def test_changed_page_replaces_old_body(self):
+        cache = ResponseCache(self.cache_dir, max_size=100)
+        url = "http://example.com/a"
+        for content in [b"version 1", b"version 2!", b"version 3!!"]:
+            self.session.responses.append(make_response(
+                url, content, headers={"ETag": content.decode("utf-8")}
+            ))
+            cache.send(self.session, prepare(url))
+        blobs = [
+            name for _, _, names in os.walk(cache.blob_dir) for name in names
+        ]
+        self.assertEqual(len(blobs), 1)
+        self.assertEqual(cache.total_size, len(b"version 3!!"))
+        self.assertEqual(cache.total_size, cache._stored_size())
+
+    def test_shared_body_kept_when_page_changes(self):
+        cache = ResponseCache(self.cache_dir)
+        a, b = "http://example.com/a", "http://example.com/b"
+        headers = {"ETag": '"v1"'}
+        self.session.responses.append(make_response(a, b"same", headers=headers))
+        self.session.responses.append(make_response(b, b"same", headers=headers))
+        self.session.responses.append(make_response(a, b"new", headers=headers))
+        cache.send(self.session, prepare(a))
+        cache.send(self.session, prepare(b))
+        cache.send(self.session, prepare(a))
+        self.assertEqual(cache.get(cache.request_key(prepare(b)))["content"], b"same")
+        self.assertEqual(cache.total_size, len(b"same") + len(b"new"))
+
+    def test_post_not_cached(self):
+        cache = ResponseCache(self.cache_dir)
+        url = "http://example.com/search"
+        for _ in range(2):
+            self.session.responses.append(make_response(url, b"results"))
+            cache.send(self.session, prepare(url, method="POST", data={"q": "a"}))
+        self.assertEqual(len(self.session.sent), 2)
+        self.assertEqual(cache.total_size, 0)
+
+    def test_no_store_not_cached(self):
+        cache = ResponseCache(self.cache_dir)
+        url = "http://example.com/a"
+        for _ in range(2):
+            self.session.responses.append(make_response(
+                url, b"page a", headers={"Cache-Control": "private, no-store"}
+            ))
+            cache.send(self.session, prepare(url))
+        self.assertEqual(len(self.session.sent), 2)
+        self.assertIsNone(cache.get(cache.request_key(prepare(url))))
+
+
+if __name__ == "__main__":
+    unittest.main()
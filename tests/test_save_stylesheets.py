@@ -0,0 +1,69 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from autoscrape.scrapers import BaseScraper
+from autoscrape.util.sinks import stop_sink
+
+
+SITE_CSS = "body { color: black; }"
+PAGE_CSS = "h1 { color: red; }"
+
+
+def css_name(css):
+    return "%s.css" % hashlib.sha256(css.encode("utf-8")).digest().hex()
+
+
+class SaveStylesheetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.scraper = BaseScraper()
+        self.scraper.output = self.output
+        self.scraper.control = SimpleNamespace(
+            scraper=SimpleNamespace(page_url="http://x.com/")
+        )
+
+    def tearDown(self):
+        stop_sink(self.output)
+        shutil.rmtree(self.output)
+
+    def save(self, name, stylesheets):
+        filepath = os.path.join(self.output, name)
+        self.scraper.save_stylesheets(filepath, "crawl_pages", stylesheets)
+        with open("%s.css" % filepath) as f:
+            return f.read()
+
+    def test_shared_stylesheet_saved_once(self):
+        first = self.save("crawl_pages/a.html", [SITE_CSS, PAGE_CSS])
+        second = self.save("data_pages/b.html", [SITE_CSS, ""])
+
+        style_dir = os.path.join(self.output, "stylesheets")
+        self.assertEqual(
+            sorted(os.listdir(style_dir)),
+            sorted([css_name(SITE_CSS), css_name(PAGE_CSS)])
+        )
+        with open(os.path.join(style_dir, css_name(SITE_CSS))) as f:
+            self.assertEqual(f.read(), SITE_CSS)
+        self.assertEqual(
+            self.scraper.saved_stylesheets,
+            {css_name(SITE_CSS)[:-4], css_name(PAGE_CSS)[:-4]}
+        )
+
+        # sidecars import the shared files, relative to their own dirs
+        self.assertEqual(first, "\n".join([
+            '@import url("../stylesheets/%s");' % css_name(SITE_CSS),
+            '@import url("../stylesheets/%s");' % css_name(PAGE_CSS),
+        ]))
+        self.assertEqual(
+            second, '@import url("../stylesheets/%s");' % css_name(SITE_CSS)
+        )
+
+    def test_saved_stylesheets_not_rewritten(self):
+        self.save("crawl_pages/a.html", [SITE_CSS])
+        css_path = os.path.join(self.output, "stylesheets", css_name(SITE_CSS))
+        os.remove(css_path)
+        self.save("crawl_pages/b.html", [SITE_CSS])
+        self.assertFalse(os.path.exists(css_path))
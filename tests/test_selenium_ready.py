@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from autoscrape.backends.selenium.browser import SeleniumBrowser
+
+
+class BusyDriver:
+    """
+    Stands in for a WebDriver on a page that never goes quiet: the
+    quiet check always runs out of time, like the real script would.
+    """
+    def __init__(self):
+        self.calls = []
+
+    def execute_async_script(self, script, quiet, timeout, max_request_age):
+        self.calls.append((quiet, timeout, max_request_age))
+        time.sleep(timeout / 1000.0)
+        return False
+
+
+def busy_browser(page_quiet_max):
+    browser = SeleniumBrowser.__new__(SeleniumBrowser)
+    browser.driver = BusyDriver()
+    browser.timeout = 30
+    browser.page_quiet_period = 0.5
+    browser.page_quiet_max = page_quiet_max
+    return browser
+
+
+class WaitForQuietTestCase(unittest.TestCase):
+    def test_returns_at_cap(self):
+        browser = busy_browser(0.3)
+        start = time.time()
+        self.assertFalse(browser._wait_for_quiet())
+        elapsed = time.time() - start
+        # capped at page_quiet_max, not the 30 second page timeout
+        self.assertGreaterEqual(elapsed, 0.25)
+        self.assertLess(elapsed, 2)
+        quiet, timeout, max_request_age = browser.driver.calls[0]
+        self.assertEqual(quiet, 500)
+        self.assertLessEqual(timeout, 300)
+        self.assertEqual(max_request_age, 300)
+
+    def test_explicit_max_wait(self):
+        browser = busy_browser(30)
+        start = time.time()
+        self.assertFalse(browser._wait_for_quiet(max_wait=0.2))
+        self.assertLess(time.time() - start, 2)
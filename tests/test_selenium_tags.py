@@ -0,0 +1,110 @@
+import json
+import unittest
+
+from autoscrape.backends.base.state import PageStateCache
+from autoscrape.backends.selenium.browser import SeleniumBrowser
+from autoscrape.backends.selenium.tags import Tagger
+from autoscrape.vectorization.text import TextVectorizer
+
+
+def info(tag, node="a", href="http://x.com/page", text="", value=None,
+         displayed=True):
+    return {
+        "tag": tag, "node": node, "displayed": displayed, "enabled": True,
+        "href": href, "type": None, "type_attr": None, "structure": None,
+        "name": None, "text": text, "value": value,
+    }
+
+
+INFOS = [
+    info("a:nth-of-type(1)", text="Next page"),
+    info("a:nth-of-type(2)", text="Hidden", displayed=False),
+    info("input:nth-of-type(1)", node="input", href="javascript:go()",
+         text="Search", value="Search"),
+    info("a:nth-of-type(3)", href="http://other.com/", text="Elsewhere"),
+]
+
+
+class FakeDriver:
+    """
+    Stands in for a WebDriver, answering every script with the canned
+    element infos and counting the round trips.
+    """
+    def __init__(self, infos):
+        self.infos = infos
+        self.scripts = 0
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        return json.dumps(self.infos)
+
+
+class FakeBrowser:
+    """
+    The parts of SeleniumBrowser the text vectorizer uses, without
+    any per-element lookups.
+    """
+    get_tag_infos = SeleniumBrowser.get_tag_infos
+    _keep_tag_infos = SeleniumBrowser._keep_tag_infos
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.page_url = "http://x.com/"
+        self.page_html = "<html></html>"
+        self.tagged_infos = []
+        self.page_states = PageStateCache()
+
+    def _tagger(self):
+        return Tagger(driver=self.driver, current_url=self.page_url)
+
+    def get_page_state(self):
+        return self.page_states.get(self)
+
+    def get_clickable(self):
+        tagger = self._tagger()
+        tags = tagger.get_clickable()
+        self._keep_tag_infos(tags, tagger.tag_infos)
+        return tags
+
+    def get_buttons(self):
+        tagger = self._tagger()
+        tags = tagger.get_buttons()
+        self._keep_tag_infos(tags, tagger.tag_infos)
+        return tags
+
+    def element_by_tag(self, tag):
+        raise AssertionError("looked up element %s one at a time" % tag)
+
+
+class BatchedTagsTestCase(unittest.TestCase):
+    def test_clickable_in_one_call(self):
+        driver = FakeDriver(INFOS)
+        tagger = Tagger(driver=driver, current_url="http://x.com/")
+        self.assertEqual(
+            tagger.get_clickable(),
+            ["a:nth-of-type(1)", "input:nth-of-type(1)"]
+        )
+        self.assertEqual(driver.scripts, 1)
+        self.assertEqual(
+            tagger.tag_infos["a:nth-of-type(1)"]["text"], "Next page"
+        )
+
+    def test_vectors_use_batched_text(self):
+        driver = FakeDriver(INFOS)
+        vectorizer = TextVectorizer(scraper=FakeBrowser(driver))
+        self.assertEqual(vectorizer.link_vectors(), ["Next page", "Search"])
+        self.assertEqual(
+            vectorizer.button_vectors(),
+            ["Next page", "Search Search", "Elsewhere"]
+        )
+        # one call to tag the links, one for the buttons
+        self.assertEqual(driver.scripts, 2)
+
+    def test_tag_infos_for_other_tags(self):
+        driver = FakeDriver([{"node": "a", "text": "About", "value": None}])
+        browser = FakeBrowser(driver)
+        self.assertEqual(
+            browser.get_tag_infos(["a:nth-of-type(9)"]),
+            [{"node": "a", "text": "About", "value": None}]
+        )
+        self.assertEqual(driver.scripts, 1)
@@ -0,0 +1,154 @@
+import datetime
+import importlib.util
+import io
+import os
+import tarfile
+import unittest
+from unittest import mock
+
+
+SERVER_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "autoscrape-server.py"
+)
+
+
+def load_server():
+    """
+    Import autoscrape-server.py without a database behind it.
+    """
+    env = {
+        "AUTOSCRAPE_DB_USER": "user",
+        "AUTOSCRAPE_DB_PASSWORD": "password",
+        "AUTOSCRAPE_DB_HOST": "localhost",
+    }
+    spec = importlib.util.spec_from_file_location(
+        "autoscrape_server", SERVER_PATH
+    )
+    server = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, env), \
+            mock.patch("sqlalchemy_utils.database_exists",
+                       return_value=True):
+        spec.loader.exec_module(server)
+    return server
+
+
+def server_deps_available():
+    for name in ("celery", "flask", "flask_sqlalchemy", "psycopg2",
+                 "sqlalchemy_utils"):
+        if importlib.util.find_spec(name) is None:
+            return False
+    return True
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursors = []
+        self.committed = False
+        self.closed = False
+
+    def cursor(self):
+        self.cursors.append(object())
+        return self.cursors[-1]
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipUnless(server_deps_available(), "server dependencies missing")
+class InsertDataRowsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = load_server()
+        self.conn = FakeConnection()
+        self.calls = []
+
+    def insert(self, rows, returned):
+        def execute_values(cursor, sql, argslist, **kwargs):
+            self.calls.append((cursor, sql, argslist, kwargs))
+            if kwargs.get("fetch"):
+                return returned
+
+        engine = mock.Mock()
+        engine.raw_connection.return_value = self.conn
+        with mock.patch.object(self.server, "engine", engine), \
+                mock.patch.object(self.server, "execute_values",
+                                  execute_values):
+            self.server.insert_data_rows(rows)
+
+    def test_single_insert(self):
+        rows = [
+            ("1", "a.html", "crawl_pages", b"<html>", "http://x.com/a"),
+            ("1", "b.html", "data_pages", b"<html>", "http://x.com/b"),
+        ]
+        self.insert(rows, [(10, "1", "crawl_pages"), (11, "1", "data_pages")])
+        self.assertEqual(len(self.calls), 1)
+        cursor, sql, argslist, kwargs = self.calls[0]
+        self.assertIs(cursor, self.conn.cursors[0])
+        self.assertTrue(sql.startswith("INSERT INTO data "))
+        self.assertIn("RETURNING id, task_id, fileclass", sql)
+        self.assertEqual(argslist, rows)
+        self.assertEqual(
+            kwargs["template"], "(current_timestamp, %s, %s, %s, %s, %s)"
+        )
+        self.assertTrue(self.conn.committed)
+        self.assertTrue(self.conn.closed)
+
+    def test_latest_screenshot_upsert(self):
+        rows = [
+            ("1", "a.png", "screenshot", b"a", "http://x.com/a"),
+            ("1", "b.png", "screenshot", b"b", "http://x.com/b"),
+            ("1", "b.html", "crawl_pages", b"b", "http://x.com/b"),
+        ]
+        self.insert(rows, [
+            (10, "1", "screenshot"),
+            (11, "1", "screenshot"),
+            (12, "1", "crawl_pages"),
+        ])
+        self.assertEqual(len(self.calls), 2)
+        cursor, sql, argslist, kwargs = self.calls[1]
+        self.assertEqual(sql, self.server.UPSERT_LATEST_SCREENSHOT)
+        # the last screenshot inserted for the task
+        self.assertEqual(argslist, [("1", 11)])
+        self.assertTrue(self.conn.committed)
+
+    def test_closes_on_error(self):
+        def execute_values(cursor, sql, argslist, **kwargs):
+            raise ValueError("insert failed")
+
+        engine = mock.Mock()
+        engine.raw_connection.return_value = self.conn
+        with mock.patch.object(self.server, "engine", engine), \
+                mock.patch.object(self.server, "execute_values",
+                                  execute_values):
+            with self.assertRaises(ValueError):
+                self.server.insert_data_rows([
+                    ("1", "a.html", "crawl_pages", b"a", "http://x.com/a")
+                ])
+        self.assertFalse(self.conn.committed)
+        self.assertTrue(self.conn.closed)
+
+
+@unittest.skipUnless(server_deps_available(), "server dependencies missing")
+class TarExportTestCase(unittest.TestCase):
+    def test_file_shrinks_during_export(self):
+        server = load_server()
+        # a.html was listed at 1000 bytes, but is 600 by the time it's read
+        contents = {1: b"a" * 600, 2: b"b" * 100}
+        timestamp = datetime.datetime(2020, 1, 1)
+        files = [(1, "a.html", timestamp, 1000), (2, "b.html", timestamp, 100)]
+
+        def iter_data_chunks(data_id, start=0, length=None):
+            yield contents[data_id]
+
+        with mock.patch.object(server, "iter_data_chunks", iter_data_chunks):
+            data = b"".join(server.iter_tar_export(files))
+        with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+            self.assertEqual(archive.getnames(), ["a.html", "b.html"])
+            self.assertEqual(
+                archive.extractfile("a.html").read(),
+                b"a" * 600 + b"\0" * 400
+            )
+            self.assertEqual(archive.extractfile("b.html").read(), b"b" * 100)
@@ -0,0 +1,49 @@
+import unittest
+
+from autoscrape.search.simhash import SimHashIndex, hamming_distance, simhash
+
+
+PAGE = (
+    "Public records search. Results for case number 2019-CV-0042. "
+    "Filed by the county clerk, this civil case concerns a dispute over "
+    "a property line between two neighbours and was heard before the "
+    "district court in the spring session. Parties were represented by "
+    "counsel and the court ordered a survey of the boundary before "
+    "ruling on the motion for summary judgment."
+)
+
+
+class SimHashTestCase(unittest.TestCase):
+    def test_near_duplicate_text(self):
+        changed = PAGE + " Page generated 12:01"
+        self.assertLessEqual(
+            hamming_distance(simhash(PAGE), simhash(changed)), 3
+        )
+
+    def test_different_text(self):
+        other = (
+            "Weather forecast for the coast: strong winds expected through "
+            "the weekend with heavy rain in the mountains and snow above "
+            "two thousand metres, clearing by Tuesday morning."
+        )
+        self.assertGreater(
+            hamming_distance(simhash(PAGE), simhash(other)), 10
+        )
+
+    def test_empty_text(self):
+        self.assertIsNone(simhash(""))
+        self.assertIsNone(simhash("  ... "))
+
+
+class SimHashIndexTestCase(unittest.TestCase):
+    def test_check_and_add(self):
+        index = SimHashIndex(distance=3)
+        fingerprint = 0b1011 << 40 | 0xFFFF
+        self.assertFalse(index.check_and_add(fingerprint))
+        # three bits off, in different blocks
+        self.assertTrue(index.check_and_add(fingerprint ^ (1 | 1 << 20 | 1 << 63)))
+        # four bits off is too far
+        self.assertFalse(index.check_and_add(fingerprint ^ 0b1111))
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.find(fingerprint ^ 1 << 30), fingerprint)
+        self.assertIsNone(index.find(~fingerprint & (2 ** 64 - 1)))
@@ -0,0 +1,94 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+try:
+    from warcio.archiveiterator import ArchiveIterator
+except ModuleNotFoundError:
+    ArchiveIterator = None
+
+from autoscrape.util import sinks
+from autoscrape.util.sinks import (
+    DirectorySink, SQLiteSink, WARCSink, get_sink, start_sink, stop_sink
+)
+
+
+FILES = [
+    ("data_pages/a.html", "<html>a</html>", "data_pages", "http://x.com/a"),
+    ("data_pages/a.html.css", "body {}", "data_pages", "http://x.com/a"),
+    ("downloads/b.pdf", b"%PDF-1.4", "downloads", "http://x.com/b.pdf"),
+]
+
+
+class SinksTestCase(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def write_files(self, sink):
+        for name, data, fileclass, url in FILES:
+            writetype = "wb" if isinstance(data, bytes) else "w"
+            sink.write(
+                os.path.join(self.output, name), data, fileclass=fileclass,
+                writetype=writetype, url=url,
+            )
+
+    def expected(self):
+        return [
+            (name, data if isinstance(data, bytes) else data.encode("utf-8"))
+            for name, data, _, _ in FILES
+        ]
+
+    def test_directory_sink(self):
+        self.write_files(DirectorySink(self.output))
+        for name, data in self.expected():
+            with open(os.path.join(self.output, name), "rb") as f:
+                self.assertEqual(f.read(), data)
+
+    def test_sqlite_sink_batches(self):
+        sink = SQLiteSink(self.output, batch_size=2)
+        self.write_files(sink)
+        db_path = os.path.join(self.output, SQLiteSink.FILENAME)
+        count = sqlite3.connect(db_path).execute(
+            "SELECT count(*) FROM files"
+        ).fetchone()[0]
+        # the third file is still buffered
+        self.assertEqual(count, 2)
+        sink.close()
+        rows = sqlite3.connect(db_path).execute(
+            "SELECT name, data FROM files ORDER BY id"
+        ).fetchall()
+        self.assertEqual(rows, self.expected())
+
+    @unittest.skipIf(ArchiveIterator is None, "WARC dependencies not installed")
+    def test_warc_sink(self):
+        sink = WARCSink(self.output, batch_size=2)
+        self.write_files(sink)
+        sink.close()
+        records = []
+        with open(os.path.join(self.output, WARCSink.FILENAME), "rb") as f:
+            for record in ArchiveIterator(f):
+                records.append((
+                    record.rec_headers.get_header("AutoScrape-Name"),
+                    record.content_stream().read(),
+                ))
+        self.assertEqual(records, self.expected())
+
+    def test_warc_sink_without_warcio(self):
+        with mock.patch.dict(sinks.__dict__):
+            sinks.__dict__.pop("WARCWriter", None)
+            with self.assertRaises(SystemExit):
+                start_sink(self.output, "warc")
+        self.assertNotIn(self.output, sinks._sinks)
+
+    def test_sink_registry(self):
+        sink = start_sink(self.output, "sqlite")
+        self.assertIs(get_sink(self.output), sink)
+        stop_sink(self.output)
+        self.assertIsInstance(get_sink(self.output), DirectorySink)
+        stop_sink(self.output)
@@ -0,0 +1,163 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from autoscrape.util.upload import BulkUploader
+
+
+class FakeResponse:
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """
+    Stands in for the uploader's requests.Session, recording each
+    batch POSTed as (url, manifest, [(name, data), ...]).
+    """
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, data=None, files=None):
+        self.posts.append((url, json.loads(data["manifest"]), [
+            (name, body) for _, (name, body, mimetype) in files
+        ]))
+        return FakeResponse()
+
+    def close(self):
+        pass
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+class BulkUploaderTestCase(unittest.TestCase):
+    def uploader(self, **kwargs):
+        uploader = BulkUploader("http://x.com/receive/1/", **kwargs)
+        uploader.session = FakeSession()
+        self.addCleanup(uploader.close)
+        return uploader
+
+    def batch_names(self, uploader):
+        return [
+            [meta["name"] for meta in manifest]
+            for url, manifest, files in uploader.session.posts
+        ]
+
+    def test_flush_on_size(self):
+        # nothing is flushed on a timeout during the test
+        uploader = self.uploader(batch_size=2, flush_interval=60)
+        for i in range(5):
+            uploader.put("%s.html" % i, "page %s" % i)
+        self.assertTrue(wait_for(lambda: len(uploader.session.posts) == 2))
+        self.assertEqual(self.batch_names(uploader), [
+            ["0.html", "1.html"], ["2.html", "3.html"],
+        ])
+
+    def test_flush_on_bytes(self):
+        uploader = self.uploader(batch_bytes=10, flush_interval=60)
+        for i in range(4):
+            uploader.put("%s.html" % i, b"123456")
+        self.assertTrue(wait_for(lambda: len(uploader.session.posts) == 2))
+        self.assertEqual(self.batch_names(uploader), [
+            ["0.html", "1.html"], ["2.html", "3.html"],
+        ])
+
+    def test_flush_on_interval(self):
+        uploader = self.uploader(flush_interval=0.05)
+        uploader.put("0.html", "page")
+        self.assertTrue(wait_for(lambda: len(uploader.session.posts) == 1))
+        self.assertEqual(self.batch_names(uploader), [["0.html"]])
+
+    def test_flush_on_close(self):
+        uploader = self.uploader(batch_size=2, flush_interval=60)
+        for i in range(3):
+            uploader.put("%s.html" % i, "page %s" % i)
+        start = time.time()
+        uploader.close()
+        # the last, partial batch goes out without waiting to fill up
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(self.batch_names(uploader), [
+            ["0.html", "1.html"], ["2.html"],
+        ])
+
+    def test_manifest(self):
+        uploader = self.uploader()
+        uploader.put("a.html", "<html>", fileclass="crawl_pages",
+                     url="http://x.com/a")
+        uploader.put("b.png", b"\x89PNG", fileclass="screenshot",
+                     url="http://x.com/b")
+        uploader.close()
+        self.assertEqual(uploader.session.posts, [(
+            "http://x.com/receive/1/bulk",
+            [
+                {"name": "a.html", "fileclass": "crawl_pages",
+                 "url": "http://x.com/a"},
+                {"name": "b.png", "fileclass": "screenshot",
+                 "url": "http://x.com/b"},
+            ],
+            [("a.html", b"<html>"), ("b.png", b"\x89PNG")],
+        )])
+
+
+class FailingSession(FakeSession):
+    """
+    A session whose POSTs fail with the given exception, for the
+    batches with the given first file names.
+    """
+    def __init__(self, error, names):
+        super().__init__()
+        self.error = error
+        self.names = names
+        self.attempts = 0
+
+    def post(self, url, data=None, files=None):
+        if json.loads(data["manifest"])[0]["name"] in self.names:
+            self.attempts += 1
+            raise self.error
+        return super().post(url, data=data, files=files)
+
+
+class BulkUploaderFailureTestCase(unittest.TestCase):
+    def uploader(self, session, **kwargs):
+        uploader = BulkUploader(
+            "http://x.com/receive/1/", batch_size=2, flush_interval=60,
+            **kwargs
+        )
+        uploader.session = session
+        return uploader
+
+    def test_gives_up_without_extra_backoff(self):
+        session = FailingSession(
+            requests.ConnectionError("refused"), ["0.html"]
+        )
+        uploader = self.uploader(session, retries=2)
+        with mock.patch("autoscrape.util.upload.time.sleep") as sleep:
+            for i in range(3):
+                uploader.put("%s.html" % i, "page %s" % i)
+            self.assertEqual(uploader.close(), 2)
+        self.assertEqual(session.attempts, 3)
+        # backing off between attempts, not after the last one
+        self.assertEqual(sleep.call_args_list, [mock.call(1), mock.call(2)])
+        self.assertEqual(
+            [[meta["name"] for meta in manifest]
+             for url, manifest, files in session.posts],
+            [["2.html"]]
+        )
+
+    def test_keeps_going_after_unexpected_error(self):
+        session = FailingSession(TypeError("bad body"), ["0.html"])
+        uploader = self.uploader(session)
+        for i in range(5):
+            # blocks forever if the worker has died
+            uploader.put("%s.html" % i, "page %s" % i)
+        self.assertEqual(uploader.close(), 2)
+        self.assertEqual(session.attempts, 1)
+        self.assertEqual(len(session.posts), 2)
@@ -0,0 +1,68 @@
+import unittest
+
+from autoscrape.search.visited import (
+    BloomFilter, URLCanonicalizer, VisitedSet, canonicalize_url
+)
+
+
+class URLCanonicalizerTestCase(unittest.TestCase):
+    def test_equivalent_urls(self):
+        urls = [
+            "http://example.com/a/b?a=1&b=2",
+            "HTTP://Example.COM:80/a/b/?b=2&a=1",
+            "http://example.com/a/b?a=1&b=2#results",
+            "http://example.com/a/b?a=1&utm_source=feed&b=2&fbclid=xyz",
+            "http://example.com/a/b;jsessionid=F00?a=1&b=2",
+        ]
+        self.assertEqual(
+            set(canonicalize_url(url) for url in urls),
+            {"http://example.com/a/b?a=1&b=2"}
+        )
+
+    def test_different_urls(self):
+        self.assertNotEqual(
+            canonicalize_url("http://example.com/?page=1"),
+            canonicalize_url("http://example.com/?page=2")
+        )
+        self.assertNotEqual(
+            canonicalize_url("https://example.com:8443/"),
+            canonicalize_url("https://example.com/")
+        )
+
+    def test_custom_strip_params(self):
+        canonicalize = URLCanonicalizer(strip_params="^(sort|view)$")
+        self.assertEqual(
+            canonicalize("http://x.com/list?view=grid&q=a&utm_source=b"),
+            "http://x.com/list?q=a&utm_source=b"
+        )
+
+    def test_non_http_urls_untouched(self):
+        self.assertEqual(
+            canonicalize_url("mailto:someone@x.com"), "mailto:someone@x.com"
+        )
+
+
+class VisitedStoreTestCase(unittest.TestCase):
+    def check_store(self, store):
+        self.assertFalse(store.check_and_add("http://x.com/a"))
+        self.assertTrue(store.check_and_add("http://x.com/a"))
+        self.assertIn("http://x.com/a", store)
+        self.assertNotIn("http://x.com/b", store)
+        store.add("http://x.com/b")
+        self.assertIn("http://x.com/b", store)
+        self.assertEqual(len(store), 2)
+
+    def test_visited_set(self):
+        self.check_store(VisitedSet())
+
+    def test_bloom_filter(self):
+        self.check_store(BloomFilter(1000))
+
+    def test_bloom_filter_error_rate(self):
+        store = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            store.add("http://x.com/%s" % i)
+        false_positives = sum(
+            "http://y.com/%s" % i in store for i in range(10000)
+        )
+        self.assertLess(false_positives, 300)
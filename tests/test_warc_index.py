@@ -0,0 +1,165 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+try:
+    import plyvel
+    from warcio.warcwriter import WARCWriter
+    from warcio.statusandheaders import StatusAndHeaders
+except ModuleNotFoundError:
+    plyvel = None
+
+from autoscrape.backends.warc.browser import WARCBrowser
+from autoscrape.util.warc import (
+    INDEXED_FILES_PREFIX, WARCRecordCache, build_warc_index, decode_index_value,
+    encode_index_value, migrate_warc_index, read_warc_record, warc_file_id,
+    warc_file_path,
+)
+
+
+def write_warc(filepath, pages):
+    with open(filepath, "wb") as f:
+        writer = WARCWriter(f, gzip=True)
+        for url, html in pages:
+            headers = StatusAndHeaders(
+                "200 OK", [("Content-Type", "text/html")],
+                protocol="HTTP/1.0"
+            )
+            record = writer.create_warc_record(
+                url, "response", payload=tempfile.SpooledTemporaryFile(),
+                http_headers=headers
+            )
+            record.raw_stream.write(html)
+            record.raw_stream.seek(0)
+            writer.write_record(record)
+
+
+@unittest.skipIf(plyvel is None, "WARC dependencies not installed")
+class WARCIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.warc_dir = os.path.join(self.tmp, "warcs")
+        os.makedirs(self.warc_dir)
+        self.warc = os.path.join(self.warc_dir, "a.warc.gz")
+        write_warc(self.warc, [
+            ("http://a.test/", b"<html>index</html>"),
+            ("http://a.test/page", b"<html>page</html>"),
+        ])
+        self.db = plyvel.DB(
+            os.path.join(self.tmp, "index"), create_if_missing=True
+        )
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.tmp)
+
+    def test_encode_decode(self):
+        value = encode_index_value(3, 2**40, 1234)
+        self.assertEqual(len(value), 16)
+        self.assertEqual(decode_index_value(value), (3, 2**40, 1234))
+
+    def test_file_ids(self):
+        self.assertEqual(warc_file_id(self.db, "/x.warc.gz"), 0)
+        self.assertEqual(warc_file_id(self.db, "/y.warc.gz"), 1)
+        self.assertEqual(warc_file_id(self.db, "/x.warc.gz"), 0)
+        self.assertEqual(warc_file_path(self.db, 1), "/y.warc.gz")
+        self.assertIsNone(warc_file_path(self.db, 2))
+
+    def test_build_index(self):
+        migrate_warc_index(self.db)
+        build_warc_index(self.db, self.warc_dir, None, processes=1)
+        file_id, offset, length = decode_index_value(
+            self.db.get(b"http://a.test/page")
+        )
+        filepath = warc_file_path(self.db, file_id)
+        record = read_warc_record(filepath, offset, length)
+        self.assertEqual(record["payload"], b"<html>page</html>")
+
+    def test_migrate_record_number_index(self):
+        self.db.put(b"http://a.test/", pickle.dumps((self.warc, 0)))
+        self.db.put(b"http://a.test/page", pickle.dumps((self.warc, 1)))
+        self.db.put(b"http://a.test/gone", pickle.dumps(("/nope.warc.gz", 0)))
+
+        migrate_warc_index(self.db)
+
+        self.assertIsNone(self.db.get(b"http://a.test/gone"))
+        file_id, offset, length = decode_index_value(
+            self.db.get(b"http://a.test/page")
+        )
+        record = read_warc_record(warc_file_path(self.db, file_id),
+                                  offset, length)
+        self.assertEqual(record["payload"], b"<html>page</html>")
+        # the old index covered this file, so it shouldn't be re-indexed
+        self.assertEqual(
+            self.db.get(INDEXED_FILES_PREFIX + bytes(self.warc, "utf-8")),
+            b""
+        )
+
+    def test_migrate_offset_index(self):
+        migrate_warc_index(self.db)
+        build_warc_index(self.db, self.warc_dir, None, processes=1)
+        file_id, offset, length = decode_index_value(
+            self.db.get(b"http://a.test/")
+        )
+        self.db.delete(b"\x00version")
+        self.db.put(b"http://a.test/", pickle.dumps((self.warc, offset, length)))
+
+        migrate_warc_index(self.db)
+
+        self.assertEqual(
+            decode_index_value(self.db.get(b"http://a.test/")),
+            (file_id, offset, length)
+        )
+
+    def test_unreadable_record_fails_fetch(self):
+        browser = WARCBrowser(
+            warc_index_file=os.path.join(self.tmp, "browser-index"),
+            warc_directory=self.warc_dir, warc_index_workers=1,
+        )
+        try:
+            self.assertTrue(browser.fetch("http://a.test/page"))
+            # rewritten since it was indexed
+            with open(self.warc, "wb") as f:
+                f.write(b"not a WARC file" * 100)
+            self.assertFalse(browser.fetch("http://a.test/"))
+            self.assertEqual(browser.page_url, "http://a.test/page")
+            self.assertEqual(len(browser.record_cache), 1)
+            # truncated
+            with open(self.warc, "wb") as f:
+                f.write(b"")
+            self.assertFalse(browser.fetch("http://a.test/"))
+        finally:
+            browser.warc_index.close()
+
+
+class WARCRecordCacheTestCase(unittest.TestCase):
+    def record(self, uri, size):
+        return {"uri": uri, "payload": b"x" * size, "headers": []}
+
+    def test_lru_byte_budget(self):
+        cache = WARCRecordCache(max_size=10)
+        cache.put((0, 0), self.record("a", 4))
+        cache.put((0, 1), self.record("b", 4))
+        # touch a, so b is least recently used
+        self.assertEqual(cache.get((0, 0))["uri"], "a")
+        cache.put((0, 2), self.record("c", 4))
+        self.assertIsNone(cache.get((0, 1)))
+        self.assertEqual(cache.get((0, 2))["uri"], "c")
+        self.assertEqual(cache.stats(), {
+            "hits": 2, "misses": 1, "evictions": 1, "records": 2,
+            "size": 8, "max_size": 10,
+        })
+
+    def test_oversized_and_disabled(self):
+        cache = WARCRecordCache(max_size=10)
+        cache.put((0, 0), self.record("big", 11))
+        self.assertEqual(len(cache), 0)
+        cache = WARCRecordCache(max_size=0)
+        cache.put((0, 0), self.record("a", 1))
+        self.assertIsNone(cache.get((0, 0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
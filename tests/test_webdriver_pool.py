@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit
+
+from autoscrape.backends.selenium.browser import SeleniumBrowser
+from autoscrape.backends.selenium.pool import WebDriverPool
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.current_handle = handle
+
+
+class FakeDriver:
+    """
+    Stands in for a Firefox WebDriver session: delete_all_cookies only
+    deletes the cookies for the current page's host.
+    """
+    def __init__(self):
+        # host => {cookie name: value}
+        self.cookies = {}
+        self.current_url = "about:blank"
+        self.window_handles = ["w1"]
+        self.current_handle = "w1"
+        self.switch_to = FakeSwitchTo(self)
+        self.quit_called = False
+
+    def get(self, url):
+        self.current_url = url
+
+    def visit(self, url, cookie):
+        self.get(url)
+        self.cookies.setdefault(urlsplit(url).netloc, {})[cookie] = "1"
+
+    def delete_all_cookies(self):
+        self.cookies.pop(urlsplit(self.current_url).netloc, None)
+
+    def execute_script(self, script):
+        if script == "return 1;":
+            return 1
+        if "window.open" in script:
+            self.window_handles.append("w%s" % (len(self.window_handles) + 1))
+
+    def close(self):
+        self.window_handles.remove(self.current_handle)
+
+    def quit(self):
+        self.quit_called = True
+
+
+class WebDriverPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.driver = FakeDriver()
+        self.pool = WebDriverPool(max_reset_origins=3)
+        with mock.patch(
+            "autoscrape.backends.selenium.pool.start_webdriver",
+            return_value=self.driver
+        ):
+            self.assertIs(self.pool.acquire(), self.driver)
+        self.driver.visit("http://a.com/login", "session")
+        self.driver.visit("https://b.com/", "tracking")
+        self.driver.visit("http://c.com/page", "prefs")
+
+    def test_clears_cookies_on_every_origin(self):
+        self.pool.release(self.driver, origins={
+            "http://a.com", "https://b.com", "http://c.com",
+        })
+        self.assertEqual(self.driver.cookies, {})
+        self.assertFalse(self.driver.quit_called)
+        self.assertEqual(self.driver.current_url, "about:blank")
+        # reused for the next scrape
+        self.assertIs(self.pool.acquire(), self.driver)
+
+    def test_unknown_origins_recycled(self):
+        self.pool.release(self.driver)
+        self.assertTrue(self.driver.quit_called)
+        self.assertEqual(self.pool.idle, {})
+
+    def test_too_many_origins_recycled(self):
+        self.pool.release(self.driver, origins={
+            "http://a.com", "https://b.com", "http://c.com", "http://d.com",
+        })
+        self.assertTrue(self.driver.quit_called)
+        self.assertEqual(self.pool.idle, {})
+
+
+class VisitedOriginsTestCase(unittest.TestCase):
+    def test_note_origin(self):
+        browser = SeleniumBrowser.__new__(SeleniumBrowser)
+        browser.visited_origins = set()
+        for url in ["http://a.com/x?y=1", "http://a.com/z",
+                    "https://b.com:8443/", "about:blank"]:
+            with mock.patch.object(
+                SeleniumBrowser, "page_url", new_callable=mock.PropertyMock,
+                return_value=url
+            ):
+                browser._note_origin()
+        self.assertEqual(
+            browser.visited_origins, {"http://a.com", "https://b.com:8443"}
+        )